@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+from math import sin, cos, radians
+
+from svg_utils import SvgWriter, render_svg_document, copy_to_clipboard, parse_aspect_ratio
+from svg_utils import load_generator_manifest, save_generator_manifest
+from svg_utils import generator_source_digest, generator_inputs_digest, open_output_target
+from svg_utils import profile_main
+
+################################################################################
+# Constants
+
+svg_style = """
+    <style>
+    .background {
+        fill: #FFFFFF;
+        stroke: none;
+    }
+
+    .foreground {
+        fill: #000000;
+        stroke: none;
+    }
+
+    .line {
+        fill: none;
+        stroke: #000000;
+    }
+
+    .crosshair {
+        fill: none;
+        stroke: #FFFFFF;
+        stroke-width: 2px;
+    }
+
+    .label {
+        fill: #000000;
+        stroke: none;
+        font-family: monospace;
+    }
+    </style>
+"""
+
+# Camera boards are 576px tall at 96 DPI, the aspect ratio sets their width
+board_height = 576
+
+# Printer sheets are A4 portrait, in millimeters
+sheet_width = 210
+sheet_height = 297
+sheet_margin = 15
+
+points_per_millimeter = 72 / 25.4
+
+def parse_number_list(number_list_spec):
+    return [float(number) for number in number_list_spec.split(",")]
+
+################################################################################
+# Camera calibration boards
+#
+# Every board is a single pattern tile repeated over the grid area, so the
+# document size does not grow with the number of dots or squares. Column
+# counts are kept even, like on the hand-drawn boards, and the grid is
+# centered on the page.
+
+def board_grid(aspect_ratio, cell_size):
+    board_width = board_height * parse_aspect_ratio(aspect_ratio)
+    grid_columns = int(board_width // cell_size) // 2 * 2
+    grid_rows = int(board_height // cell_size)
+    grid_x = (board_width - grid_columns * cell_size) / 2
+    grid_y = (board_height - grid_rows * cell_size) / 2
+    return board_width, grid_x, grid_y, grid_columns * cell_size, grid_rows * cell_size
+
+def draw_pattern_grid(svg_writer, pattern_id, draw_tile, tile_size, grid_x, grid_y, grid_width, grid_height):
+    with svg_writer.pattern(pattern_id, tile_size, tile_size, transform = "translate({} {})".format(
+        svg_writer.format_value(grid_x),
+        svg_writer.format_value(grid_y),
+    )):
+        draw_tile(svg_writer)
+    svg_writer.element("rect", fill = "url(#{})".format(pattern_id), x = grid_x, y = grid_y, width = grid_width, height = grid_height)
+
+def create_grid_dots_symmetric_svg(svg_writer, **kwargs):
+    aspect_ratio = kwargs.get("aspect_ratio", "16:9")
+    dot_pitch = kwargs.get("dot_pitch") or 32
+    dot_radius = kwargs.get("dot_radius") or dot_pitch / 4
+
+    board_width, grid_x, grid_y, grid_width, grid_height = board_grid(aspect_ratio, dot_pitch)
+
+    def draw_tile(svg_writer):
+        svg_writer.element("circle", class_ = "foreground", cx = dot_pitch / 2, cy = dot_pitch / 2, r = dot_radius)
+
+    with svg_writer.document(board_width, board_height, style = svg_style), svg_writer.group("board"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = board_width, height = board_height)
+        draw_pattern_grid(svg_writer, "grid_dot", draw_tile, dot_pitch, grid_x, grid_y, grid_width, grid_height)
+
+def create_grid_dots_asymmetric_svg(svg_writer, **kwargs):
+    # Dots sit on every other cell of the grid, alternate rows are shifted by
+    # one cell.
+    aspect_ratio = kwargs.get("aspect_ratio", "16:9")
+    dot_pitch = kwargs.get("dot_pitch") or 64
+    dot_radius = kwargs.get("dot_radius") or dot_pitch * 3 / 8
+
+    board_width, grid_x, grid_y, grid_width, grid_height = board_grid(aspect_ratio, dot_pitch)
+
+    def draw_tile(svg_writer):
+        svg_writer.element("circle", class_ = "foreground", cx = dot_pitch * 1 / 2, cy = dot_pitch * 1 / 2, r = dot_radius)
+        svg_writer.element("circle", class_ = "foreground", cx = dot_pitch * 3 / 2, cy = dot_pitch * 3 / 2, r = dot_radius)
+
+    with svg_writer.document(board_width, board_height, style = svg_style), svg_writer.group("board"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = board_width, height = board_height)
+        draw_pattern_grid(svg_writer, "grid_dot_pair", draw_tile, dot_pitch * 2, grid_x, grid_y, grid_width, grid_height)
+
+def create_grid_chessboard_svg(svg_writer, **kwargs):
+    aspect_ratio = kwargs.get("aspect_ratio", "16:9")
+    square_size = kwargs.get("square_size") or 64
+
+    board_width, grid_x, grid_y, grid_width, grid_height = board_grid(aspect_ratio, square_size)
+
+    def draw_tile(svg_writer):
+        svg_writer.element("rect", class_ = "foreground", x = 0,           y = 0,           width = square_size, height = square_size)
+        svg_writer.element("rect", class_ = "foreground", x = square_size, y = square_size, width = square_size, height = square_size)
+
+    with svg_writer.document(board_width, board_height, style = svg_style), svg_writer.group("board"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = board_width, height = board_height)
+        draw_pattern_grid(svg_writer, "grid_square_pair", draw_tile, square_size * 2, grid_x, grid_y, grid_width, grid_height)
+
+################################################################################
+# Printer resolution sheets
+
+def create_printer_line_pairs_svg(svg_writer, **kwargs):
+    # One row per line pair frequency (line pairs per millimeter), with a
+    # grating patch for every orientation. Every patch is a rotated pattern of
+    # a single line pair.
+    line_pair_frequencies = kwargs.get("line_pair_frequencies") or [0.5, 1, 2, 3, 4, 5, 6, 8]
+    orientations = [0, 45, 90, 135]
+
+    label_width = 36
+    patch_size = 32
+    patch_gutter = (sheet_width - 2 * sheet_margin - label_width - len(orientations) * patch_size) / (len(orientations) - 1)
+    row_height = (sheet_height - 2 * sheet_margin) / len(line_pair_frequencies)
+
+    with svg_writer.document(sheet_width, sheet_height, style = svg_style, units = "mm"), svg_writer.group("sheet"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = sheet_width, height = sheet_height)
+
+        for (frequency_index, line_pair_frequency) in enumerate(line_pair_frequencies):
+            line_pair_period = 1 / line_pair_frequency
+            row_y = sheet_margin + frequency_index * row_height + (row_height - min(patch_size, row_height)) / 2
+
+            svg_writer.text("{:g} lp/mm".format(line_pair_frequency), class_ = "label",
+                x = sheet_margin,
+                y = row_y + min(patch_size, row_height) / 2,
+                font_size = 4,
+                dominant_baseline = "central",
+            )
+
+            for (orientation_index, orientation) in enumerate(orientations):
+                pattern_id = "line_pairs_{}_{}".format(frequency_index, orientation)
+                patch_x = sheet_margin + label_width + orientation_index * (patch_size + patch_gutter)
+
+                with svg_writer.pattern(pattern_id, line_pair_period, line_pair_period, transform = "rotate({})".format(orientation)):
+                    svg_writer.element("rect", class_ = "foreground", x = 0, y = 0, width = line_pair_period / 2, height = line_pair_period)
+
+                svg_writer.element("rect", fill = "url(#{})".format(pattern_id),
+                    x = patch_x,
+                    y = row_y,
+                    width = patch_size,
+                    height = min(patch_size, row_height),
+                )
+
+def draw_resolution_star(svg_writer):
+    # The star has no stroke width of its own, every instance sets it
+    star_radius = 10
+    for ray_index in range(0, 12):
+        ray_angle = radians(ray_index * 15)
+        svg_writer.element("line", class_ = "line",
+            x1 = -star_radius * cos(ray_angle),
+            y1 = -star_radius * sin(ray_angle),
+            x2 =  star_radius * cos(ray_angle),
+            y2 =  star_radius * sin(ray_angle),
+        )
+    svg_writer.element("circle", class_ = "line", cx = 0, cy = 0, r = 7.5)
+
+def create_printer_stars_svg(svg_writer, **kwargs):
+    # Stars of decreasing stroke width, from line_width_max down to zero
+    line_width_max = kwargs.get("line_width_max") or 1.0
+    line_width_step = kwargs.get("line_width_step") or 0.025
+    line_width_unit = kwargs.get("line_width_unit", "mm")
+
+    line_widths = [line_width_step * step_index for step_index in range(round(line_width_max / line_width_step), -1, -1)]
+
+    cell_size = 30
+    sheet_columns = int((sheet_width - 2 * sheet_margin) // cell_size)
+    cells_x = (sheet_width - sheet_columns * cell_size) / 2
+
+    with svg_writer.document(sheet_width, sheet_height, style = svg_style, units = "mm"), svg_writer.group("sheet"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = sheet_width, height = sheet_height)
+
+        for (line_width_index, line_width) in enumerate(line_widths):
+            cell_x = cells_x + (line_width_index % sheet_columns) * cell_size + cell_size / 2
+            cell_y = sheet_margin + (line_width_index // sheet_columns) * cell_size + cell_size / 2
+
+            stroke_width = line_width if line_width_unit == "mm" else line_width / points_per_millimeter
+
+            with svg_writer.group("star_{}".format(line_width_index),
+                transform = "translate({} {})".format(svg_writer.format_value(cell_x), svg_writer.format_value(cell_y)),
+                style = "stroke-width: {}".format(svg_writer.format_value(stroke_width)),
+            ):
+                svg_writer.reuse("resolution_star", draw_resolution_star)
+
+            svg_writer.text("{:.3f} {}".format(line_width, line_width_unit), class_ = "label",
+                x = cell_x,
+                y = cell_y + cell_size / 2 - 2,
+                font_size = 3,
+                text_anchor = "middle",
+            )
+
+################################################################################
+# Focus charts
+
+def create_focus_chart_svg(svg_writer, **kwargs):
+    # Siemens star of spoke_count black wedges, every wedge is the same shape
+    # rotated around the center.
+    spoke_count = kwargs.get("spoke_count") or 36
+    crosshair = kwargs.get("crosshair", False)
+
+    chart_size = 576
+    chart_center = chart_size / 2
+    wedge_angle = radians(180 / spoke_count)
+
+    def draw_wedge(svg_writer):
+        svg_writer.element("path", class_ = "foreground", d = "M {c} {c} L {x0} {c} A {r} {r} 0 0 1 {x1} {y1} Z".format(
+            c  = svg_writer.format_value(chart_center),
+            r  = svg_writer.format_value(chart_center),
+            x0 = svg_writer.format_value(chart_size),
+            x1 = svg_writer.format_value(chart_center + chart_center * cos(wedge_angle)),
+            y1 = svg_writer.format_value(chart_center + chart_center * sin(wedge_angle)),
+        ))
+
+    with svg_writer.document(chart_size, chart_size, style = svg_style), svg_writer.group("chart"):
+        svg_writer.element("circle", class_ = "background", cx = chart_center, cy = chart_center, r = chart_center)
+
+        for spoke_index in range(0, spoke_count):
+            with svg_writer.group("wedge_{}".format(spoke_index), transform = "rotate({} {} {})".format(
+                svg_writer.format_value(spoke_index * 360 / spoke_count),
+                svg_writer.format_value(chart_center),
+                svg_writer.format_value(chart_center),
+            )):
+                svg_writer.reuse("focus_wedge", draw_wedge)
+
+        if crosshair:
+            svg_writer.element("line", class_ = "crosshair", x1 = 0, y1 = chart_center, x2 = chart_size, y2 = chart_center)
+            svg_writer.element("line", class_ = "crosshair", x1 = chart_center, y1 = 0, x2 = chart_center, y2 = chart_size)
+
+################################################################################
+# Calibration sheets
+
+calibration_sheets = {
+    "grid-dots-symmetric-dense":   create_grid_dots_symmetric_svg,
+    "grid-dots-asymmetric-sparse": create_grid_dots_asymmetric_svg,
+    "grid-chessboard":             create_grid_chessboard_svg,
+    "printer-resolution-lines":    create_printer_line_pairs_svg,
+    "printer-resolution-stars":    create_printer_stars_svg,
+    "focus-chart":                 create_focus_chart_svg,
+}
+
+def calibration_batch_jobs(aspect_ratios, sheet_params):
+    # Every variant of every sheet, as (path, sheet name, sheet parameters)
+    batch_jobs = []
+
+    for sheet_name in ["grid-dots-symmetric-dense", "grid-dots-asymmetric-sparse", "grid-chessboard"]:
+        for aspect_ratio in aspect_ratios:
+            batch_jobs.append(("{0}/{0}-{1}.svg".format(sheet_name, aspect_ratio), sheet_name, {**sheet_params, "aspect_ratio": aspect_ratio}))
+
+    batch_jobs.append(("printer/printer-resolution-lines.svg", "printer-resolution-lines", sheet_params))
+    for line_width_unit in ["mm", "pt"]:
+        batch_jobs.append(("printer/printer-resolution-stars-{}.svg".format(line_width_unit), "printer-resolution-stars", {**sheet_params, "line_width_unit": line_width_unit}))
+
+    for spoke_count in [9, 18, 36, 72]:
+        batch_jobs.append(("focus-chart/focus-chart-{}.svg".format(spoke_count), "focus-chart", {**sheet_params, "spoke_count": spoke_count}))
+    for spoke_count in [36, 72]:
+        batch_jobs.append(("focus-chart/focus-chart-crosshair-{}.svg".format(spoke_count), "focus-chart", {**sheet_params, "spoke_count": spoke_count, "crosshair": True}))
+
+    return batch_jobs
+
+def write_calibration_batch(output_directory, aspect_ratios, sheet_params, writer_options, output_target = "tree", force = False):
+    manifest = load_generator_manifest()
+    source_digest = generator_source_digest(__file__)
+
+    with open_output_target(output_target) as output:
+        for (svg_path, sheet_name, batch_params) in calibration_batch_jobs(aspect_ratios, sheet_params):
+            svg_path = "{}/{}".format(output_directory, svg_path)
+
+            inputs_digest = generator_inputs_digest(source_digest, sheet_name, sorted(batch_params.items()), writer_options)
+            if force or not output.is_current(manifest, svg_path, inputs_digest):
+                svg_document = render_svg_document(calibration_sheets[sheet_name], writer_options = writer_options, **batch_params)
+                output.write(svg_path, svg_document)
+                output.record(manifest, svg_path, inputs_digest)
+
+    save_generator_manifest(manifest)
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",               type = str,                                        )
+    parser.add_argument("--target",                type = str,   default = "stdout"                   )
+    parser.add_argument("--sheet",                 type = str,   default = "grid-chessboard"          )
+    parser.add_argument("--aspect-ratio",          type = str,   default = "16:9"                     )
+    parser.add_argument("--aspect-ratios",         type = str,   default = "4:3,16:9,2.39:1"          )
+    parser.add_argument("--dot-pitch",             type = float,                                      )
+    parser.add_argument("--dot-radius",            type = float,                                      )
+    parser.add_argument("--square-size",           type = float,                                      )
+    parser.add_argument("--line-pair-frequencies", type = str,                                        )
+    parser.add_argument("--line-width-unit",       type = str,   default = "mm"                       )
+    parser.add_argument("--spoke-count",           type = int,                                        )
+    parser.add_argument("--crosshair",             action = "store_true"                              )
+    parser.add_argument("--output",                type = str,   default = "calibration/procedural"   )
+    parser.add_argument("--output-target",         type = str,   default = "tree"                     )
+    parser.add_argument("--force",                 action = "store_true"                              )
+    parser.add_argument("--compact",               action = "store_true"                              )
+    parser.add_argument("--precision",             type = int,   default = "3"                        )
+
+    args = parser.parse_args(argv)
+
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    # Unset parameters fall back to each sheet's own defaults
+    sheet_params = {
+        "dot_pitch":             args.dot_pitch,
+        "dot_radius":            args.dot_radius,
+        "square_size":           args.square_size,
+        "line_pair_frequencies": parse_number_list(args.line_pair_frequencies) if args.line_pair_frequencies else None,
+    }
+
+    match args.command:
+        case "create-svg":
+            create_params = {
+                **sheet_params,
+                "aspect_ratio":    args.aspect_ratio,
+                "line_width_unit": args.line_width_unit,
+                "spoke_count":     args.spoke_count,
+                "crosshair":       args.crosshair,
+            }
+            match args.target:
+                case "stdout":
+                    calibration_sheets[args.sheet](SvgWriter(sys.stdout, **writer_options), **create_params)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(calibration_sheets[args.sheet], writer_options = writer_options, **create_params)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "create-batch":
+            write_calibration_batch(
+                args.output,
+                args.aspect_ratios.split(","),
+                sheet_params,
+                writer_options,
+                args.output_target,
+                args.force,
+            )
+
+        case "query-calibration-sheets":
+            for (sheet_name, sheet_constructor) in calibration_sheets.items():
+                print(sheet_name)
+
+if __name__ == "__main__":
+    profile_main(main)
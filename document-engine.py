@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+from math import ceil
+
+from svg_utils import SvgWriter, render_svg_document, copy_to_clipboard
+from svg_utils import load_generator_manifest, save_generator_manifest
+from svg_utils import generator_source_digest, generator_inputs_digest, open_output_target
+from svg_utils import profile_main
+
+################################################################################
+# Constants
+
+svg_style = """
+    <style>
+    .outline {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 0.4px;
+    }
+
+    .cell {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 0.15px;
+    }
+
+    .dotted {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 0.25px;
+        stroke-dasharray: 0.25, 0.5;
+    }
+
+    .marker {
+        fill: #000000;
+        stroke: none;
+    }
+
+    .label {
+        fill: #000000;
+        stroke: none;
+        font-family: sans-serif;
+        font-size: 2.65px;
+    }
+    </style>
+"""
+
+# Portrait paper sizes in millimeters
+paper_sizes = {
+    "a3": (297, 420),
+    "a4": (210, 297),
+    "a5": (148, 210),
+    "b4": (257, 364),
+    "b5": (182, 257),
+}
+
+document_labels = {
+    "en": {
+        "episode":      "EPISODE",
+        "title":        "TITLE",
+        "scene":        "SCENE",
+        "cut":          "CUT",
+        "time":         "TIME",
+        "key_animator": "KEY ANIMATOR",
+        "sheet":        "SHEET",
+        "keyframe":     "KEYFRAME",
+        "frame":        "FR#",
+        "dialogue":     "SFX",
+        "inbetween":    "IN-BETWEEN",
+        "camera":       "CAMERA",
+    },
+    "jp": {
+        "episode":      "話数",
+        "title":        "タイトル",
+        "scene":        "シーン",
+        "cut":          "カット",
+        "time":         "タイム",
+        "key_animator": "原画",
+        "sheet":        "シート",
+        "keyframe":     "アクション",
+        "frame":        "コマ",
+        "dialogue":     "台詞",
+        "inbetween":    "セル",
+        "camera":       "カメラ",
+    },
+}
+
+def paper_size(paper, orientation):
+    paper_width, paper_height = paper_sizes[paper]
+    if orientation == "landscape":
+        return paper_height, paper_width
+    return paper_width, paper_height
+
+################################################################################
+# Timesheets
+#
+# A sheet is a header of title fields, an optional memo area and blocks of
+# frame rows side by side. Every frame row of a block is the same row of
+# cells, drawn once and instanced.
+
+timesheet_header_fields = [
+    # label_key       field_width (zero stretches to fill the page)
+    ("episode",       24),
+    ("title",         0 ),
+    ("scene",         24),
+    ("cut",           24),
+    ("time",          32),
+    ("key_animator",  32),
+    ("sheet",         32),
+]
+
+timesheet_column_kinds = {
+    # column_kind  cell_width
+    "keyframe":    5,
+    "frame":       8,
+    "dialogue":    8,
+    "inbetween":   8,
+    "camera":      24,
+}
+
+default_column_layout = "keyframe:7,frame,dialogue,inbetween:7,camera"
+
+timesheet_margin = 12
+timesheet_header_y = 9
+timesheet_header_label_height = 4
+timesheet_header_field_height = 12
+timesheet_block_gap = 11
+timesheet_block_header_height = 8
+timesheet_min_row_height = 2
+
+def parse_column_layout(column_layout):
+    # Comma separated column kinds with an optional sub column count, for
+    # example "keyframe:7,frame,dialogue,inbetween:7,camera".
+    columns = []
+    for column_spec in column_layout.split(","):
+        column_kind, _, sub_column_count = column_spec.partition(":")
+        if column_kind not in timesheet_column_kinds:
+            raise ValueError("Unknown timesheet column: {}".format(column_kind))
+        columns.append((column_kind, int(sub_column_count or 1)))
+    return columns
+
+def draw_timesheet_header(svg_writer, labels, page_width):
+    fixed_width = sum(field_width for (_, field_width) in timesheet_header_fields)
+    stretch_width = page_width - 2 * timesheet_margin - fixed_width
+
+    field_x = timesheet_margin
+    for (label_key, field_width) in timesheet_header_fields:
+        field_width = field_width or stretch_width
+        svg_writer.element("rect", class_ = "outline",
+            x = field_x,
+            y = timesheet_header_y,
+            width = field_width,
+            height = timesheet_header_label_height,
+        )
+        svg_writer.element("rect", class_ = "outline",
+            x = field_x,
+            y = timesheet_header_y + timesheet_header_label_height,
+            width = field_width,
+            height = timesheet_header_field_height,
+        )
+        svg_writer.text(labels[label_key], class_ = "label",
+            x = field_x + field_width / 2,
+            y = timesheet_header_y + timesheet_header_label_height / 2,
+            text_anchor = "middle",
+            dominant_baseline = "central",
+        )
+        field_x += field_width
+
+def draw_timesheet_block(svg_writer, labels, columns, first_frame, frame_count, row_height, fps):
+    block_width = sum(timesheet_column_kinds[column_kind] * sub_column_count for (column_kind, sub_column_count) in columns)
+    rows_height = frame_count * row_height
+    block_height = timesheet_block_header_height + rows_height
+
+    def draw_row(svg_writer):
+        cell_x = 0
+        for (column_kind, sub_column_count) in columns:
+            for _ in range(0, sub_column_count):
+                cell_x += timesheet_column_kinds[column_kind]
+                svg_writer.element("line", class_ = "cell", x1 = cell_x, y1 = 0, x2 = cell_x, y2 = row_height)
+        svg_writer.element("line", class_ = "cell", x1 = 0, y1 = row_height, x2 = block_width, y2 = row_height)
+
+    for row_index in range(0, frame_count):
+        svg_writer.reuse("timesheet_row", draw_row, 0, timesheet_block_header_height + row_index * row_height)
+
+    column_x = 0
+    for (column_kind, sub_column_count) in columns:
+        cell_width = timesheet_column_kinds[column_kind]
+        column_width = cell_width * sub_column_count
+
+        # Split columns get a lettered sub header, the others a single cell
+        label_height = timesheet_block_header_height / 2 if sub_column_count > 1 else timesheet_block_header_height
+        svg_writer.element("rect", class_ = "outline", x = column_x, y = 0, width = column_width, height = label_height)
+        svg_writer.text(labels[column_kind], class_ = "label",
+            x = column_x + column_width / 2,
+            y = label_height / 2,
+            text_anchor = "middle",
+            dominant_baseline = "central",
+        )
+        if sub_column_count > 1:
+            for sub_column_index in range(0, sub_column_count):
+                svg_writer.text(chr(ord("A") + sub_column_index % 26), class_ = "label",
+                    x = column_x + (sub_column_index + 0.5) * cell_width,
+                    y = timesheet_block_header_height * 3 / 4,
+                    text_anchor = "middle",
+                    dominant_baseline = "central",
+                )
+
+        svg_writer.element("rect", class_ = "outline", x = column_x, y = 0, width = column_width, height = block_height)
+
+        if column_kind == "frame":
+            for row_index in range(1, frame_count, 2):
+                svg_writer.text(str(first_frame + row_index + 1), class_ = "label",
+                    x = column_x + column_width - 1,
+                    y = timesheet_block_header_height + (row_index + 1) * row_height - row_height / 2,
+                    text_anchor = "end",
+                    dominant_baseline = "central",
+                )
+
+        column_x += column_width
+
+    # Second boundaries are thick rules across the block, half seconds get a
+    # marker on the left edge
+    for frame_index in range(0, frame_count + 1):
+        frame_number = first_frame + frame_index
+        rule_y = timesheet_block_header_height + frame_index * row_height
+        if frame_number % fps == 0:
+            svg_writer.element("rect", class_ = "marker", x = 0, y = rule_y - 0.25, width = block_width, height = 0.5)
+            svg_writer.text(str(frame_number // fps), class_ = "label",
+                x = -1,
+                y = rule_y,
+                text_anchor = "end",
+                dominant_baseline = "central",
+            )
+        elif frame_number % fps == fps // 2:
+            svg_writer.element("polygon", class_ = "marker", points = "{},{} {},{} {},{}".format(
+                svg_writer.format_value(-0.5), svg_writer.format_value(rule_y),
+                svg_writer.format_value(-2), svg_writer.format_value(rule_y - 0.866),
+                svg_writer.format_value(-2), svg_writer.format_value(rule_y + 0.866),
+            ))
+
+def create_timesheet_svg(svg_writer, **kwargs):
+    page_width, page_height = paper_size(kwargs.get("paper", "a4"), kwargs.get("orientation", "landscape"))
+    labels = document_labels[kwargs.get("language", "en")]
+    columns = parse_column_layout(kwargs.get("column_layout", default_column_layout))
+    frame_count = kwargs.get("frame_count", 48)
+    fps = kwargs.get("fps", 24)
+    memo_height = kwargs.get("memo_height", 64)
+
+    block_width = sum(timesheet_column_kinds[column_kind] * sub_column_count for (column_kind, sub_column_count) in columns)
+    block_count = kwargs.get("block_count") or max(1, int((page_width - 2 * timesheet_margin + timesheet_block_gap) // (block_width + timesheet_block_gap)))
+    frames_per_block = ceil(frame_count / block_count)
+    # Rounding up can leave trailing blocks without frames, only the blocks
+    # that hold frames are drawn
+    block_count = ceil(frame_count / frames_per_block)
+
+    memo_y = timesheet_header_y + timesheet_header_label_height + timesheet_header_field_height + 4
+    blocks_y = memo_y + (memo_height + 4 if memo_height else 0)
+    rows_height = page_height - timesheet_header_y - blocks_y - timesheet_block_header_height
+    row_height = rows_height / frames_per_block
+
+    if row_height < timesheet_min_row_height:
+        raise ValueError("{} frames in {} blocks do not fit on the page".format(frame_count, block_count))
+
+    with svg_writer.document(page_width, page_height, style = svg_style, units = "mm"), svg_writer.group("timesheet"):
+        draw_timesheet_header(svg_writer, labels, page_width)
+
+        if memo_height:
+            svg_writer.element("rect", class_ = "dotted",
+                x = timesheet_margin,
+                y = memo_y,
+                width = page_width - 2 * timesheet_margin,
+                height = memo_height,
+            )
+
+        for block_index in range(0, block_count):
+            first_frame = block_index * frames_per_block
+            with svg_writer.group("block_{}".format(block_index), transform = "translate({} {})".format(
+                svg_writer.format_value(timesheet_margin + block_index * (block_width + timesheet_block_gap)),
+                svg_writer.format_value(blocks_y),
+            )):
+                draw_timesheet_block(svg_writer, labels, columns, first_frame, min(frames_per_block, frame_count - first_frame), row_height, fps)
+
+################################################################################
+# Genkouyoushi
+#
+# Manuscript paper: square cells with a dotted center cross. The cell is
+# drawn once, a row instances it and the page instances the row.
+
+def create_genkouyoushi_svg(svg_writer, **kwargs):
+    cell_size = kwargs.get("cell_size", 10.16)
+    cell_columns = kwargs.get("cell_columns", 15)
+    cell_rows = kwargs.get("cell_rows", 20)
+
+    def draw_cell(svg_writer):
+        svg_writer.element("rect", class_ = "cell", x = 0, y = 0, width = cell_size, height = cell_size)
+        svg_writer.element("line", class_ = "dotted", x1 = cell_size / 2, y1 = 0, x2 = cell_size / 2, y2 = cell_size)
+        svg_writer.element("line", class_ = "dotted", x1 = 0, y1 = cell_size / 2, x2 = cell_size, y2 = cell_size / 2)
+
+    def draw_row(svg_writer):
+        for column_index in range(0, cell_columns):
+            svg_writer.reuse("genkouyoushi_cell", draw_cell, column_index * cell_size, 0)
+
+    with svg_writer.document(cell_columns * cell_size, cell_rows * cell_size, style = svg_style, units = "mm"), svg_writer.group("genkouyoushi"):
+        for row_index in range(0, cell_rows):
+            svg_writer.reuse("genkouyoushi_row", draw_row, 0, row_index * cell_size)
+
+################################################################################
+# Documents
+
+document_types = {
+    "timesheet":    create_timesheet_svg,
+    "genkouyoushi": create_genkouyoushi_svg,
+}
+
+document_presets = {
+    "timesheet-a4-48f": ("timesheet", {
+        "paper":       "a4",
+        "orientation": "landscape",
+        "frame_count": 48,
+    }),
+    "timesheet-a3-144f": ("timesheet", {
+        "paper":       "a3",
+        "orientation": "portrait",
+        "frame_count": 144,
+        "memo_height": 0,
+    }),
+    "genkouyoushi": ("genkouyoushi", {}),
+}
+
+def document_jobs(languages):
+    # (svg_path, document_type, document_params)
+    for (preset_name, (document_type, document_params)) in document_presets.items():
+        if document_type == "timesheet":
+            for language in languages:
+                yield ("documents/timesheet/{}-{}.svg".format(preset_name, language), document_type, {**document_params, "language": language})
+        else:
+            yield ("text/text-{}.svg".format(preset_name), document_type, document_params)
+
+def write_documents(document_jobs, output_directory, force = False, writer_options = None, output_target = "tree"):
+    manifest = load_generator_manifest()
+    source_digest = generator_source_digest(__file__)
+
+    with open_output_target(output_target) as output:
+        for (svg_path, document_type, document_params) in document_jobs:
+            svg_path = "{}/{}".format(output_directory, svg_path)
+            inputs_digest = generator_inputs_digest(source_digest, document_type, sorted(document_params.items()), writer_options)
+            if force or not output.is_current(manifest, svg_path, inputs_digest):
+                svg_document = render_svg_document(document_types[document_type], writer_options = writer_options, **document_params)
+                output.write(svg_path, svg_document)
+                output.record(manifest, svg_path, inputs_digest)
+
+    save_generator_manifest(manifest)
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",       type = str,                                             )
+    parser.add_argument("--target",        type = str,   default = "stdout"                        )
+    parser.add_argument("--document",      type = str,   default = "timesheet"                     )
+    parser.add_argument("--paper",         type = str,   default = "a4"                            )
+    parser.add_argument("--orientation",   type = str,   default = "landscape"                     )
+    parser.add_argument("--language",      type = str,   default = "en"                            )
+    parser.add_argument("--languages",     type = str,   default = "en,jp"                         )
+    parser.add_argument("--frame-count",   type = int,   default = "48"                            )
+    parser.add_argument("--fps",           type = int,   default = "24"                            )
+    parser.add_argument("--block-count",   type = int,                                             )
+    parser.add_argument("--columns",       type = str,   default = default_column_layout           )
+    parser.add_argument("--memo-height",   type = float, default = "64"                            )
+    parser.add_argument("--cell-size",     type = float, default = "10.16"                         )
+    parser.add_argument("--cell-columns",  type = int,   default = "15"                            )
+    parser.add_argument("--cell-rows",     type = int,   default = "20"                            )
+    parser.add_argument("--output",        type = str,   default = "procedural"                    )
+    parser.add_argument("--output-target", type = str,   default = "tree"                          )
+    parser.add_argument("--force",         action = "store_true"                                   )
+    parser.add_argument("--compact",       action = argparse.BooleanOptionalAction, default = True )
+    parser.add_argument("--precision",     type = int,   default = "3"                             )
+
+    args = parser.parse_args(argv)
+
+    # Documents are mostly repeated cells, they are written with <defs> and
+    # <use> unless --no-compact asks for every cell to be spelled out
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    match args.command:
+        case "create-svg":
+            document_params = {
+                "paper":         args.paper,
+                "orientation":   args.orientation,
+                "language":      args.language,
+                "frame_count":   args.frame_count,
+                "fps":           args.fps,
+                "block_count":   args.block_count,
+                "column_layout": args.columns,
+                "memo_height":   args.memo_height,
+                "cell_size":     args.cell_size,
+                "cell_columns":  args.cell_columns,
+                "cell_rows":     args.cell_rows,
+            }
+            match args.target:
+                case "stdout":
+                    document_types[args.document](SvgWriter(sys.stdout, **writer_options), **document_params)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(document_types[args.document], writer_options = writer_options, **document_params)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "query-document-types":
+            for (document_type, document_constructor) in document_types.items():
+                print(document_type)
+
+        case "query-document-presets":
+            for (preset_name, preset) in document_presets.items():
+                print(preset_name)
+
+        case None:
+            write_documents(
+                document_jobs(args.languages.split(",")),
+                args.output,
+                args.force,
+                writer_options,
+                args.output_target,
+            )
+
+if __name__ == "__main__":
+    profile_main(main)
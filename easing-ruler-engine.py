@@ -1,87 +1,443 @@
 #!/usr/bin/env python3
 
 import argparse
-import os
-from math import sin, cos, radians, pi, sqrt
-from textwrap import dedent
+import re
+import sys
+from functools import cache, partial
+from types import SimpleNamespace
+from bisect import bisect_left, bisect_right
+from math import sin, cos, asin, acos, radians, pi, sqrt, ceil, log2
 
-from svg_utils import svg_style, format_float, copy_to_clipboard
+from svg_utils import SvgWriter, render_svg_document, svg_stylesheet, stylesheet_href, format_float, copy_to_clipboard
+from svg_utils import generator_source_digest, generator_inputs_digest, write_batch
+from svg_utils import generator_profile, profile_main
 
 ################################################################################
 # Easing functions
+#
+# Every easing function is defined once, as a pair of factories for the easing
+# function and its inverse. A factory builds its function for a math
+# namespace: scalar_math evaluates one float per call, array_math() a whole
+# NumPy array of them. NumPy is only imported when array_math() is first used.
+#
+# Inverses map a position back to the t where an easing function reaches it.
+# They mirror the combinators and use closed forms where they exist. The rest
+# invert a monotone lookup table of the easing function, refined by bisection
+# until the bracketing interval is below inverse_precision, which bounds the
+# error in t. Positions are clamped to [0, 1].
+#
+# Only monotone curves have an inverse. Curves that overshoot or turn back
+# (cubic-bezier(0.68,-0.55,0.265,1.55), keyframes(0:0,0.5:1.2,1:1)) reach some
+# positions more than once, building their inverse raises ValueError.
+
+inverse_precision = 1e-9
+inverse_table_size = 1024
+
+def inverse_refinement_steps():
+    return ceil(log2(1.0 / (inverse_table_size * inverse_precision)))
+
+def check_monotone_table(table):
+    if any(b < a for (a, b) in zip(table, table[1:])):
+        raise ValueError("Easing function is not monotone and has no inverse")
+
+def clamp_position(position):
+    return min(1.0, max(0.0, position))
+
+def piecewise(t, t_split, lower_function, upper_function):
+    if t < t_split:
+        return lower_function(t)
+    else:
+        return upper_function(t)
+
+def tabulated_inverse(easing_function):
+    # The table is built up front so that non-monotone curves are rejected
+    # when their inverse is looked up rather than answered with garbage
+    table = [easing_function(i / inverse_table_size) for i in range(0, inverse_table_size + 1)]
+    check_monotone_table(table)
+
+    def inner(position):
+        position = clamp_position(position)
+        i = min(max(1, bisect_left(table, position)), inverse_table_size)
+        t_low, t_high = (i - 1) / inverse_table_size, i / inverse_table_size
+        for _ in range(0, inverse_refinement_steps()):
+            t_middle = (t_low + t_high) / 2.0
+            if easing_function(t_middle) < position:
+                t_low = t_middle
+            else:
+                t_high = t_middle
+        return (t_low + t_high) / 2.0
+    return inner
 
-def concat(easing_function_a, easing_function_b):
-    def inner(t):
-        if t < 0.5:
+scalar_math = SimpleNamespace(
+    pi = pi, pow = pow, sqrt = sqrt, sin = sin, cos = cos, asin = asin, acos = acos,
+    copy = lambda t: t,
+    clamp = clamp_position,
+    piecewise = piecewise,
+    tabulated_inverse = tabulated_inverse,
+)
+
+@cache
+def array_math():
+    import numpy as np
+
+    def array_clamp_positions(positions):
+        return np.clip(positions, 0.0, 1.0)
+
+    def array_piecewise(t, t_split, lower_function, upper_function):
+        lower = t < t_split
+        upper = ~lower
+        result = np.empty_like(t)
+        result[lower] = lower_function(t[lower])
+        result[upper] = upper_function(t[upper])
+        return result
+
+    def array_tabulated_inverse(array_easing_function):
+        # Brackets every position in one table lookup and then bisects all
+        # brackets together, the same number of steps the scalar tables take
+        table_t = np.linspace(0.0, 1.0, inverse_table_size + 1)
+        table = array_easing_function(table_t)
+        check_monotone_table(table.tolist())
+
+        def inner(positions):
+            positions = array_clamp_positions(positions)
+            i = np.clip(np.searchsorted(table, positions, side = "left"), 1, inverse_table_size)
+            t_low, t_high = table_t[i - 1], table_t[i]
+            for _ in range(0, inverse_refinement_steps()):
+                t_middle = (t_low + t_high) / 2.0
+                below = array_easing_function(t_middle) < positions
+                t_low = np.where(below, t_middle, t_low)
+                t_high = np.where(below, t_high, t_middle)
+            return (t_low + t_high) / 2.0
+        return inner
+
+    return SimpleNamespace(
+        pi = np.pi, pow = np.power, sqrt = np.sqrt, sin = np.sin, cos = np.cos, asin = np.arcsin, acos = np.arccos,
+        copy = np.copy,
+        clamp = array_clamp_positions,
+        piecewise = array_piecewise,
+        tabulated_inverse = array_tabulated_inverse,
+    )
+
+def concat(easing_a, easing_b):
+    def factory(m):
+        easing_function_a, easing_function_b = easing_a(m), easing_b(m)
+        def lower(t):
             return 0.0 + easing_function_a(t * 2.0 - 0.0) / 2.0
-        else:
+        def upper(t):
             return 0.5 + easing_function_b(t * 2.0 - 1.0) / 2.0
-    return inner
+        return lambda t: m.piecewise(t, 0.5, lower, upper)
+    return factory
 
-def first_half(easing_function):
-    def inner(t):
-        return easing_function(t / 2.0 + 0.0) * 2.0 - 0.0
-    return inner
+def first_half(easing):
+    def factory(m):
+        easing_function = easing(m)
+        return lambda t: easing_function(t / 2.0 + 0.0) * 2.0 - 0.0
+    return factory
 
-def second_half(easing_function):
-    def inner(t):
-        return easing_function(t / 2.0 + 0.5) * 2.0 - 1.0
-    return inner
+def second_half(easing):
+    def factory(m):
+        easing_function = easing(m)
+        return lambda t: easing_function(t / 2.0 + 0.5) * 2.0 - 1.0
+    return factory
 
 def ease_in(factor):
-    return lambda t: pow(t, factor)
+    return lambda m: lambda t: m.pow(t, factor)
 
 def ease_out(factor):
-    return lambda t: 1.0 - pow(1.0 - t, factor)
+    return lambda m: lambda t: 1.0 - m.pow(1.0 - t, factor)
 
 def ease_inout_linear():
-    return lambda t: t
+    return lambda m: lambda t: m.copy(t)
 
 def ease_inout_smoothstep():
-    return lambda t: t * t * (3.0 - 2.0 * t)
+    return lambda m: lambda t: t * t * (3.0 - 2.0 * t)
 
 def ease_inout_smootherstep():
-    return lambda t: t * t * t * (t * (t * 6.0 - 15.0) + 10.0)
+    return lambda m: lambda t: t * t * t * (t * (t * 6.0 - 15.0) + 10.0)
 
 def ease_inout_cosine():
-    return lambda t: (1.0 - cos(t * pi)) / 2.0
+    return lambda m: lambda t: (1.0 - m.cos(t * m.pi)) / 2.0
 
 def ease_in_circle():
-    return lambda t: 1.0 - sqrt(1.0 - pow(t, 2.0))
+    return lambda m: lambda t: 1.0 - m.sqrt(1.0 - m.pow(t, 2.0))
 
 def ease_out_circle():
-    return lambda t: sqrt(1.0 - pow(t - 1.0, 2.0))
+    return lambda m: lambda t: m.sqrt(1.0 - m.pow(t - 1.0, 2.0))
+
+def inverse_concat(inverse_easing_a, inverse_easing_b):
+    def factory(m):
+        inverse_easing_function_a, inverse_easing_function_b = inverse_easing_a(m), inverse_easing_b(m)
+        def lower(position):
+            return 0.0 + inverse_easing_function_a(position * 2.0 - 0.0) / 2.0
+        def upper(position):
+            return 0.5 + inverse_easing_function_b(position * 2.0 - 1.0) / 2.0
+        return lambda position: m.piecewise(position, 0.5, lower, upper)
+    return factory
+
+def inverse_first_half(inverse_easing):
+    def factory(m):
+        inverse_easing_function = inverse_easing(m)
+        return lambda position: (inverse_easing_function(position / 2.0 + 0.0) - 0.0) * 2.0
+    return factory
+
+def inverse_second_half(inverse_easing):
+    def factory(m):
+        inverse_easing_function = inverse_easing(m)
+        return lambda position: (inverse_easing_function(position / 2.0 + 0.5) - 0.5) * 2.0
+    return factory
+
+def inverse_tabulated(easing):
+    return lambda m: m.tabulated_inverse(easing(m))
+
+def inverse_ease_in(factor):
+    return lambda m: lambda position: m.pow(m.clamp(position), 1.0 / factor)
+
+def inverse_ease_out(factor):
+    return lambda m: lambda position: 1.0 - m.pow(1.0 - m.clamp(position), 1.0 / factor)
+
+def inverse_ease_inout_linear():
+    return lambda m: lambda position: m.clamp(position)
+
+def inverse_ease_inout_smoothstep():
+    return lambda m: lambda position: 0.5 - m.sin(m.asin(1.0 - 2.0 * m.clamp(position)) / 3.0)
+
+def inverse_ease_inout_cosine():
+    return lambda m: lambda position: m.acos(1.0 - 2.0 * m.clamp(position)) / m.pi
+
+def inverse_ease_in_circle():
+    return lambda m: lambda position: m.sqrt(1.0 - m.pow(1.0 - m.clamp(position), 2.0))
+
+def inverse_ease_out_circle():
+    return lambda m: lambda position: 1.0 - m.sqrt(1.0 - m.pow(m.clamp(position), 2.0))
+
+easing_definitions = {
+    "ease-inout-linear":       (ease_inout_linear(),                         inverse_ease_inout_linear()                                        ),
+    "ease-inout-smoothstep":   (ease_inout_smoothstep(),                     inverse_ease_inout_smoothstep()                                    ),
+    "ease-inout-smootherstep": (ease_inout_smootherstep(),                   inverse_tabulated(ease_inout_smootherstep())                       ),
+
+    "ease-in-pow2":            (ease_in(2.0),                                inverse_ease_in(2.0)                                               ),
+    "ease-out-pow2":           (ease_out(2.0),                               inverse_ease_out(2.0)                                              ),
+    "ease-inout-pow2":         (concat(ease_in(2.0), ease_out(2.0)),         inverse_concat(inverse_ease_in(2.0), inverse_ease_out(2.0))        ),
+
+    "ease-in-pow3":            (ease_in(3.0),                                inverse_ease_in(3.0)                                               ),
+    "ease-out-pow3":           (ease_out(3.0),                               inverse_ease_out(3.0)                                              ),
+    "ease-inout-pow3":         (concat(ease_in(3.0), ease_out(3.0)),         inverse_concat(inverse_ease_in(3.0), inverse_ease_out(3.0))        ),
+
+    "ease-in-pow4":            (ease_in(4.0),                                inverse_ease_in(4.0)                                               ),
+    "ease-out-pow4":           (ease_out(4.0),                               inverse_ease_out(4.0)                                              ),
+    "ease-inout-pow4":         (concat(ease_in(4.0), ease_out(4.0)),         inverse_concat(inverse_ease_in(4.0), inverse_ease_out(4.0))        ),
+
+    "ease-in-pow5":            (ease_in(5.0),                                inverse_ease_in(5.0)                                               ),
+    "ease-out-pow5":           (ease_out(5.0),                               inverse_ease_out(5.0)                                              ),
+    "ease-inout-pow5":         (concat(ease_in(5.0), ease_out(5.0)),         inverse_concat(inverse_ease_in(5.0), inverse_ease_out(5.0))        ),
+
+    "ease-in-cosine":          (first_half(ease_inout_cosine()),             inverse_first_half(inverse_ease_inout_cosine())                    ),
+    "ease-out-cosine":         (second_half(ease_inout_cosine()),            inverse_second_half(inverse_ease_inout_cosine())                   ),
+    "ease-inout-cosine":       (ease_inout_cosine(),                         inverse_ease_inout_cosine()                                        ),
+
+    "ease-in-circle":          (ease_in_circle(),                            inverse_ease_in_circle()                                           ),
+    "ease-out-circle":         (ease_out_circle(),                           inverse_ease_out_circle()                                          ),
+    "ease-inout-circle":       (concat(ease_in_circle(), ease_out_circle()), inverse_concat(inverse_ease_in_circle(), inverse_ease_out_circle())),
+}
 
 easing_functions = {
-    "ease-inout-linear":       ease_inout_linear(),
-    "ease-inout-smoothstep":   ease_inout_smoothstep(),
-    "ease-inout-smootherstep": ease_inout_smootherstep(),
+    easing_function_name: easing(scalar_math)
+    for (easing_function_name, (easing, inverse_easing)) in easing_definitions.items()
+}
 
-    "ease-in-pow2":            ease_in(2.0),
-    "ease-out-pow2":           ease_out(2.0),
-    "ease-inout-pow2":         concat(ease_in(2.0), ease_out(2.0)),
+inverse_easing_functions = {
+    easing_function_name: inverse_easing(scalar_math)
+    for (easing_function_name, (easing, inverse_easing)) in easing_definitions.items()
+}
 
-    "ease-in-pow3":            ease_in(3.0),
-    "ease-out-pow3":           ease_out(3.0),
-    "ease-inout-pow3":         concat(ease_in(3.0), ease_out(3.0)),
+################################################################################
+# Easing curves
+#
+# Besides the registered easing functions, an easing function name can also
+# describe a curve of one of these kinds:
+#
+#   cubic-bezier(x1,y1,x2,y2)    CSS timing function
+#   keyframes(t:position,...)    monotone cubic through the keyframes, which
+#                                have to run from t = 0 to t = 1
+#
+# Curves are compiled once per parameter set into a closure like any other
+# easing function. Cubic beziers solve x(t) = t with a sampled table of x for
+# the starting guess, a few Newton steps and bisection as the fallback.
+
+bezier_table_size = 64
+bezier_precision = 1e-9
+
+@cache
+def cubic_bezier(x1, y1, x2, y2):
+    if not (0.0 <= x1 <= 1.0 and 0.0 <= x2 <= 1.0):
+        raise ValueError("cubic-bezier x coordinates must be within [0, 1]")
+
+    # Polynomial coefficients of the curve with P0 = (0, 0) and P3 = (1, 1)
+    cx = 3.0 * x1
+    bx = 3.0 * (x2 - x1) - cx
+    ax = 1.0 - cx - bx
+    cy = 3.0 * y1
+    by = 3.0 * (y2 - y1) - cy
+    ay = 1.0 - cy - by
+
+    def bezier_x(s):
+        return ((ax * s + bx) * s + cx) * s
+
+    def bezier_dx(s):
+        return (3.0 * ax * s + 2.0 * bx) * s + cx
+
+    def bezier_y(s):
+        return ((ay * s + by) * s + cy) * s
+
+    x_table = [bezier_x(i / bezier_table_size) for i in range(0, bezier_table_size + 1)]
+
+    def solve_s(x):
+        i = min(max(1, bisect_left(x_table, x)), bezier_table_size)
+        s_low, s_high = (i - 1) / bezier_table_size, i / bezier_table_size
+
+        x_span = x_table[i] - x_table[i - 1]
+        s = s_low + (x - x_table[i - 1]) / x_span * (s_high - s_low) if x_span > 0 else s_low
+
+        for _ in range(0, 8):
+            x_error = bezier_x(s) - x
+            if abs(x_error) < bezier_precision:
+                return s
+            slope = bezier_dx(s)
+            if slope < 1e-6:
+                break
+            s -= x_error / slope
+            if not s_low <= s <= s_high:
+                break
+
+        while s_high - s_low > bezier_precision:
+            s = (s_low + s_high) / 2.0
+            if bezier_x(s) < x:
+                s_low = s
+            else:
+                s_high = s
+        return (s_low + s_high) / 2.0
 
-    "ease-in-pow4":            ease_in(4.0),
-    "ease-out-pow4":           ease_out(4.0),
-    "ease-inout-pow4":         concat(ease_in(4.0), ease_out(4.0)),
+    def inner(t):
+        if t <= 0.0:
+            return 0.0
+        if t >= 1.0:
+            return 1.0
+        return bezier_y(solve_s(t))
+    return inner
 
-    "ease-in-pow5":            ease_in(5.0),
-    "ease-out-pow5":           ease_out(5.0),
-    "ease-inout-pow5":         concat(ease_in(5.0), ease_out(5.0)),
+@cache
+def keyframes(keyframe_points):
+    keyframe_t = [t for (t, position) in keyframe_points]
+    keyframe_positions = [position for (t, position) in keyframe_points]
+
+    if len(keyframe_points) < 2 or keyframe_t[0] != 0.0 or keyframe_t[-1] != 1.0:
+        raise ValueError("keyframes have to run from t = 0 to t = 1")
+    if any(t_a >= t_b for (t_a, t_b) in zip(keyframe_t[:-1], keyframe_t[1:])):
+        raise ValueError("keyframe times have to be increasing")
+
+    # Fritsch-Carlson tangents keep the curve monotone between keyframes
+    secants = [
+        (position_b - position_a) / (t_b - t_a)
+        for (t_a, t_b, position_a, position_b) in zip(keyframe_t[:-1], keyframe_t[1:], keyframe_positions[:-1], keyframe_positions[1:])
+    ]
+    tangents = [secants[0]] + [
+        0.0 if secant_a * secant_b <= 0.0 else (secant_a + secant_b) / 2.0
+        for (secant_a, secant_b) in zip(secants[:-1], secants[1:])
+    ] + [secants[-1]]
+    for (k, secant) in enumerate(secants):
+        if secant == 0.0:
+            tangents[k] = tangents[k + 1] = 0.0
+            continue
+        a, b = tangents[k] / secant, tangents[k + 1] / secant
+        if a * a + b * b > 9.0:
+            tau = 3.0 / sqrt(a * a + b * b)
+            tangents[k], tangents[k + 1] = tau * a * secant, tau * b * secant
 
-    "ease-in-cosine":          first_half(ease_inout_cosine()),
-    "ease-out-cosine":         second_half(ease_inout_cosine()),
-    "ease-inout-cosine":       ease_inout_cosine(),
+    def inner(t):
+        k = min(max(bisect_right(keyframe_t, t) - 1, 0), len(secants) - 1)
+        h = keyframe_t[k + 1] - keyframe_t[k]
+        s = (t - keyframe_t[k]) / h
+        return (
+            (2 * s ** 3 - 3 * s ** 2 + 1) * keyframe_positions[k]
+            + (s ** 3 - 2 * s ** 2 + s) * h * tangents[k]
+            + (-2 * s ** 3 + 3 * s ** 2) * keyframe_positions[k + 1]
+            + (s ** 3 - s ** 2) * h * tangents[k + 1]
+        )
+    return inner
 
-    "ease-in-circle":          ease_in_circle(),
-    "ease-out-circle":         ease_out_circle(),
-    "ease-inout-circle":       concat(ease_in_circle(), ease_out_circle()),
+def parse_cubic_bezier(curve_params):
+    control_points = [float(param) for param in curve_params.split(",")]
+    if len(control_points) != 4:
+        raise ValueError("cubic-bezier takes four parameters")
+    return cubic_bezier(*control_points)
+
+def parse_keyframes(curve_params):
+    return keyframes(tuple(
+        (float(t), float(position))
+        for (t, position) in (keyframe.split(":") for keyframe in curve_params.split(","))
+    ))
+
+easing_function_kinds = {
+    "cubic-bezier": parse_cubic_bezier,
+    "keyframes":    parse_keyframes,
 }
 
+def lookup_easing_function(easing_function_name):
+    if easing_function_name in easing_functions:
+        return easing_functions[easing_function_name]
+
+    curve_match = re.fullmatch(r"\s*([\w-]+)\((.*)\)\s*", easing_function_name)
+    if not curve_match or curve_match.group(1) not in easing_function_kinds:
+        raise KeyError(easing_function_name)
+    return easing_function_kinds[curve_match.group(1)](re.sub(r"\s+", "", curve_match.group(2)))
+
+################################################################################
+# Easing function lookup
+#
+# Curves have no closed form inverse and are inverted through a table of their
+# own. They have no array counterpart either and are evaluated element by
+# element.
+
+@cache
+def lookup_inverse_easing_function(easing_function_name):
+    if easing_function_name in inverse_easing_functions:
+        return inverse_easing_functions[easing_function_name]
+    return tabulated_inverse(lookup_easing_function(easing_function_name))
+
+def as_float_array(array_function):
+    import numpy as np
+    return lambda t: array_function(np.asarray(t, dtype = np.float64))
+
+@cache
+def create_array_easing_functions():
+    return {
+        easing_function_name: as_float_array(easing(array_math()))
+        for (easing_function_name, (easing, inverse_easing)) in easing_definitions.items()
+    }
+
+@cache
+def create_array_inverse_easing_functions():
+    return {
+        easing_function_name: as_float_array(inverse_easing(array_math()))
+        for (easing_function_name, (easing, inverse_easing)) in easing_definitions.items()
+    }
+
+def lookup_array_easing_function(easing_function_name):
+    array_easing_functions = create_array_easing_functions()
+    if easing_function_name in array_easing_functions:
+        return array_easing_functions[easing_function_name]
+
+    import numpy as np
+    return np.vectorize(lookup_easing_function(easing_function_name), otypes = [np.float64])
+
+def lookup_array_inverse_easing_function(easing_function_name):
+    array_inverse_easing_functions = create_array_inverse_easing_functions()
+    if easing_function_name in array_inverse_easing_functions:
+        return array_inverse_easing_functions[easing_function_name]
+
+    import numpy as np
+    return np.vectorize(lookup_inverse_easing_function(easing_function_name), otypes = [np.float64])
+
 ################################################################################
 # SVG circle arc helpers
 
@@ -91,184 +447,154 @@ def svg_circle_arc_point(arc_degrees, arc_radius):
         288 - sin(radians(arc_degrees)) * arc_radius,
     )
 
-def svg_circle_arc(style_class, arc_degrees, arc_radius):
-    arc_resolution = 9
+def svg_circle_arc(svg_writer, style_class, arc_degrees, arc_radius):
+    # Elliptical arc commands are exact, so no tolerance applies here. The arc
+    # only gets split so that no segment comes close to the 180 degree limit
+    # where the large-arc flag would become ambiguous.
+    arc_segments = max(1, ceil(abs(arc_degrees) / 90))
 
     x, y = svg_circle_arc_point(0, arc_radius)
-    arc_path_data = "M{x} {y}".format(
-        x = format_float(x),
-        y = format_float(y),
-    )
+    arc_path_data = ["M{x} {y}".format(
+        x = svg_writer.format_value(x),
+        y = svg_writer.format_value(y),
+    )]
+
+    for l in range(1, arc_segments + 1):
+        x, y = svg_circle_arc_point(l / arc_segments * arc_degrees, arc_radius)
+        arc_path_data.append(" A {arc_radius} {arc_radius} 0 0 0 {x} {y}".format(
+            arc_radius = svg_writer.format_value(arc_radius),
+            x = svg_writer.format_value(x),
+            y = svg_writer.format_value(y),
+        ))
 
-    for l in range(0, arc_resolution):
-        x, y = svg_circle_arc_point(l / (arc_resolution - 1) * arc_degrees, arc_radius)
-        arc_path_data += " A {arc_radius} {arc_radius} 0 0 0 {x} {y}".format(
-            arc_radius = format_float(arc_radius),
-            x = format_float(x),
-            y = format_float(y),
+    svg_writer.element("path", class_ = style_class, d = "".join(arc_path_data))
+
+################################################################################
+# Adaptive curve sampling
+
+default_tolerance = 0.1
+
+def adaptive_curve_points(curve_point, tolerance, max_depth = 16):
+    # Recursively halves [0, 1] until the curve stays within tolerance (in
+    # output units) of the chord between the interval ends. Three probes per
+    # interval keep S-shaped spans, whose midpoint lies on the chord, from
+    # passing as flat.
+    def chord_deviation(point, chord_start, chord_end):
+        (px, py), (ax, ay), (bx, by) = point, chord_start, chord_end
+        chord_length = sqrt((bx - ax) ** 2 + (by - ay) ** 2)
+        if chord_length == 0.0:
+            return sqrt((px - ax) ** 2 + (py - ay) ** 2)
+        return abs((bx - ax) * (ay - py) - (ax - px) * (by - ay)) / chord_length
+
+    def subdivide(t0, p0, t1, p1, depth):
+        is_flat = all(
+            chord_deviation(curve_point(t0 + (t1 - t0) * probe), p0, p1) <= tolerance
+            for probe in [0.25, 0.5, 0.75]
         )
+        if is_flat or depth == max_depth:
+            return
 
-    return '<path class="{}" d="{}" />'.format(style_class, arc_path_data)
+        tm = (t0 + t1) / 2
+        pm = curve_point(tm)
+        yield from subdivide(t0, p0, tm, pm, depth + 1)
+        yield pm
+        yield from subdivide(tm, pm, t1, p1, depth + 1)
+
+    p0, p1 = curve_point(0.0), curve_point(1.0)
+    yield p0
+    yield from subdivide(0.0, p0, 1.0, p1, 0)
+    yield p1
 
 ################################################################################
 # SVG document generators
 
-def create_svg_ruler_simple_straight(easing_function, **kwargs):
+def create_svg_ruler_simple_straight(svg_writer, easing_function, **kwargs):
     ruler_frames = kwargs["ruler_frames"]
 
-    svg_contents = ""
-    for t in map(lambda line: line / (ruler_frames - 1), range(0, ruler_frames)):
-        svg_contents += '<line class="primary" x1="{x}" y1="0" x2="{x}" y2="24" />'.format(
-            x = format_float(easing_function(t) * 576),
-        )
+    with svg_writer.document(576, 24), svg_writer.group("ruler"):
+        svg_writer.element("line", class_ = "primary", x1 = 0, y1 = 12, x2 = 576, y2 = 12)
 
-    return dedent("""\
-        <svg width="576" height="24" viewBox="0 0 576 24" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="ruler">
-                <line class="primary" x1="0" y1="12" x2="576" y2="12" />
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        svg_contents,
-    )
+        with svg_writer.row():
+            for t in map(lambda line: line / (ruler_frames - 1), range(0, ruler_frames)):
+                x = easing_function(t) * 576
+                svg_writer.element("line", class_ = "primary", x1 = x, y1 = 0, x2 = x, y2 = 24)
 
-def create_svg_ruler_simple_radial(easing_function, **kwargs):
+def create_svg_ruler_simple_radial(svg_writer, easing_function, **kwargs):
     ruler_frames = kwargs["ruler_frames"]
     ruler_degrees = kwargs["ruler_degrees"]
 
     ruler_outer_radius = 288
     ruler_tick_size = 24
 
-    svg_contents = ""
-
-    svg_contents += svg_circle_arc("primary", ruler_degrees, ruler_outer_radius)
+    with svg_writer.document(576, 576), svg_writer.group("ruler"), svg_writer.row():
+        svg_circle_arc(svg_writer, "primary", ruler_degrees, ruler_outer_radius)
 
-    for l in range(0, ruler_frames):
-        arc_degrees = easing_function(l / (ruler_frames - 1)) * ruler_degrees
-        x1, y1 = svg_circle_arc_point(arc_degrees, ruler_outer_radius - ruler_tick_size / 2)
-        x2, y2 = svg_circle_arc_point(arc_degrees, ruler_outer_radius + ruler_tick_size / 2)
-        svg_contents += '<line class="primary" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" />'.format(
-            x1 = format_float(x1),
-            y1 = format_float(y1),
-            x2 = format_float(x2),
-            y2 = format_float(y2),
-        )
-
-    return dedent("""\
-        <svg width="576" height="576" viewBox="0 0 576 576" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="ruler">
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        svg_contents,
-    )
+        for l in range(0, ruler_frames):
+            arc_degrees = easing_function(l / (ruler_frames - 1)) * ruler_degrees
+            x1, y1 = svg_circle_arc_point(arc_degrees, ruler_outer_radius - ruler_tick_size / 2)
+            x2, y2 = svg_circle_arc_point(arc_degrees, ruler_outer_radius + ruler_tick_size / 2)
+            svg_writer.element("line", class_ = "primary", x1 = x1, y1 = y1, x2 = x2, y2 = y2)
 
-def create_svg_ruler_printable_straight(easing_function, **kwargs):
+def create_svg_ruler_printable_straight(svg_writer, easing_function, **kwargs):
     ruler_frames = kwargs["ruler_frames"]
 
-    svg_contents = ""
-    for t in map(lambda line: line / (ruler_frames - 1), range(1, ruler_frames - 1)):
-        svg_contents += '<line class="primary" x1="{x}" y1="0" x2="288" y2="384" />'.format(
-            x = format_float(easing_function(t) * 576),
-        )
+    with svg_writer.document(576, 384), svg_writer.group("ruler"):
+        svg_writer.element("polygon", class_ = "primary", points = "0,0 576,0 288,384")
 
-    for t in map(lambda line: line / 12, range(1, 12)):
-        svg_contents += '<line class="secondary" x1="{x1}" y1="{y}" x2="{x2}" y2="{y}" />'.format(
-            x1 = format_float(t * 288),
-            x2 = format_float(576 - (t * 288)),
-            y = format_float(t * 384),
-        )
-    svg_contents += '<line class="secondary" x1="288" y1="0" x2="288" y2="384" />'
-
-    return dedent("""\
-        <svg width="576" height="384" viewBox="0 0 576 384" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="ruler">
-                <polygon class="primary" points="0,0 576,0 288,384" />
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        svg_contents,
-    )
+        with svg_writer.row():
+            for t in map(lambda line: line / (ruler_frames - 1), range(1, ruler_frames - 1)):
+                svg_writer.element("line", class_ = "primary", x1 = easing_function(t) * 576, y1 = 0, x2 = 288, y2 = 384)
+
+            for t in map(lambda line: line / 12, range(1, 12)):
+                svg_writer.element("line", class_ = "secondary", x1 = t * 288, y1 = t * 384, x2 = 576 - (t * 288), y2 = t * 384)
+            svg_writer.element("line", class_ = "secondary", x1 = 288, y1 = 0, x2 = 288, y2 = 384)
 
-def create_svg_ruler_printable_radial(easing_function, **kwargs):
+def create_svg_ruler_printable_radial(svg_writer, easing_function, **kwargs):
     ruler_frames = kwargs["ruler_frames"]
     ruler_degrees = kwargs["ruler_degrees"]
 
     ruler_inner_radius = 22.5
     ruler_outer_radius = 288
 
-    svg_contents = ""
-
-    svg_contents += svg_circle_arc("primary", ruler_degrees, ruler_outer_radius)
-    for l in range(1, 6):
-        svg_contents += svg_circle_arc("secondary", ruler_degrees, (l / 6) * ruler_outer_radius)
-
-    for l in range(0, ruler_frames):
-        arc_degrees = easing_function(l / (ruler_frames - 1)) * ruler_degrees
-        x1, y1 = svg_circle_arc_point(arc_degrees, ruler_inner_radius)
-        x2, y2 = svg_circle_arc_point(arc_degrees, ruler_outer_radius)
-        svg_contents += '<line class="primary" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" />'.format(
-            x1 = format_float(x1),
-            y1 = format_float(y1),
-            x2 = format_float(x2),
-            y2 = format_float(y2),
+    with svg_writer.document(576, 576), svg_writer.group("ruler"):
+        svg_writer.element("circle", class_ = "secondary", cx = 288, cy = 288, r = 288)
+        svg_writer.element("circle", class_ = "primary", cx = 288, cy = 288, r = 9)
+        svg_writer.element("circle", class_ = "primary", cx = 288, cy = 288, r = 22.5)
+        svg_writer.element("line", class_ = "primary", x1 = 270, y1 = 288, x2 = 306, y2 = 288)
+        svg_writer.element("line", class_ = "primary", x1 = 288, y1 = 270, x2 = 288, y2 = 306)
+
+        with svg_writer.row():
+            svg_circle_arc(svg_writer, "primary", ruler_degrees, ruler_outer_radius)
+            for l in range(1, 6):
+                svg_circle_arc(svg_writer, "secondary", ruler_degrees, (l / 6) * ruler_outer_radius)
+
+            for l in range(0, ruler_frames):
+                arc_degrees = easing_function(l / (ruler_frames - 1)) * ruler_degrees
+                x1, y1 = svg_circle_arc_point(arc_degrees, ruler_inner_radius)
+                x2, y2 = svg_circle_arc_point(arc_degrees, ruler_outer_radius)
+                svg_writer.element("line", class_ = "primary", x1 = x1, y1 = y1, x2 = x2, y2 = y2)
+
+def create_svg_function_graph(svg_writer, easing_function, **kwargs):
+    tolerance = kwargs.get("tolerance", default_tolerance)
+
+    polyline_data = "".join(
+        "{x},{y} ".format(
+            x = svg_writer.format_value(x),
+            y = svg_writer.format_value(y),
         )
-
-    return dedent("""\
-        <svg width="576" height="576" viewBox="0 0 576 576" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="ruler">
-                <circle class="secondary" cx="288" cy="288" r="288" />
-                <circle class="primary" cx="288" cy="288" r="9" />
-                <circle class="primary" cx="288" cy="288" r="22.5" />
-                <line class="primary" x1="270" y1="288" x2="306" y2="288" />
-                <line class="primary" x1="288" y1="270" x2="288" y2="306" />
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        svg_contents,
+        for (x, y) in adaptive_curve_points(lambda t: (t * 576, 576 - easing_function(t) * 576), tolerance)
     )
 
-def create_svg_function_graph(easing_function, **kwargs):
-    polyline_resolution = 64
+    with svg_writer.document(576, 576), svg_writer.group("ruler"):
+        svg_writer.element("line", class_ = "secondary", x1 = 0, y1 = 0, x2 = 0, y2 = 576)
+        svg_writer.element("line", class_ = "secondary", x1 = 288, y1 = 0, x2 = 288, y2 = 576)
+        svg_writer.element("line", class_ = "secondary", x1 = 576, y1 = 0, x2 = 576, y2 = 576)
+        svg_writer.element("line", class_ = "secondary", x1 = 0, y1 = 0, x2 = 576, y2 = 0)
+        svg_writer.element("line", class_ = "secondary", x1 = 0, y1 = 288, x2 = 576, y2 = 288)
+        svg_writer.element("line", class_ = "secondary", x1 = 0, y1 = 576, x2 = 576, y2 = 576)
 
-    polyline_data = ""
-    for t in map(lambda p: p / polyline_resolution, range(0, polyline_resolution + 1)):
-        polyline_data += "{x},{y} ".format(
-            x = format_float(t * 576),
-            y = format_float(576 - easing_function(t) * 576),
-        )
-
-    svg_contents = '<polyline class="primary" points="{}" />'.format(polyline_data)
-
-    return dedent("""\
-        <svg width="576" height="576" viewBox="0 0 576 576" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="ruler">
-                <line class="secondary" x1="0" y1="0" x2="0" y2="576" />
-                <line class="secondary" x1="288" y1="0" x2="288" y2="576" />
-                <line class="secondary" x1="576" y1="0" x2="576" y2="576" />
-                <line class="secondary" x1="0" y1="0" x2="576" y2="0" />
-                <line class="secondary" x1="0" y1="288" x2="576" y2="288" />
-                <line class="secondary" x1="0" y1="576" x2="576" y2="576" />
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        svg_contents,
-    )
+        with svg_writer.row():
+            svg_writer.element("polyline", class_ = "primary", points = polyline_data)
 
 create_svg_constructors = {
     "simple-straight":    create_svg_ruler_simple_straight,
@@ -281,141 +607,227 @@ create_svg_constructors = {
 ################################################################################
 # SVG file writers
 
-def write_svg_ruler_simple_straight(easing_function_name, easing_function, ruler_frames):
-    svg_path = "rulers/inbetweening/simple-straight/{}/ruler-simple-straight-{}-{}f.svg".format(
-        easing_function_name,
-        easing_function_name,
-        ruler_frames,
-    )
-
-    svg_document = create_svg_ruler_simple_straight(
-        easing_function,
-        ruler_frames = ruler_frames,
-    )
-
-    os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-    with open(svg_path, "w") as svg_file:
-        svg_file.write(svg_document)
+ruler_degrees_presets = [90, 120, 180, 240, 270, 360]
+
+def svg_ruler_path(ruler_name, easing_function_name, ruler_frames, ruler_degrees):
+    match ruler_name:
+        case "simple-straight" | "printable-straight":
+            return "rulers/inbetweening/{0}/{1}/ruler-{0}-{1}-{2}f.svg".format(
+                ruler_name,
+                easing_function_name,
+                ruler_frames,
+            )
+        case "simple-radial" | "printable-radial":
+            return "rulers/inbetweening/{0}/{1}/{3}deg/ruler-{0}-{1}-{3}deg-{2}f.svg".format(
+                ruler_name,
+                easing_function_name,
+                ruler_frames,
+                ruler_degrees,
+            )
+        case "function-graph":
+            return "rulers/inbetweening/function-graphs/{}.svg".format(
+                easing_function_name,
+            )
+
+def svg_ruler_jobs():
+    # (ruler_name, easing_function_name, ruler_frames, ruler_degrees)
+    for ruler_name in ["simple-straight", "simple-radial", "printable-straight", "printable-radial"]:
+        for easing_function_name in easing_functions.keys():
+            for ruler_frames in range(4, 11):
+                if ruler_name.endswith("-radial"):
+                    for ruler_degrees in ruler_degrees_presets:
+                        yield (ruler_name, easing_function_name, ruler_frames, ruler_degrees)
+                else:
+                    yield (ruler_name, easing_function_name, ruler_frames, None)
 
-def write_svg_ruler_printable_straight(easing_function_name, easing_function, ruler_frames):
-    svg_path = "rulers/inbetweening/printable-straight/{}/ruler-printable-straight-{}-{}f.svg".format(
-        easing_function_name,
-        easing_function_name,
-        ruler_frames,
-    )
+    for easing_function_name in easing_functions.keys():
+        yield ("function-graph", easing_function_name, None, None)
 
-    svg_document = create_svg_ruler_printable_straight(
-        easing_function,
-        ruler_frames = ruler_frames,
-    )
+def render_svg_ruler(svg_ruler_job, tolerance = default_tolerance, writer_options = None, stylesheet_path = None, preview_size = None):
+    # Jobs only carry names so they can be pickled into worker processes,
+    # the easing closures are looked up on the receiving side. Returns the
+    # ruler document and, with a preview size, its PNG preview.
+    ruler_name, easing_function_name, ruler_frames, ruler_degrees = svg_ruler_job
 
-    os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-    with open(svg_path, "w") as svg_file:
-        svg_file.write(svg_document)
-
-def write_svg_ruler_simple_radial(easing_function_name, easing_function, ruler_frames, ruler_degrees):
-    svg_path = "rulers/inbetweening/simple-radial/{}/{}deg/ruler-simple-radial-{}-{}deg-{}f.svg".format(
-        easing_function_name,
-        ruler_degrees,
-        easing_function_name,
-        ruler_degrees,
-        ruler_frames,
-    )
+    svg_path = svg_ruler_path(ruler_name, easing_function_name, ruler_frames, ruler_degrees)
 
-    svg_document = create_svg_ruler_simple_radial(
-        easing_function,
-        ruler_frames = ruler_frames,
-        ruler_degrees = ruler_degrees,
-    )
+    writer_options = dict(writer_options or {})
+    if stylesheet_path:
+        writer_options["stylesheet_href"] = stylesheet_href(stylesheet_path, svg_path)
 
-    os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-    with open(svg_path, "w") as svg_file:
-        svg_file.write(svg_document)
-
-def write_svg_ruler_printable_radial(easing_function_name, easing_function, ruler_frames, ruler_degrees):
-    svg_path = "rulers/inbetweening/printable-radial/{}/{}deg/ruler-printable-radial-{}-{}deg-{}f.svg".format(
-        easing_function_name,
-        ruler_degrees,
-        easing_function_name,
-        ruler_degrees,
-        ruler_frames,
-    )
+    easing_function = lookup_easing_function(easing_function_name)
+    if generator_profile.enabled:
+        easing_function = generator_profile.timed("easing", easing_function)
 
-    svg_document = create_svg_ruler_printable_radial(
-        easing_function,
+    svg_constructor_args = dict(
+        easing_function = easing_function,
         ruler_frames = ruler_frames,
         ruler_degrees = ruler_degrees,
+        tolerance = tolerance,
     )
 
-    os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-    with open(svg_path, "w") as svg_file:
-        svg_file.write(svg_document)
-
-def write_svg_function_graph(easing_function_name, easing_function):
-    svg_path = "rulers/inbetweening/function-graphs/{}.svg".format(
-        easing_function_name,
+    ruler_outputs = [(svg_path, render_svg_document(
+        create_svg_constructors[ruler_name],
+        writer_options = writer_options,
+        **svg_constructor_args,
+    ))]
+
+    if preview_size:
+        from svg_raster import render_png_document
+        ruler_outputs.append((preview_path(svg_path), render_png_document(
+            create_svg_constructors[ruler_name],
+            size = preview_size,
+            **svg_constructor_args,
+        )))
+
+    return ruler_outputs
+
+def preview_path(svg_path):
+    return svg_path.removesuffix(".svg") + ".png"
+
+def write_svg_rulers(svg_ruler_jobs, jobs, force = False, tolerance = default_tolerance, writer_options = None, stylesheet_path = None, output_target = "tree", preview_size = None):
+    source_digest = generator_source_digest(__file__)
+
+    def output_paths_for(svg_ruler_job):
+        svg_path = svg_ruler_path(*svg_ruler_job)
+        return [svg_path, preview_path(svg_path)] if preview_size else [svg_path]
+
+    def inputs_digest_for(svg_ruler_job):
+        return generator_inputs_digest(source_digest, svg_ruler_job, tolerance, writer_options, stylesheet_path, preview_size)
+
+    write_batch(
+        svg_ruler_jobs, jobs, output_paths_for, inputs_digest_for,
+        partial(
+            render_svg_ruler,
+            tolerance = tolerance,
+            writer_options = writer_options,
+            stylesheet_path = stylesheet_path,
+            preview_size = preview_size,
+        ),
+        force = force,
+        output_target = output_target,
+        extra_outputs = [(stylesheet_path, svg_stylesheet())] if stylesheet_path else [],
     )
 
-    svg_document = create_svg_function_graph(
-        easing_function,
-    )
-
-    os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-    with open(svg_path, "w") as svg_file:
-        svg_file.write(svg_document)
-
 ################################################################################
 # Main
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--command",              type = str,                              )
-parser.add_argument("--target",               type = str,   default = "stdout"         )
-parser.add_argument("--easing-function-name", type = str,   default = "ease-inout-pow2")
-parser.add_argument("--ruler-name",           type = str,   default = "simple-straight")
-parser.add_argument("--ruler-frames",         type = int,   default = "8"              )
-parser.add_argument("--ruler-degrees",        type = float, default = "360"            )
-
-args = parser.parse_args()
-
-match args.command:
-    case "create-svg":
-        svg_document = create_svg_constructors[args.ruler_name](
-            easing_function = easing_functions[args.easing_function_name],
-            ruler_frames = args.ruler_frames,
-            ruler_degrees = args.ruler_degrees,
-        )
-        match args.target:
-            case "stdout":
-                print(svg_document)
-            case "clipboard":
-                copy_to_clipboard(svg_document, "image/svg+xml")
-
-    case "query-easing-function-names":
-        for (easing_function_name, easing_function) in easing_functions.items():
-            print(easing_function_name)
-
-    case "query-ruler-names":
-        for (ruler_name, ruler_constructor) in create_svg_constructors.items():
-            print(ruler_name)
-
-    case None:
-        for (easing_function_name, easing_function) in easing_functions.items():
-            for ruler_frames in range(4, 11):
-                write_svg_ruler_simple_straight(easing_function_name, easing_function, ruler_frames)
-
-        for (easing_function_name, easing_function) in easing_functions.items():
-            for ruler_frames in range(4, 11):
-                for ruler_degrees in [90, 120, 180, 240, 270, 360]:
-                    write_svg_ruler_simple_radial(easing_function_name, easing_function, ruler_frames, ruler_degrees)
-
-        for (easing_function_name, easing_function) in easing_functions.items():
-            for ruler_frames in range(4, 11):
-                write_svg_ruler_printable_straight(easing_function_name, easing_function, ruler_frames)
-
-        for (easing_function_name, easing_function) in easing_functions.items():
-            for ruler_frames in range(4, 11):
-                for ruler_degrees in [90, 120, 180, 240, 270, 360]:
-                    write_svg_ruler_printable_radial(easing_function_name, easing_function, ruler_frames, ruler_degrees)
-
-        for (easing_function_name, easing_function) in easing_functions.items():
-            write_svg_function_graph(easing_function_name, easing_function)
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",              type = str,                              )
+    parser.add_argument("--target",               type = str,   default = "stdout"         )
+    parser.add_argument("--easing-function-name", type = str,   default = "ease-inout-pow2")
+    parser.add_argument("--ruler-name",           type = str,   default = "simple-straight")
+    parser.add_argument("--ruler-frames",         type = int,   default = "8"              )
+    parser.add_argument("--ruler-degrees",        type = float, default = "360"            )
+    parser.add_argument("--tolerance",            type = float, default = default_tolerance)
+    parser.add_argument("--samples",              type = int,   default = "65"             )
+    parser.add_argument("--positions",            type = str,                              )
+    parser.add_argument("--compact",              action = "store_true"                    )
+    parser.add_argument("--precision",            type = int,   default = "3"              )
+    parser.add_argument("--stylesheet",           type = str,                              )
+    parser.add_argument("--jobs",                 type = int,   default = "1"              )
+    parser.add_argument("--force",                action = "store_true"                    )
+    parser.add_argument("--output-target",        type = str,   default = "tree"           )
+    parser.add_argument("--previews",             action = "store_true"                    )
+    parser.add_argument("--preview-size",         type = int,   default = "256"            )
+
+    args = parser.parse_args(argv)
+
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    match args.command:
+        case "create-svg":
+            svg_constructor_args = dict(
+                easing_function = lookup_easing_function(args.easing_function_name),
+                ruler_frames = args.ruler_frames,
+                ruler_degrees = args.ruler_degrees,
+                tolerance = args.tolerance,
+            )
+            writer_options["stylesheet_href"] = args.stylesheet
+            match args.target:
+                case "stdout":
+                    create_svg_constructors[args.ruler_name](SvgWriter(sys.stdout, **writer_options), **svg_constructor_args)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(create_svg_constructors[args.ruler_name], writer_options = writer_options, **svg_constructor_args)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "create-png":
+            from svg_raster import render_png_document
+            png_document = render_png_document(
+                create_svg_constructors[args.ruler_name],
+                size = args.preview_size,
+                easing_function = lookup_easing_function(args.easing_function_name),
+                ruler_frames = args.ruler_frames,
+                ruler_degrees = args.ruler_degrees,
+                tolerance = args.tolerance,
+            )
+            match args.target:
+                case "stdout":
+                    sys.stdout.buffer.write(png_document)
+                case "clipboard":
+                    copy_to_clipboard(png_document, "image/png")
+
+        case "sample-easing-function":
+            import numpy as np
+            t = np.linspace(0.0, 1.0, args.samples)
+            easing_values = lookup_array_easing_function(args.easing_function_name)(t)
+
+            samples_document = "t,value\n" + "".join(
+                "{},{}\n".format(format_float(t, 6), format_float(easing_value, 6))
+                for (t, easing_value) in zip(t.tolist(), easing_values.tolist())
+            )
+            match args.target:
+                case "stdout":
+                    print(samples_document, end = "")
+                case "clipboard":
+                    copy_to_clipboard(samples_document, "text/csv")
+
+        case "invert-easing-function":
+            import numpy as np
+            if args.positions:
+                positions = np.array([float(position) for position in args.positions.split(",")])
+            else:
+                positions = np.linspace(0.0, 1.0, args.samples)
+            inverse_values = lookup_array_inverse_easing_function(args.easing_function_name)(positions)
+
+            inverse_document = "position,t\n" + "".join(
+                "{},{}\n".format(format_float(position, 6), format_float(t, 9))
+                for (position, t) in zip(positions.tolist(), inverse_values.tolist())
+            )
+            match args.target:
+                case "stdout":
+                    print(inverse_document, end = "")
+                case "clipboard":
+                    copy_to_clipboard(inverse_document, "text/csv")
+
+        case "query-easing-function-names":
+            for (easing_function_name, easing_function) in easing_functions.items():
+                print(easing_function_name)
+
+        case "query-easing-function-kinds":
+            for (easing_function_kind, easing_function_parser) in easing_function_kinds.items():
+                print(easing_function_kind)
+
+        case "query-ruler-names":
+            for (ruler_name, ruler_constructor) in create_svg_constructors.items():
+                print(ruler_name)
+
+        case None:
+            write_svg_rulers(
+                svg_ruler_jobs(),
+                args.jobs,
+                args.force,
+                args.tolerance,
+                writer_options,
+                args.stylesheet,
+                args.output_target,
+                args.preview_size if args.previews else None,
+            )
+
+if __name__ == "__main__":
+    profile_main(main)
@@ -2,9 +2,12 @@
 
 import argparse
 import os
-from textwrap import dedent
+import sys
+from array import array
+from functools import cache
 
-from svg_utils import copy_to_clipboard
+from svg_utils import SvgWriter, render_svg_document, write_output_file, copy_to_clipboard, profile_main
+from svg_utils import engine_directory, generator_source_digest
 
 ################################################################################
 # Constants
@@ -30,81 +33,136 @@ svg_style = """
 ################################################################################
 #  Fiducial - xt16bfm
 
-def xt16bfm_canonicalize(value):
-    def rotate(value):
-        result = 0
-        for [index_a, index_b] in enumerate([6, 7, 0, 1, 2, 3, 4, 5]):
-            tmp = (value >> (index_b * 2)) & 0b11
-            tmp = (tmp + 1) & 0b11
-            result |= (tmp << (index_a * 2))
-        return result
-
-    def mirror(value):
-        result = 0
-        for [index_a, index_b] in enumerate([2, 1, 0, 7, 6, 5, 4, 3]):
-            tmp = (value >> (index_b * 2)) & 0b11
-            tmp = tmp ^ 0b01
-            result |= (tmp << (index_a * 2))
-        return result
-
-    return min([
+xt16bfm_table_path = os.path.join(engine_directory, ".cache", "fiducial-xt16bfm-canonical.bin")
+
+def xt16bfm_rotate(value):
+    result = 0
+    for [index_a, index_b] in enumerate([6, 7, 0, 1, 2, 3, 4, 5]):
+        tmp = (value >> (index_b * 2)) & 0b11
+        tmp = (tmp + 1) & 0b11
+        result |= (tmp << (index_a * 2))
+    return result
+
+def xt16bfm_mirror(value):
+    result = 0
+    for [index_a, index_b] in enumerate([2, 1, 0, 7, 6, 5, 4, 3]):
+        tmp = (value >> (index_b * 2)) & 0b11
+        tmp = tmp ^ 0b01
+        result |= (tmp << (index_a * 2))
+    return result
+
+def xt16bfm_symmetries(value):
+    return [
         value,
-        rotate(value),
-        rotate(rotate(value)),
-        rotate(rotate(rotate(value))),
-        mirror(value),
-        rotate(mirror(value)),
-        rotate(rotate(mirror(value))),
-        rotate(rotate(rotate(mirror(value)))),
-    ])
-
-def xt16bfm_create_svg(fiducial_value):
-    svg_contents = ""
-
-    if fiducial_value == xt16bfm_canonicalize(fiducial_value):
-        for tile_position_index in range(0, 8):
-            tile_index = (fiducial_value >> (tile_position_index * 2)) & 0b11
-
-            [tile_u, tile_v] = [
-                [0, 0], [1, 0], [2, 0], [2, 1],
-                [2, 2], [1, 2], [0, 2], [0, 1],
-            ][tile_position_index]
-
-            tile_size = 144
-
-            tile_x0 = 72 + (tile_u * tile_size)
-            tile_y0 = 72 + (tile_v * tile_size)
-
-            tile_x1 = tile_x0 + tile_size
-            tile_y1 = tile_y0 + tile_size
-
-            svg_contents += '<polygon class="foreground" points="{},{} {},{} {},{}" />'.format(
-                *[
-                    [tile_x0, tile_y0, tile_x1, tile_y0, tile_x0, tile_y1],
-                    [tile_x0, tile_y0, tile_x1, tile_y0, tile_x1, tile_y1],
-                    [tile_x1, tile_y0, tile_x1, tile_y1, tile_x0, tile_y1],
-                    [tile_x0, tile_y0, tile_x1, tile_y1, tile_x0, tile_y1],
-                ][tile_index]
-            )
+        xt16bfm_rotate(value),
+        xt16bfm_rotate(xt16bfm_rotate(value)),
+        xt16bfm_rotate(xt16bfm_rotate(xt16bfm_rotate(value))),
+        xt16bfm_mirror(value),
+        xt16bfm_rotate(xt16bfm_mirror(value)),
+        xt16bfm_rotate(xt16bfm_rotate(xt16bfm_mirror(value))),
+        xt16bfm_rotate(xt16bfm_rotate(xt16bfm_rotate(xt16bfm_mirror(value)))),
+    ]
+
+def xt16bfm_build_canonical_table():
+    # Every symmetry orbit is visited once, all of its members get assigned
+    # the smallest member as their canonical form.
+    canonical_table = array("H", bytes(2 * 65536))
+    visited = bytearray(65536)
+
+    for value in range(0, 65536):
+        if not visited[value]:
+            orbit = xt16bfm_symmetries(value)
+            canonical_value = min(orbit)
+            for orbit_value in orbit:
+                canonical_table[orbit_value] = canonical_value
+                visited[orbit_value] = 1
+
+    return canonical_table
+
+@cache
+def xt16bfm_canonical_table():
+    # The stored table starts with the source digest of the engine that built
+    # it, a table built by different symmetry code is rebuilt
+    source_digest = generator_source_digest(__file__).encode("ascii")
+    canonical_table = array("H")
+
+    try:
+        with open(xt16bfm_table_path, "rb") as table_file:
+            if table_file.read(len(source_digest)) == source_digest:
+                canonical_table.fromfile(table_file, 65536)
+                if sys.byteorder == "big":
+                    canonical_table.byteswap()
+                return canonical_table
+    except (FileNotFoundError, EOFError):
+        pass
+
+    canonical_table = xt16bfm_build_canonical_table()
+
+    # The table is stored little-endian
+    stored_table = array("H", canonical_table)
+    if sys.byteorder == "big":
+        stored_table.byteswap()
+
+    os.makedirs(os.path.dirname(xt16bfm_table_path), exist_ok = True)
+    with open(xt16bfm_table_path, "wb") as table_file:
+        table_file.write(source_digest)
+        stored_table.tofile(table_file)
+
+    return canonical_table
 
-    return dedent("""\
-        <svg width="576" height="576" viewBox="0 0 576 576" xmlns="http://www.w3.org/2000/svg">
-            {}
-            <g id="fiducial_xt16bfm_{}">
-                <rect class="background" x="0" y="0" width="576" height="576" />
-                <rect class="foreground" x="36" y="36" width="504" height="504" />
-                <rect class="background" x="54" y="54" width="468" height="468" />
-                <rect class="foreground" x="234" y="234" width="108" height="108" />
-                <rect class="background" x="252" y="252" width="72" height="72" />
-                <rect class="foreground" x="270" y="270" width="36" height="36" />
-                {}
-            </g>
-        </svg>
-    """).format(
-        svg_style,
-        fiducial_value,
-        svg_contents,
-    )
+def xt16bfm_canonicalize(value):
+    if not 0 <= value < 65536:
+        return min(xt16bfm_symmetries(value))
+    return xt16bfm_canonical_table()[value]
+
+def xt16bfm_orbit(value):
+    return sorted(set(xt16bfm_symmetries(value)))
+
+def xt16bfm_canonical_values():
+    return [value for (value, canonical_value) in enumerate(xt16bfm_canonical_table()) if value == canonical_value]
+
+def xt16bfm_draw_frame(svg_writer):
+    svg_writer.element("rect", class_ = "background", x = 0,   y = 0,   width = 576, height = 576)
+    svg_writer.element("rect", class_ = "foreground", x = 36,  y = 36,  width = 504, height = 504)
+    svg_writer.element("rect", class_ = "background", x = 54,  y = 54,  width = 468, height = 468)
+    svg_writer.element("rect", class_ = "foreground", x = 234, y = 234, width = 108, height = 108)
+    svg_writer.element("rect", class_ = "background", x = 252, y = 252, width = 72,  height = 72 )
+    svg_writer.element("rect", class_ = "foreground", x = 270, y = 270, width = 36,  height = 36 )
+
+def xt16bfm_draw(svg_writer, fiducial_value):
+    with svg_writer.group("fiducial_xt16bfm_{}".format(fiducial_value)):
+        svg_writer.reuse("fiducial_xt16bfm_frame", xt16bfm_draw_frame)
+
+        with svg_writer.row():
+            if fiducial_value == xt16bfm_canonicalize(fiducial_value):
+                for tile_position_index in range(0, 8):
+                    tile_index = (fiducial_value >> (tile_position_index * 2)) & 0b11
+
+                    [tile_u, tile_v] = [
+                        [0, 0], [1, 0], [2, 0], [2, 1],
+                        [2, 2], [1, 2], [0, 2], [0, 1],
+                    ][tile_position_index]
+
+                    tile_size = 144
+
+                    tile_x0 = 72 + (tile_u * tile_size)
+                    tile_y0 = 72 + (tile_v * tile_size)
+
+                    tile_x1 = tile_x0 + tile_size
+                    tile_y1 = tile_y0 + tile_size
+
+                    svg_writer.element("polygon", class_ = "foreground", points = "{},{} {},{} {},{}".format(
+                        *[
+                            [tile_x0, tile_y0, tile_x1, tile_y0, tile_x0, tile_y1],
+                            [tile_x0, tile_y0, tile_x1, tile_y0, tile_x1, tile_y1],
+                            [tile_x1, tile_y0, tile_x1, tile_y1, tile_x0, tile_y1],
+                            [tile_x0, tile_y0, tile_x1, tile_y1, tile_x0, tile_y1],
+                        ][tile_index]
+                    ))
+
+def xt16bfm_create_svg(svg_writer, fiducial_value):
+    with svg_writer.document(576, 576, style = svg_style):
+        xt16bfm_draw(svg_writer, fiducial_value)
 
 ################################################################################
 #  Fiducial styles
@@ -113,26 +171,156 @@ fiducial_styles = {
     "xt16bfm": xt16bfm_create_svg,
 }
 
+fiducial_drawers = {
+    "xt16bfm": xt16bfm_draw,
+}
+
+fiducial_canonicalizers = {
+    "xt16bfm": xt16bfm_canonicalize,
+}
+
+fiducial_canonical_values = {
+    "xt16bfm": xt16bfm_canonical_values,
+}
+
+################################################################################
+#  Fiducial sheets
+
+def create_fiducial_sheet_svg(svg_writer, fiducial_draw, fiducial_values, sheet_columns):
+    # Markers keep their 576 unit geometry, every cell adds a gutter and a
+    # label strip below the marker.
+    cell_gutter = 72
+    cell_label_height = 72
+    cell_width = 576 + cell_gutter
+    cell_height = 576 + cell_label_height + cell_gutter
+
+    sheet_rows = (len(fiducial_values) + sheet_columns - 1) // sheet_columns
+    sheet_width = sheet_columns * cell_width + cell_gutter
+    sheet_height = sheet_rows * cell_height + cell_gutter
+
+    with svg_writer.document(sheet_width, sheet_height, style = svg_style), svg_writer.group("sheet"):
+        svg_writer.element("rect", class_ = "background", x = 0, y = 0, width = sheet_width, height = sheet_height)
+
+        for (fiducial_index, fiducial_value) in enumerate(fiducial_values):
+            cell_x = cell_gutter + (fiducial_index % sheet_columns) * cell_width
+            cell_y = cell_gutter + (fiducial_index // sheet_columns) * cell_height
+
+            with svg_writer.group("cell_{}".format(fiducial_value), transform = "translate({} {})".format(cell_x, cell_y)):
+                fiducial_draw(svg_writer, fiducial_value)
+                svg_writer.text(str(fiducial_value), class_ = "foreground",
+                    x = 288,
+                    y = 576 + cell_label_height / 2,
+                    font_family = "monospace",
+                    font_size = 48,
+                    text_anchor = "middle",
+                    dominant_baseline = "central",
+                )
+
+def parse_fiducial_values(fiducial_values_spec, fiducial_style):
+    # "canonical" or a comma separated list of values and inclusive ranges,
+    # for example "5,12-20,4095".
+    if fiducial_values_spec == "canonical":
+        return fiducial_canonical_values[fiducial_style]()
+
+    fiducial_values = []
+    for fiducial_values_item in fiducial_values_spec.split(","):
+        range_start, _, range_end = fiducial_values_item.partition("-")
+        if range_end:
+            fiducial_values.extend(range(int(range_start), int(range_end) + 1))
+        else:
+            fiducial_values.append(int(range_start))
+    return fiducial_values
+
+def write_fiducial_batch(fiducial_style, fiducial_values, output_directory, sheet_columns, sheet_rows, writer_options = None):
+    canonicalize = fiducial_canonicalizers[fiducial_style]
+
+    canonical_values = []
+    for fiducial_value in fiducial_values:
+        if canonicalize(fiducial_value) == fiducial_value:
+            canonical_values.append(fiducial_value)
+        else:
+            print("Skipping non-canonical {} value {} (canonical form: {})".format(
+                fiducial_style,
+                fiducial_value,
+                canonicalize(fiducial_value),
+            ), file = sys.stderr)
+
+    if sheet_columns == 0:
+        for fiducial_value in canonical_values:
+            svg_path = "{}/fiducial-{}-{:05}.svg".format(output_directory, fiducial_style, fiducial_value)
+            svg_document = render_svg_document(fiducial_styles[fiducial_style], fiducial_value, writer_options = writer_options)
+            write_output_file(svg_path, svg_document)
+    else:
+        sheet_size = sheet_columns * sheet_rows
+        for sheet_index in range(0, (len(canonical_values) + sheet_size - 1) // sheet_size):
+            svg_path = "{}/fiducial-{}-sheet-{:03}.svg".format(output_directory, fiducial_style, sheet_index + 1)
+            svg_document = render_svg_document(
+                create_fiducial_sheet_svg,
+                fiducial_drawers[fiducial_style],
+                canonical_values[sheet_index * sheet_size:(sheet_index + 1) * sheet_size],
+                sheet_columns,
+                writer_options = writer_options,
+            )
+            write_output_file(svg_path, svg_document)
+
 ################################################################################
 # Main
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--command", type = str,                    )
-parser.add_argument("--target",  type = str, default = "stdout" )
-parser.add_argument("--style",   type = str, default = "xt16bfm")
-parser.add_argument("--value",   type = int, default = 0        )
-
-args = parser.parse_args()
-
-match args.command:
-    case "create-svg":
-        svg_document = fiducial_styles[args.style](args.value)
-        match args.target:
-            case "stdout":
-                print(svg_document)
-            case "clipboard":
-                copy_to_clipboard(svg_document, "image/svg+xml")
-
-    case "query-fiducial-styles":
-        for (fiducial_style, fiducial_callback) in fiducial_styles.items():
-            print(fiducial_style)
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",       type = str,                                       )
+    parser.add_argument("--target",        type = str, default = "stdout"                    )
+    parser.add_argument("--style",         type = str, default = "xt16bfm"                   )
+    parser.add_argument("--value",         type = int, default = 0                           )
+    parser.add_argument("--values",        type = str, default = "canonical"                 )
+    parser.add_argument("--output",        type = str, default = "calibration/fiducials"     )
+    parser.add_argument("--sheet-columns", type = int, default = 0                           )
+    parser.add_argument("--sheet-rows",    type = int, default = 4                           )
+    parser.add_argument("--compact",       action = "store_true"                             )
+    parser.add_argument("--precision",     type = int, default = "3"                         )
+
+    args = parser.parse_args(argv)
+
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    match args.command:
+        case "create-svg":
+            match args.target:
+                case "stdout":
+                    fiducial_styles[args.style](SvgWriter(sys.stdout, **writer_options), args.value)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(fiducial_styles[args.style], args.value, writer_options = writer_options)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "create-batch":
+            write_fiducial_batch(
+                args.style,
+                parse_fiducial_values(args.values, args.style),
+                "{}/{}".format(args.output, args.style),
+                args.sheet_columns,
+                args.sheet_rows,
+                writer_options,
+            )
+
+        case "query-canonical-values":
+            match args.style:
+                case "xt16bfm":
+                    for fiducial_value in xt16bfm_canonical_values():
+                        print(fiducial_value)
+
+        case "query-orbit":
+            match args.style:
+                case "xt16bfm":
+                    for fiducial_value in xt16bfm_orbit(args.value):
+                        print(fiducial_value)
+
+        case "query-fiducial-styles":
+            for (fiducial_style, fiducial_callback) in fiducial_styles.items():
+                print(fiducial_style)
+
+if __name__ == "__main__":
+    profile_main(main)
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+from functools import cache, partial
+from math import asin, atan2, degrees, hypot, sqrt
+
+from svg_utils import SvgWriter, render_svg_document, copy_to_clipboard, parse_aspect_ratio
+from svg_utils import generator_source_digest, generator_inputs_digest, write_batch
+from svg_utils import profile_main
+
+################################################################################
+# Constants
+
+svg_style = """
+    <style>
+    .primary {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 2px;
+        stroke-linecap: round;
+    }
+
+    .secondary {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 1px;
+        stroke-linecap: round;
+    }
+
+    .dotted {
+        fill: none;
+        stroke: #000000;
+        stroke-width: 1px;
+        stroke-dasharray: 1, 3;
+    }
+
+    .label {
+        fill: #000000;
+        stroke: none;
+        font-family: sans-serif;
+        font-weight: bold;
+    }
+    </style>
+"""
+
+# Every chart is 576px tall at 96 DPI, the aspect ratio sets its width
+frame_height = 576
+
+aspect_ratios = ["4:3", "16:9", "1.375:1", "2.39:1"]
+
+golden_ratio = (1 + sqrt(5)) / 2
+
+# Margin around the labeled field grid, the document grows by it on every side
+label_margin = 48
+
+################################################################################
+# Geometry
+#
+# Everything derived from the aspect ratio is computed once per process and
+# shared by the fieldchart, frame and grid documents of that aspect ratio.
+
+@cache
+def frame_geometry(aspect_ratio):
+    w = frame_height * parse_aspect_ratio(aspect_ratio)
+    h = frame_height
+
+    return {
+        "width":           w,
+        "height":          h,
+        "center_x":        w / 2,
+        "center_y":        h / 2,
+        # Title safe and overscan areas, centered
+        "safe_area":       [w * 0.05, h * 0.05, w * 0.9, h * 0.9],
+        "overscan_area":   [-w * 0.05, -h * 0.05, w * 1.1, h * 1.1],
+        # 4:3 center cut of wider frames
+        "center_cut_area": [(w - h * 4 / 3) / 2, 0, h * 4 / 3, h],
+        # Where the reciprocal of a diagonal (the perpendicular through a
+        # corner) meets the long edges
+        "reciprocal_x":    h * h / w,
+        # Foot of the perpendicular from a corner onto the diagonal
+        "perpendicular_x": h * h * w / (w * w + h * h),
+        "perpendicular_y": h * h * h / (w * w + h * h),
+        "golden_x":        w / golden_ratio ** 2,
+        "golden_y":        h / golden_ratio ** 2,
+    }
+
+@cache
+def field_geometry(aspect_ratio, field_count):
+    # Fields from field_count (the full frame) down to 1, every field is a
+    # centered [x, y, width, height] rect with its largest tilt angle.
+    frame = frame_geometry(aspect_ratio)
+    w, h = frame["width"], frame["height"]
+
+    field_step_x = w / (2 * field_count)
+    field_step_y = h / (2 * field_count)
+
+    fields = []
+    for field_index in range(field_count, 0, -1):
+        field_inset = field_count - field_index
+        field_rect = [
+            field_inset * field_step_x,
+            field_inset * field_step_y,
+            w - 2 * field_inset * field_step_x,
+            h - 2 * field_inset * field_step_y,
+        ]
+
+        # A field tilted by the angle t spans h * s * cos(t) + w * s * sin(t)
+        # vertically, it touches the frame when that reaches h. Small fields
+        # can turn all the way around and have no limit.
+        field_scale = field_index / field_count
+        tilt_limit = h / (field_scale * hypot(w, h))
+        tilt_angle = degrees(asin(tilt_limit) - atan2(h, w)) if tilt_limit < 1 else None
+
+        fields.append((field_index, field_rect, tilt_angle))
+
+    return {
+        "field_step_x": field_step_x,
+        "field_step_y": field_step_y,
+        "fields":       fields,
+    }
+
+################################################################################
+# Drawing helpers
+
+def draw_rect(svg_writer, style_class, rect, **attributes):
+    x, y, width, height = rect
+    svg_writer.element("rect", class_ = style_class, x = x, y = y, width = width, height = height, **attributes)
+
+def draw_lines(svg_writer, style_class, lines):
+    for (x1, y1, x2, y2) in lines:
+        svg_writer.element("line", class_ = style_class, x1 = x1, y1 = y1, x2 = x2, y2 = y2)
+
+def draw_cross(svg_writer, style_class, x, y, arm_length):
+    draw_lines(svg_writer, style_class, [
+        (x - arm_length, y, x + arm_length, y),
+        (x, y - arm_length, x, y + arm_length),
+    ])
+
+################################################################################
+# Fieldcharts
+
+def create_fieldchart_fields_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    field = field_geometry(kwargs["aspect_ratio"], kwargs.get("field_count") or 12)
+
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("fieldchart"):
+        for (field_index, field_rect, _) in field["fields"]:
+            draw_rect(svg_writer, "primary", field_rect)
+            svg_writer.text("{}F".format(field_index), class_ = "label",
+                x = field_rect[0] + 4,
+                y = field_rect[1] + field_rect[3] - 4,
+                font_size = 12,
+            )
+
+def draw_field_grid(svg_writer, frame, field):
+    w, h = frame["width"], frame["height"]
+    field_count = len(field["fields"])
+
+    draw_lines(svg_writer, "secondary", [
+        (column_index * field["field_step_x"], 0, column_index * field["field_step_x"], h)
+        for column_index in range(1, 2 * field_count) if column_index != field_count
+    ])
+    draw_lines(svg_writer, "secondary", [
+        (0, row_index * field["field_step_y"], w, row_index * field["field_step_y"])
+        for row_index in range(1, 2 * field_count) if row_index != field_count
+    ])
+    draw_lines(svg_writer, "secondary", [(0, 0, w, h), (w, 0, 0, h)])
+    draw_lines(svg_writer, "primary", [(frame["center_x"], 0, frame["center_x"], h), (0, frame["center_y"], w, frame["center_y"])])
+    draw_rect(svg_writer, "primary", [0, 0, w, h])
+
+def create_fieldchart_grid_blank_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    field = field_geometry(kwargs["aspect_ratio"], kwargs.get("field_count") or 12)
+
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("fieldchart"):
+        draw_field_grid(svg_writer, frame, field)
+
+def create_fieldchart_grid_labeled_svg(svg_writer, **kwargs):
+    # Field numbers run from the edges to zero at the center on every side of
+    # the grid, the compass points name the halves of the frame.
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    field = field_geometry(kwargs["aspect_ratio"], kwargs.get("field_count") or 12)
+    w, h = frame["width"], frame["height"]
+    field_count = len(field["fields"])
+
+    with svg_writer.document(w + 2 * label_margin, h + 2 * label_margin, -label_margin, -label_margin, style = svg_style), svg_writer.group("fieldchart"):
+        draw_field_grid(svg_writer, frame, field)
+
+        with svg_writer.group("labels"):
+            for column_index in range(0, 2 * field_count + 1):
+                for label_y in [-label_margin / 4, h + label_margin / 4]:
+                    svg_writer.text(str(abs(field_count - column_index)), class_ = "label",
+                        x = column_index * field["field_step_x"],
+                        y = label_y,
+                        font_size = 10,
+                        text_anchor = "middle",
+                        dominant_baseline = "central",
+                    )
+
+            for row_index in range(0, 2 * field_count + 1):
+                for (label_x, text_anchor) in [(-label_margin / 6, "end"), (w + label_margin / 6, "start")]:
+                    svg_writer.text(str(abs(field_count - row_index)), class_ = "label",
+                        x = label_x,
+                        y = row_index * field["field_step_y"],
+                        font_size = 10,
+                        text_anchor = text_anchor,
+                        dominant_baseline = "central",
+                    )
+
+            for (compass_point, compass_x, compass_y) in [
+                ("W", w * 1 / 4, -label_margin * 3 / 4), ("E", w * 3 / 4, -label_margin * 3 / 4),
+                ("W", w * 1 / 4, h + label_margin * 3 / 4), ("E", w * 3 / 4, h + label_margin * 3 / 4),
+                ("N", -label_margin * 3 / 4, h * 1 / 4), ("S", -label_margin * 3 / 4, h * 3 / 4),
+                ("N", w + label_margin * 3 / 4, h * 1 / 4), ("S", w + label_margin * 3 / 4, h * 3 / 4),
+            ]:
+                svg_writer.text(compass_point, class_ = "label",
+                    x = compass_x,
+                    y = compass_y,
+                    font_size = 14,
+                    text_anchor = "middle",
+                    dominant_baseline = "central",
+                )
+
+def create_fieldchart_maxtilt_svg(svg_writer, tilt_direction, **kwargs):
+    # Every field tilted as far as it goes without leaving the frame
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    field = field_geometry(kwargs["aspect_ratio"], kwargs.get("field_count") or 12)
+
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("fieldchart"):
+        for (field_index, field_rect, tilt_angle) in field["fields"]:
+            if tilt_angle is None:
+                break
+
+            tilt_transform = "rotate({} {} {})".format(
+                svg_writer.format_value(tilt_direction * tilt_angle),
+                svg_writer.format_value(frame["center_x"]),
+                svg_writer.format_value(frame["center_y"]),
+            )
+            draw_rect(svg_writer, "primary", field_rect, transform = tilt_transform)
+            svg_writer.text(str(field_index), class_ = "label",
+                x = field_rect[0] + 4,
+                y = field_rect[1] + field_rect[3] - 4,
+                font_size = 12,
+                transform = tilt_transform,
+            )
+
+def create_fieldchart_maxtilt_cw_svg(svg_writer, **kwargs):
+    create_fieldchart_maxtilt_svg(svg_writer, 1, **kwargs)
+
+def create_fieldchart_maxtilt_ccw_svg(svg_writer, **kwargs):
+    create_fieldchart_maxtilt_svg(svg_writer, -1, **kwargs)
+
+def create_fieldchart_tiles_svg(svg_writer, **kwargs):
+    # Square tiles, tile_count across, each divided into 8 by 8 cells. The
+    # tile is drawn once and reused.
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    tile_count = kwargs.get("tile_count") or 4
+    tile_size = frame["width"] / tile_count
+    tile_rows = int(frame["height"] // tile_size)
+    tile_y0 = (frame["height"] - tile_rows * tile_size) / 2
+
+    def draw_tile(svg_writer):
+        draw_lines(svg_writer, "secondary", [(cell_index * tile_size / 8, 0, cell_index * tile_size / 8, tile_size) for cell_index in range(1, 8)])
+        draw_lines(svg_writer, "secondary", [(0, cell_index * tile_size / 8, tile_size, cell_index * tile_size / 8) for cell_index in range(1, 8)])
+        draw_rect(svg_writer, "primary", [0, 0, tile_size, tile_size])
+
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("fieldchart"):
+        for tile_row in range(0, tile_rows):
+            for tile_column in range(0, tile_count):
+                with svg_writer.group("tile_{}_{}".format(tile_column, tile_row), transform = "translate({} {})".format(
+                    svg_writer.format_value(tile_column * tile_size),
+                    svg_writer.format_value(tile_y0 + tile_row * tile_size),
+                )):
+                    svg_writer.reuse("fieldchart_tile", draw_tile)
+
+fieldchart_styles = {
+    "fields":       create_fieldchart_fields_svg,
+    "grid-blank":   create_fieldchart_grid_blank_svg,
+    "grid-labeled": create_fieldchart_grid_labeled_svg,
+    "maxtilt-cw":   create_fieldchart_maxtilt_cw_svg,
+    "maxtilt-ccw":  create_fieldchart_maxtilt_ccw_svg,
+    "tiles":        create_fieldchart_tiles_svg,
+}
+
+################################################################################
+# Frames
+
+def frame_corner_brackets(x0, y0, x1, y1, arm_x, arm_y):
+    # Polyline points of the four brackets around the (x0, y0)-(x1, y1) rect
+    return [
+        [(x0 + arm_x, y0), (x0, y0), (x0, y0 + arm_y)],
+        [(x1 - arm_x, y0), (x1, y0), (x1, y0 + arm_y)],
+        [(x1, y1 - arm_y), (x1, y1), (x1 - arm_x, y1)],
+        [(x0, y1 - arm_y), (x0, y1), (x0 + arm_x, y1)],
+    ]
+
+def draw_polylines(svg_writer, style_class, polylines):
+    for polyline in polylines:
+        svg_writer.element("polyline", class_ = style_class, points = " ".join(
+            "{},{}".format(svg_writer.format_value(x), svg_writer.format_value(y)) for (x, y) in polyline
+        ))
+
+def draw_frame_standard(svg_writer, frame):
+    w, h = frame["width"], frame["height"]
+    draw_rect(svg_writer, "primary", [0, 0, w, h])
+    draw_rect(svg_writer, "dotted", frame["overscan_area"])
+    draw_rect(svg_writer, "dotted", frame["safe_area"])
+    draw_lines(svg_writer, "secondary", [
+        (frame["center_x"], 0, frame["center_x"], 16),
+        (frame["center_x"], h, frame["center_x"], h - 16),
+        (0, frame["center_y"], 16, frame["center_y"]),
+        (w, frame["center_y"], w - 16, frame["center_y"]),
+    ])
+    draw_cross(svg_writer, "secondary", frame["center_x"], frame["center_y"], 8)
+
+def create_frame_standard_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("frame"):
+        draw_frame_standard(svg_writer, frame)
+
+def create_frame_broadcast_safe_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("frame"):
+        draw_frame_standard(svg_writer, frame)
+        draw_rect(svg_writer, "dotted", frame["center_cut_area"])
+
+def create_frame_crosshair_1_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    overscan_x, overscan_y, overscan_width, overscan_height = frame["overscan_area"]
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("frame"):
+        draw_rect(svg_writer, "primary", [0, 0, frame["width"], frame["height"]])
+        draw_rect(svg_writer, "dotted", frame["overscan_area"])
+        draw_rect(svg_writer, "dotted", frame["safe_area"])
+        draw_lines(svg_writer, "dotted", [
+            (frame["center_x"], overscan_y, frame["center_x"], overscan_y + overscan_height),
+            (overscan_x, frame["center_y"], overscan_x + overscan_width, frame["center_y"]),
+        ])
+
+def create_frame_crosshair_2_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    w, h = frame["width"], frame["height"]
+    bracket_margin = w * 0.05
+    with svg_writer.document(w, h, style = svg_style), svg_writer.group("frame"):
+        draw_rect(svg_writer, "primary", [0, 0, w, h])
+        draw_rect(svg_writer, "dotted", frame["safe_area"])
+        draw_lines(svg_writer, "dotted", [(frame["center_x"], 0, frame["center_x"], h), (0, frame["center_y"], w, frame["center_y"])])
+        draw_polylines(svg_writer, "primary", frame_corner_brackets(
+            -bracket_margin, -bracket_margin, w + bracket_margin, h + bracket_margin, bracket_margin, bracket_margin,
+        ))
+
+def create_frame_minimal_1_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("frame"):
+        for corner_x in [0, frame["width"]]:
+            for corner_y in [0, frame["height"]]:
+                draw_cross(svg_writer, "dotted", corner_x, corner_y, 32)
+
+def create_frame_minimal_2_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    w, h = frame["width"], frame["height"]
+    with svg_writer.document(w, h, style = svg_style), svg_writer.group("frame"):
+        draw_polylines(svg_writer, "primary", frame_corner_brackets(0, 0, w, h, w * 0.1, h * 0.1))
+
+frame_styles = {
+    "standard":       create_frame_standard_svg,
+    "broadcast-safe": create_frame_broadcast_safe_svg,
+    "crosshair-1":    create_frame_crosshair_1_svg,
+    "crosshair-2":    create_frame_crosshair_2_svg,
+    "minimal-1":      create_frame_minimal_1_svg,
+    "minimal-2":      create_frame_minimal_2_svg,
+}
+
+def frame_style_applies(frame_style, aspect_ratio):
+    # The 4:3 center cut only makes sense on wider frames
+    if frame_style == "broadcast-safe":
+        return parse_aspect_ratio(aspect_ratio) > 4 / 3
+    return True
+
+################################################################################
+# Composition grids
+#
+# Every grid is a list of lines over the frame, as (x1, y1, x2, y2).
+
+def grid_lines_none(frame):
+    return []
+
+def grid_lines_crosshair(frame):
+    w, h = frame["width"], frame["height"]
+    return [(0, frame["center_y"], w, frame["center_y"]), (frame["center_x"], 0, frame["center_x"], h)]
+
+def grid_lines_thirds(frame):
+    w, h = frame["width"], frame["height"]
+    return [
+        (w * 1 / 3, 0, w * 1 / 3, h), (w * 2 / 3, 0, w * 2 / 3, h),
+        (0, h * 1 / 3, w, h * 1 / 3), (0, h * 2 / 3, w, h * 2 / 3),
+    ]
+
+def grid_lines_golden(frame):
+    w, h = frame["width"], frame["height"]
+    golden_x, golden_y = frame["golden_x"], frame["golden_y"]
+    return [
+        (golden_x, 0, golden_x, h), (w - golden_x, 0, w - golden_x, h),
+        (0, golden_y, w, golden_y), (0, h - golden_y, w, h - golden_y),
+    ]
+
+def grid_lines_triptych(frame):
+    w, h = frame["width"], frame["height"]
+    return [(w * 1 / 4, 0, w * 1 / 4, h), (w * 3 / 4, 0, w * 3 / 4, h)]
+
+def grid_lines_rabatted(frame):
+    w, h = frame["width"], frame["height"]
+    return [(h, 0, h, h), (w - h, 0, w - h, h)]
+
+def grid_lines_corners(frame):
+    w, h = frame["width"], frame["height"]
+    return [(0, h / 2, w, h / 2), (h / 2, 0, h / 2, h), (w - h / 2, 0, w - h / 2, h)]
+
+def grid_lines_diagonals_1(frame):
+    w, h = frame["width"], frame["height"]
+    return [(0, 0, w, h), (w, 0, 0, h)]
+
+def grid_lines_diagonals_2(frame):
+    # 45 degree diagonals from every corner
+    w, h = frame["width"], frame["height"]
+    return [(0, h, h, 0), (0, 0, h, h), (w, 0, w - h, h), (w, h, w - h, 0)]
+
+def grid_lines_dynamic_1(frame):
+    # Both diagonals and their reciprocals through every corner
+    w, h = frame["width"], frame["height"]
+    reciprocal_x = frame["reciprocal_x"]
+    return grid_lines_diagonals_1(frame) + [
+        (0, h, reciprocal_x, 0), (w - reciprocal_x, 0, w, h),
+        (0, 0, reciprocal_x, h), (w - reciprocal_x, h, w, 0),
+    ]
+
+def grid_lines_dynamic_2(frame):
+    # Verticals and horizontals through the feet of the reciprocals
+    w, h = frame["width"], frame["height"]
+    perpendicular_x, perpendicular_y = frame["perpendicular_x"], frame["perpendicular_y"]
+    return grid_lines_dynamic_1(frame) + [
+        (perpendicular_x, 0, perpendicular_x, h), (w - perpendicular_x, 0, w - perpendicular_x, h),
+        (0, perpendicular_y, w, perpendicular_y), (0, h - perpendicular_y, w, h - perpendicular_y),
+    ]
+
+def grid_lines_dynamic_3(frame):
+    # Verticals through the ends of the reciprocals, horizontals where those
+    # cross the diagonals
+    w, h = frame["width"], frame["height"]
+    reciprocal_x = frame["reciprocal_x"]
+    crossing_y = h * reciprocal_x / w
+    return grid_lines_dynamic_1(frame) + [
+        (reciprocal_x, 0, reciprocal_x, h), (w - reciprocal_x, 0, w - reciprocal_x, h),
+        (0, crossing_y, w, crossing_y), (0, h - crossing_y, w, h - crossing_y),
+    ]
+
+def grid_lines_dynamic_4(frame):
+    w, h = frame["width"], frame["height"]
+    center_x, center_y = frame["center_x"], frame["center_y"]
+    return grid_lines_dynamic_3(frame) + grid_lines_crosshair(frame) + [
+        (0, center_y, center_x, 0), (center_x, 0, w, center_y),
+        (w, center_y, center_x, h), (center_x, h, 0, center_y),
+    ]
+
+def grid_lines_triangle_1(frame):
+    # One diagonal and the perpendiculars onto it from the other corners
+    w, h = frame["width"], frame["height"]
+    perpendicular_x, perpendicular_y = frame["perpendicular_x"], frame["perpendicular_y"]
+    return [
+        (0, h, w, 0),
+        (0, 0, perpendicular_x, h - perpendicular_y),
+        (w, h, w - perpendicular_x, perpendicular_y),
+    ]
+
+def grid_lines_triangle_2(frame):
+    w, h = frame["width"], frame["height"]
+    perpendicular_x, perpendicular_y = frame["perpendicular_x"], frame["perpendicular_y"]
+    return [
+        (0, 0, w, h),
+        (w, 0, w - perpendicular_x, h - perpendicular_y),
+        (0, h, perpendicular_x, perpendicular_y),
+    ]
+
+grid_styles = {
+    "none":        grid_lines_none,
+    "crosshair":   grid_lines_crosshair,
+    "thirds":      grid_lines_thirds,
+    "golden":      grid_lines_golden,
+    "triptych":    grid_lines_triptych,
+    "rabatted":    grid_lines_rabatted,
+    "corners":     grid_lines_corners,
+    "diagonals-1": grid_lines_diagonals_1,
+    "diagonals-2": grid_lines_diagonals_2,
+    "dynamic-1":   grid_lines_dynamic_1,
+    "dynamic-2":   grid_lines_dynamic_2,
+    "dynamic-3":   grid_lines_dynamic_3,
+    "dynamic-4":   grid_lines_dynamic_4,
+    "triangle-1":  grid_lines_triangle_1,
+    "triangle-2":  grid_lines_triangle_2,
+}
+
+def create_grid_svg(svg_writer, **kwargs):
+    frame = frame_geometry(kwargs["aspect_ratio"])
+    with svg_writer.document(frame["width"], frame["height"], style = svg_style), svg_writer.group("grid"):
+        draw_rect(svg_writer, "primary", [0, 0, frame["width"], frame["height"]])
+        draw_lines(svg_writer, "primary", grid_styles[kwargs["grid_style"]](frame))
+
+################################################################################
+# Batch rendering
+
+chart_families = {
+    "fieldchart": fieldchart_styles,
+    "frame":      frame_styles,
+    "grid":       {grid_style: create_grid_svg for grid_style in grid_styles.keys()},
+}
+
+def chart_path(output_directory, chart_family, chart_style, chart_params):
+    aspect_ratio = chart_params["aspect_ratio"]
+    if chart_style == "tiles":
+        chart_name = "tiles-{}".format(chart_params["tile_count"])
+    elif chart_family == "fieldchart":
+        chart_name = "{}f-{}".format(chart_params["field_count"], chart_style)
+    else:
+        chart_name = chart_style
+    return "{0}/{1}/{2}/{1}-{2}-{3}.svg".format(output_directory, chart_family, aspect_ratio, chart_name)
+
+def chart_jobs(aspect_ratios, field_counts, tile_counts):
+    # (chart_family, chart_style, chart_params), grouped by aspect ratio so
+    # that consecutive jobs share the cached geometry
+    for aspect_ratio in aspect_ratios:
+        for field_count in field_counts:
+            for fieldchart_style in fieldchart_styles.keys():
+                if fieldchart_style != "tiles":
+                    yield ("fieldchart", fieldchart_style, {"aspect_ratio": aspect_ratio, "field_count": field_count})
+        for tile_count in tile_counts:
+            yield ("fieldchart", "tiles", {"aspect_ratio": aspect_ratio, "tile_count": tile_count})
+        for frame_style in frame_styles.keys():
+            if frame_style_applies(frame_style, aspect_ratio):
+                yield ("frame", frame_style, {"aspect_ratio": aspect_ratio})
+        for grid_style in grid_styles.keys():
+            yield ("grid", grid_style, {"aspect_ratio": aspect_ratio, "grid_style": grid_style})
+
+def render_chart(chart_job, output_directory = "", writer_options = None):
+    chart_family, chart_style, chart_params = chart_job
+    return [(
+        chart_path(output_directory, *chart_job),
+        render_svg_document(chart_families[chart_family][chart_style], writer_options = writer_options, **chart_params),
+    )]
+
+def write_charts(chart_jobs, output_directory, jobs, force = False, writer_options = None, output_target = "tree"):
+    source_digest = generator_source_digest(__file__)
+
+    write_batch(
+        chart_jobs, jobs,
+        lambda chart_job: [chart_path(output_directory, *chart_job)],
+        lambda chart_job: generator_inputs_digest(source_digest, chart_job, writer_options),
+        partial(render_chart, output_directory = output_directory, writer_options = writer_options),
+        force = force,
+        output_target = output_target,
+    )
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",       type = str,                                    )
+    parser.add_argument("--target",        type = str, default = "stdout"                 )
+    parser.add_argument("--family",        type = str, default = "fieldchart"             )
+    parser.add_argument("--style",         type = str, default = "fields"                 )
+    parser.add_argument("--aspect-ratio",  type = str, default = "16:9"                   )
+    parser.add_argument("--field-count",   type = int, default = "12"                     )
+    parser.add_argument("--tile-count",    type = int, default = "4"                      )
+    parser.add_argument("--aspect-ratios", type = str, default = ",".join(aspect_ratios)  )
+    parser.add_argument("--field-counts",  type = str, default = "12,16"                  )
+    parser.add_argument("--tile-counts",   type = str, default = "4,8,12,16"              )
+    parser.add_argument("--output",        type = str, default = "procedural"             )
+    parser.add_argument("--compact",       action = "store_true"                          )
+    parser.add_argument("--precision",     type = int, default = "3"                      )
+    parser.add_argument("--jobs",          type = int, default = "1"                      )
+    parser.add_argument("--force",         action = "store_true"                          )
+    parser.add_argument("--output-target", type = str, default = "tree"                   )
+
+    args = parser.parse_args(argv)
+
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    match args.command:
+        case "create-svg":
+            chart_params = {
+                "aspect_ratio": args.aspect_ratio,
+                "field_count":  args.field_count,
+                "tile_count":   args.tile_count,
+                "grid_style":   args.style,
+            }
+            chart_constructor = chart_families[args.family][args.style]
+            match args.target:
+                case "stdout":
+                    chart_constructor(SvgWriter(sys.stdout, **writer_options), **chart_params)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(chart_constructor, writer_options = writer_options, **chart_params)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "query-chart-styles":
+            for (chart_family, chart_styles) in chart_families.items():
+                for chart_style in chart_styles.keys():
+                    print("{} {}".format(chart_family, chart_style))
+
+        case None:
+            write_charts(
+                chart_jobs(
+                    args.aspect_ratios.split(","),
+                    [int(field_count) for field_count in args.field_counts.split(",")],
+                    [int(tile_count) for tile_count in args.tile_counts.split(",")],
+                ),
+                args.output,
+                args.jobs,
+                args.force,
+                writer_options,
+                args.output_target,
+            )
+
+if __name__ == "__main__":
+    profile_main(main)
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 
 import argparse
-from svg_utils import format_float, copy_to_clipboard
+import json
+import sys
+from bisect import bisect_left
+from functools import cache
+
+from svg_utils import format_float, copy_to_clipboard, profile_main
 
 ################################################################################
 # BPM calculation
@@ -23,7 +28,7 @@ bpm_filters = {
 def calculate_bpm(fps, bpm_filter):
     bpm_results = []
 
-    for frames_per_beat in range(fps * 2, 0, -1):
+    for frames_per_beat in range(int(fps * 2), 0, -1):
         bpm = 60 * (fps / frames_per_beat)
 
         if bpm_filters[bpm_filter](bpm):
@@ -31,6 +36,195 @@ def calculate_bpm(fps, bpm_filter):
 
     return bpm_results
 
+################################################################################
+# Reverse BPM lookup
+#
+# Answers which frames-per-beat comes closest to a given tempo at every frame
+# rate of a range. Every (bpm, frames per beat) combination calculate_bpm
+# would consider is precomputed once per set of frame rates into an index
+# sorted by bpm for each frame rate, so a lookup only bisects each frame
+# rate's index for the nearest tempo instead of scanning every frames per beat.
+# Every frame rate gets a result, the tolerance only decides whether it counts
+# as a match.
+
+ntsc_frame_rates = {
+    "23.976":  24000 / 1001,
+    "29.97":   30000 / 1001,
+    "47.952":  48000 / 1001,
+    "59.94":   60000 / 1001,
+    "119.88": 120000 / 1001,
+}
+
+def parse_frame_rates(frame_rates_spec):
+    # "12-120,23.976,29.97" -> 12, 13, ..., 120 and the two NTSC timebases
+    frame_rates = set()
+    for frame_rate_spec in frame_rates_spec.split(","):
+        frame_rate_spec = frame_rate_spec.strip()
+        if frame_rate_spec in ntsc_frame_rates:
+            frame_rates.add(ntsc_frame_rates[frame_rate_spec])
+        elif "-" in frame_rate_spec:
+            first_frame_rate, last_frame_rate = frame_rate_spec.split("-")
+            frame_rates.update(range(int(first_frame_rate), int(last_frame_rate) + 1))
+        else:
+            frame_rate = float(frame_rate_spec)
+            frame_rates.add(int(frame_rate) if frame_rate.is_integer() else frame_rate)
+    return tuple(sorted(frame_rates))
+
+def parse_frame_rate(frame_rate_spec):
+    # A single frame rate, "24" or one of the NTSC timebases ("29.97")
+    if "," in frame_rate_spec or "-" in frame_rate_spec:
+        raise ValueError("Expected a single frame rate, got {!r}".format(frame_rate_spec))
+    return parse_frame_rates(frame_rate_spec)[0]
+
+def parse_cue_sheet(cue_sheet_path):
+    # One tempo per line, optionally after a cue name ("opening,128")
+    target_bpms = []
+    with open(cue_sheet_path, "r") as cue_sheet_file:
+        for cue_line in cue_sheet_file:
+            cue_line = cue_line.strip()
+            if cue_line and not cue_line.startswith("#"):
+                target_bpms.append(float(cue_line.split(",")[-1]))
+    return target_bpms
+
+@cache
+def bpm_index(frame_rates):
+    bpm_indices = {}
+    for fps in frame_rates:
+        bpm_entries = sorted(
+            (60 * (fps / frames_per_beat), frames_per_beat)
+            for frames_per_beat in range(int(fps * 2), 0, -1)
+        )
+        bpm_indices[fps] = ([bpm for (bpm, frames_per_beat) in bpm_entries], bpm_entries)
+    return bpm_indices
+
+def lookup_bpm(target_bpm, frame_rates, tolerance, beats_per_bar = 4):
+    # Lookup results are (target_bpm, fps, frames_per_beat, bpm, drift_frames,
+    # drift_milliseconds, in_tolerance), one per frame rate.
+    bpm_indices = bpm_index(frame_rates)
+
+    lookup_results = []
+    for fps in frame_rates:
+        bpm_keys, bpm_entries = bpm_indices[fps]
+        nearest_index = bisect_left(bpm_keys, target_bpm)
+        bpm, frames_per_beat = min(
+            bpm_entries[max(0, nearest_index - 1):nearest_index + 1],
+            key = lambda bpm_entry: abs(bpm_entry[0] - target_bpm),
+        )
+
+        # Positive drift means the guide falls behind the music
+        drift_frames = (frames_per_beat - 60 * fps / target_bpm) * beats_per_bar
+        in_tolerance = abs(bpm - target_bpm) <= tolerance
+        lookup_results.append((target_bpm, fps, frames_per_beat, bpm, drift_frames, drift_frames / fps * 1000, in_tolerance))
+
+    return lookup_results
+
+def lookup_bpms(target_bpms, frame_rates, tolerance, beats_per_bar = 4):
+    lookup_results = []
+    for target_bpm in target_bpms:
+        lookup_results.extend(lookup_bpm(target_bpm, frame_rates, tolerance, beats_per_bar))
+    return lookup_results
+
+################################################################################
+# Beat timeline
+#
+# Streams the frame of every beat of a track from a tempo map. Tempo map lines
+# read "position,bpm[,time signature]", where the position is either a bar
+# number (the change happens at the start of that bar) or a timecode such as
+# "2:10.5" or "1:02:10.5" (the change happens at that time and starts a new
+# bar there). The first line has to be at bar 1, lines are in track order.
+# Beats count the time signature's denominator notes.
+#
+# Besides the nearest frame of every beat, the timeline follows the integer
+# frames-per-beat grid an animator would lay out from the start of each tempo
+# section, and reports how far that grid has drifted from the music.
+
+def parse_timeline_position(position_spec):
+    position_spec = position_spec.strip()
+    if ":" in position_spec:
+        seconds = 0.0
+        for timecode_part in position_spec.split(":"):
+            seconds = seconds * 60 + float(timecode_part)
+        return ("time", seconds)
+    return ("bar", int(position_spec))
+
+def parse_time_signature(time_signature_spec):
+    beats_per_bar, beat_unit = time_signature_spec.strip().split("/")
+    return (int(beats_per_bar), int(beat_unit))
+
+def parse_tempo_map(tempo_map_path):
+    tempo_map = []
+    time_signature = (4, 4)
+    with open(tempo_map_path, "r") as tempo_map_file:
+        for tempo_map_line in tempo_map_file:
+            tempo_map_line = tempo_map_line.strip()
+            if not tempo_map_line or tempo_map_line.startswith("#"):
+                continue
+
+            tempo_map_fields = tempo_map_line.split(",")
+            if len(tempo_map_fields) > 2:
+                time_signature = parse_time_signature(tempo_map_fields[2])
+            tempo_map.append((parse_timeline_position(tempo_map_fields[0]), float(tempo_map_fields[1]), time_signature))
+    return tempo_map
+
+def beat_timeline(tempo_map, fps, end_position):
+    if not tempo_map or tempo_map[0][0] != ("bar", 1):
+        raise ValueError("The tempo map has to start at bar 1")
+
+    tempo_changes = iter(tempo_map)
+    _, bpm, time_signature = next(tempo_changes)
+    next_tempo_change = next(tempo_changes, None)
+
+    bar, beat = 1, 1
+    section_seconds, section_beats = 0.0, 0
+
+    while True:
+        # Beat times are computed from the start of their tempo section rather
+        # than accumulated, so long tracks don't pick up floating point error.
+        seconds = section_seconds + section_beats * 60 / bpm
+
+        if next_tempo_change:
+            (position_kind, position_value), next_bpm, next_time_signature = next_tempo_change
+            if position_kind == "bar" and beat == 1 and bar >= position_value:
+                section_seconds = seconds
+            elif position_kind == "time" and seconds >= position_value - 1e-9:
+                section_seconds = position_value
+                if beat != 1:
+                    bar, beat = bar + 1, 1
+            else:
+                position_kind = None
+
+            if position_kind:
+                bpm, time_signature = next_bpm, next_time_signature
+                section_beats = 0
+                next_tempo_change = next(tempo_changes, None)
+                continue
+
+        match end_position:
+            case ("bar", end_bar) if bar >= end_bar:
+                return
+            case ("time", end_seconds) if seconds >= end_seconds:
+                return
+
+        exact_frame = seconds * fps
+        grid_frame = round(section_seconds * fps) + section_beats * round(60 * fps / bpm)
+
+        yield {
+            "bar":            bar,
+            "beat":           beat,
+            "bpm":            bpm,
+            "time_signature": "{}/{}".format(*time_signature),
+            "seconds":        seconds,
+            "exact_frame":    exact_frame,
+            "frame":          round(exact_frame),
+            "grid_frame":     grid_frame,
+            "drift_frames":   grid_frame - exact_frame,
+        }
+
+        section_beats += 1
+        beat += 1
+        if beat > time_signature[0]:
+            bar, beat = bar + 1, 1
+
 ################################################################################
 # Output formatters
 
@@ -57,33 +251,148 @@ output_formatters = {
     "csv":   output_format_csv,
 }
 
+def lookup_output_format_human(lookup_results):
+    lookup_document = ""
+    for [target_bpm, fps, frames_per_beat, bpm, drift_frames, drift_milliseconds, in_tolerance] in lookup_results:
+        lookup_document += "{:>7} bpm @ {:>7} fps -> {:>3} frames/beat ({:>7} bpm, drift {:>7} frames/bar, {:>8} ms/bar){}\n".format(
+            format_float(target_bpm),
+            format_float(fps),
+            frames_per_beat,
+            format_float(bpm),
+            format_float(drift_frames),
+            format_float(drift_milliseconds, 1),
+            "" if in_tolerance else " out of tolerance",
+        )
+    return lookup_document.rstrip("\n"), "text/plain"
+
+def lookup_output_format_csv(lookup_results):
+    lookup_document = "target_bpm,fps,frames_per_beat,bpm,drift_frames_per_bar,drift_ms_per_bar,in_tolerance\n"
+    for [target_bpm, fps, frames_per_beat, bpm, drift_frames, drift_milliseconds, in_tolerance] in lookup_results:
+        lookup_document += "{},{},{},{},{},{},{}\n".format(
+            target_bpm,
+            fps,
+            frames_per_beat,
+            bpm,
+            drift_frames,
+            drift_milliseconds,
+            int(in_tolerance),
+        )
+    return lookup_document.rstrip("\n"), "text/plain"
+
+lookup_output_formatters = {
+    "human": lookup_output_format_human,
+    "csv":   lookup_output_format_csv,
+}
+
+# Timeline formatters yield one line at a time so that timelines of any length
+# stream in constant memory.
+
+timeline_fields = ["bar", "beat", "bpm", "time_signature", "seconds", "exact_frame", "frame", "grid_frame", "drift_frames"]
+
+def timeline_output_format_human(timeline_beats):
+    for timeline_beat in timeline_beats:
+        yield "bar {:>4} beat {:>2} ({:>7} bpm {:>4}) -> frame {:>6} (grid {:>6}, drift {:>7} frames)\n".format(
+            timeline_beat["bar"],
+            timeline_beat["beat"],
+            format_float(timeline_beat["bpm"]),
+            timeline_beat["time_signature"],
+            timeline_beat["frame"],
+            timeline_beat["grid_frame"],
+            format_float(timeline_beat["drift_frames"]),
+        )
+
+def timeline_output_format_csv(timeline_beats):
+    yield ",".join(timeline_fields) + "\n"
+    for timeline_beat in timeline_beats:
+        yield ",".join(
+            format_float(timeline_beat[field_name], 6) if isinstance(timeline_beat[field_name], float) else str(timeline_beat[field_name])
+            for field_name in timeline_fields
+        ) + "\n"
+
+def timeline_output_format_ndjson(timeline_beats):
+    for timeline_beat in timeline_beats:
+        yield json.dumps(timeline_beat) + "\n"
+
+timeline_output_formatters = {
+    "human":  (timeline_output_format_human,  "text/plain"          ),
+    "csv":    (timeline_output_format_csv,    "text/csv"            ),
+    "ndjson": (timeline_output_format_ndjson, "application/x-ndjson"),
+}
+
 ################################################################################
 # Main
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--command",       type = str,                   )
-parser.add_argument("--fps",           type = int, default = 24      )
-parser.add_argument("--bpm-filter",    type = str, default = "round" )
-parser.add_argument("--output-format", type = str, default = "human" )
-parser.add_argument("--target",        type = str, default = "stdout")
-
-args = parser.parse_args()
-
-match args.command:
-    case "calculate-bpm":
-        bpm_results = calculate_bpm(args.fps, args.bpm_filter)
-        bpm_document, mime_type = output_formatters[args.output_format](bpm_results)
-
-        match args.target:
-            case "stdout":
-                print(bpm_document)
-            case "clipboard":
-                copy_to_clipboard(bpm_document, mime_type)
-
-    case "query-bpm-filters":
-        for (bpm_filter_name, bpm_filter) in bpm_filters.items():
-            print(bpm_filter_name)
-
-    case "query-output-formats":
-        for (output_format, output_formatter) in output_formatters.items():
-            print(output_format)
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",        type = str,                                       )
+    parser.add_argument("--fps",            type = str,   default = "24"                      )
+    parser.add_argument("--bpm-filter",     type = str,   default = "round"                   )
+    parser.add_argument("--bpm",            type = str,   default = "120"                     )
+    parser.add_argument("--cue-sheet",      type = str,                                       )
+    parser.add_argument("--frame-rates",    type = str,   default = "12-120,23.976,29.97,59.94")
+    parser.add_argument("--tolerance",      type = float, default = 0.5                       )
+    parser.add_argument("--beats-per-bar",  type = int,   default = 4                         )
+    parser.add_argument("--tempo-map",      type = str,                                       )
+    parser.add_argument("--time-signature", type = str,   default = "4/4"                     )
+    parser.add_argument("--end",            type = str,   default = "65"                      )
+    parser.add_argument("--output-format",  type = str,   default = "human"                   )
+    parser.add_argument("--target",         type = str,   default = "stdout"                  )
+
+    args = parser.parse_args(argv)
+
+    match args.command:
+        case "calculate-bpm":
+            bpm_results = calculate_bpm(parse_frame_rate(args.fps), args.bpm_filter)
+            bpm_document, mime_type = output_formatters[args.output_format](bpm_results)
+
+            match args.target:
+                case "stdout":
+                    print(bpm_document)
+                case "clipboard":
+                    copy_to_clipboard(bpm_document, mime_type)
+
+        case "lookup-bpm":
+            if args.cue_sheet:
+                target_bpms = parse_cue_sheet(args.cue_sheet)
+            else:
+                target_bpms = [float(target_bpm) for target_bpm in args.bpm.split(",")]
+
+            lookup_results = lookup_bpms(target_bpms, parse_frame_rates(args.frame_rates), args.tolerance, args.beats_per_bar)
+            lookup_document, mime_type = lookup_output_formatters[args.output_format](lookup_results)
+
+            match args.target:
+                case "stdout":
+                    print(lookup_document)
+                case "clipboard":
+                    copy_to_clipboard(lookup_document, mime_type)
+
+        case "create-timeline":
+            if args.tempo_map:
+                tempo_map = parse_tempo_map(args.tempo_map)
+            else:
+                tempo_map = [(("bar", 1), float(args.bpm), parse_time_signature(args.time_signature))]
+
+            timeline_beats = beat_timeline(
+                tempo_map,
+                parse_frame_rate(args.fps),
+                parse_timeline_position(args.end),
+            )
+            timeline_formatter, mime_type = timeline_output_formatters[args.output_format]
+
+            match args.target:
+                case "stdout":
+                    for timeline_line in timeline_formatter(timeline_beats):
+                        sys.stdout.write(timeline_line)
+                case "clipboard":
+                    copy_to_clipboard("".join(timeline_formatter(timeline_beats)), mime_type)
+
+        case "query-bpm-filters":
+            for (bpm_filter_name, bpm_filter) in bpm_filters.items():
+                print(bpm_filter_name)
+
+        case "query-output-formats":
+            for (output_format, output_formatter) in output_formatters.items():
+                print(output_format)
+
+if __name__ == "__main__":
+    profile_main(main)
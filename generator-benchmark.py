@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from svg_utils import load_engine, render_svg_document, format_duration
+
+################################################################################
+# Engines
+
+easing_ruler_engine = load_engine("easing-ruler-engine.py")
+fiducial_engine     = load_engine("fiducial-engine.py")
+hbr_engine          = load_engine("hbr-engine.py")
+template_engine     = load_engine("template-engine.py")
+frames_per_beat     = load_engine("frames-per-beat.py")
+calibration_engine  = load_engine("calibration-engine.py")
+fieldchart_engine   = load_engine("fieldchart-engine.py")
+document_engine     = load_engine("document-engine.py")
+palette_engine      = load_engine("palette-engine.py")
+
+################################################################################
+# Workloads
+#
+# Every workload runs in a fresh, empty working directory and returns the
+# number of operations it did (documents produced, for the generators) and the
+# total size of its output in bytes.
+
+def easing_ruler_constructor_workload(ruler_name):
+    def workload():
+        svg_document = render_svg_document(
+            easing_ruler_engine.create_svg_constructors[ruler_name],
+            easing_function = easing_ruler_engine.easing_functions["ease-inout-pow2"],
+            ruler_frames = 8,
+            ruler_degrees = 360,
+        )
+        return 1, len(svg_document.encode("utf-8"))
+    return workload
+
+def easing_ruler_full_run_workload():
+    easing_ruler_engine.write_svg_rulers(easing_ruler_engine.svg_ruler_jobs(), 1, force = True)
+    return output_tree_size("rulers")
+
+def hbr_guides_workload():
+    operations, output_bytes = 0, 0
+    for guide_style in hbr_engine.guide_styles:
+        for body_ratios in hbr_engine.head_body_ratios.values():
+            svg_document = render_svg_document(hbr_engine.create_hbr_guide, body_ratios, guide_style)
+            operations += 1
+            output_bytes += len(svg_document.encode("utf-8"))
+    return operations, output_bytes
+
+def hbr_sweep_workload():
+    # A single job keeps the rendering in this process, where the peak
+    # memory measurement can see it
+    sweep_body_ratios = list(hbr_engine.interpolate_body_ratios([hbr_engine.head_body_ratios["female-1:2.5-01"], hbr_engine.head_body_ratios["female-1:7.0-01"]], 200))
+    hbr_engine.write_hbr_guides(hbr_engine.sweep_jobs("sweep", sweep_body_ratios, hbr_engine.guide_styles), 1, force = True)
+    return output_tree_size("character")
+
+def hbr_previews_workload():
+    from svg_raster import render_png_document
+    operations, output_bytes = 0, 0
+    for guide_style in hbr_engine.guide_styles:
+        for body_ratios in hbr_engine.head_body_ratios.values():
+            png_document = render_png_document(hbr_engine.create_hbr_guide, body_ratios, guide_style)
+            operations += 1
+            output_bytes += len(png_document)
+    return operations, output_bytes
+
+def template_expansion_workload():
+    operations, output_bytes = 0, 0
+    for (template_base_directory, template) in template_engine.template_engine.items():
+        for template_svg_data in template_svg_files[template_base_directory]:
+            compiled_template = template_engine.compile_template(template_svg_data, template["template_field_names"])
+            for (instance_name, instance_data) in template["template_dataset"]:
+                instance_svg_data = template_engine.expand_template(compiled_template, instance_data)
+                operations += 1
+                output_bytes += len(instance_svg_data.encode("utf-8"))
+    return operations, output_bytes
+
+def template_full_run_workload():
+    for template_base_directory in template_engine.template_engine.keys():
+        shutil.copytree(
+            os.path.join(repository_directory, template_base_directory, ".templates"),
+            os.path.join(template_base_directory, ".templates"),
+        )
+    template_engine.expand_templates(force = True)
+    return output_tree_size("stamps", exclude_directory = ".templates")
+
+def xt16bfm_canonicalize_workload():
+    for value in range(0, 65536):
+        fiducial_engine.xt16bfm_canonicalize(value)
+    return 65536, 0
+
+def xt16bfm_canonical_table_workload():
+    fiducial_engine.xt16bfm_build_canonical_table()
+    return 1, 0
+
+def calibration_full_run_workload():
+    calibration_engine.write_calibration_batch("calibration", ["4:3", "16:9", "2.39:1"], {}, {"compact": True}, force = True)
+    return output_tree_size("calibration")
+
+def fieldchart_full_run_workload():
+    fieldchart_engine.frame_geometry.cache_clear()
+    fieldchart_engine.field_geometry.cache_clear()
+    fieldchart_engine.write_charts(fieldchart_engine.chart_jobs(fieldchart_engine.aspect_ratios, [12, 16], [4, 8, 12, 16]), "charts", 1, force = True)
+    return output_tree_size("charts")
+
+def document_full_run_workload():
+    document_engine.write_documents(document_engine.document_jobs(["en", "jp"]), "documents", force = True, writer_options = {"compact": True})
+    return output_tree_size("documents")
+
+def palette_sweep_workload():
+    sweep_family = palette_engine.create_sweep_family("oklch", 720, palette_engine.parse_palette_rows(
+        "Paper:95:0.04,Paper:90.4:0.032,Paint:80:0.12,Paint:75.81:0.108:-3,Ink:45:0.16,Trace:50.39:0.192:-6",
+    ))
+    palette_engine.write_palette_sweep(sweep_family, "palette-sweep", "colors")
+    return output_tree_size("colors")
+
+def calculate_bpm_workload():
+    operations, output_bytes = 0, 0
+    for fps in [12, 24, 25, 30, 48, 50, 60, 120]:
+        bpm_results = frames_per_beat.calculate_bpm(fps, "none")
+        bpm_document, mime_type = frames_per_beat.output_format_csv(bpm_results)
+        operations += 1
+        output_bytes += len(bpm_document.encode("utf-8"))
+    return operations, output_bytes
+
+def output_tree_size(output_directory, exclude_directory = None):
+    operations, output_bytes = 0, 0
+    for (directory_path, directory_names, file_names) in os.walk(output_directory):
+        if exclude_directory in directory_names:
+            directory_names.remove(exclude_directory)
+        for file_name in file_names:
+            operations += 1
+            output_bytes += os.path.getsize(os.path.join(directory_path, file_name))
+    return operations, output_bytes
+
+workloads = {
+    **{
+        "easing-ruler/{}".format(ruler_name): easing_ruler_constructor_workload(ruler_name)
+        for ruler_name in easing_ruler_engine.create_svg_constructors.keys()
+    },
+    "easing-ruler/full-run":         easing_ruler_full_run_workload,
+    "hbr/all-guides":                hbr_guides_workload,
+    "hbr/all-previews":              hbr_previews_workload,
+    "hbr/sweep":                     hbr_sweep_workload,
+    "template/expansion":            template_expansion_workload,
+    "template/full-run":             template_full_run_workload,
+    "fiducial/xt16bfm-canonicalize": xt16bfm_canonicalize_workload,
+    "fiducial/xt16bfm-table-build":  xt16bfm_canonical_table_workload,
+    "calibration/full-run":          calibration_full_run_workload,
+    "fieldchart/full-run":           fieldchart_full_run_workload,
+    "document/full-run":             document_full_run_workload,
+    "palette/sweep":                 palette_sweep_workload,
+    "frames-per-beat/calculate-bpm": calculate_bpm_workload,
+}
+
+################################################################################
+# Benchmark harness
+
+repository_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Template sources are read once up front, the template expansion workload
+# only measures compiling and expanding them
+template_svg_files = {}
+
+def load_template_svg_files():
+    for (template_base_directory, template) in template_engine.template_engine.items():
+        template_svg_files[template_base_directory] = []
+        for template_file_name in template["template_file_names"]:
+            template_svg_path = os.path.join(repository_directory, template_base_directory, ".templates", "template-{}.svg".format(template_file_name))
+            with open(template_svg_path, "r") as template_svg_file:
+                template_svg_files[template_base_directory].append(template_svg_file.read())
+
+def run_workload(workload):
+    with tempfile.TemporaryDirectory() as work_directory:
+        os.chdir(work_directory)
+        try:
+            start_time = time.perf_counter()
+            operations, output_bytes = workload()
+            elapsed_time = time.perf_counter() - start_time
+        finally:
+            os.chdir(repository_directory)
+    return elapsed_time, operations, output_bytes
+
+def benchmark_workload(workload, repeat):
+    # Timed runs are done without tracemalloc, peak memory is measured in an
+    # extra run since tracing slows allocations down considerably.
+    elapsed_times = []
+    for _ in range(0, repeat):
+        elapsed_time, operations, output_bytes = run_workload(workload)
+        elapsed_times.append(elapsed_time)
+
+    tracemalloc.start()
+    run_workload(workload)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median_time = statistics.median(elapsed_times)
+    return {
+        "repeat":                repeat,
+        "median_seconds":        median_time,
+        "min_seconds":           min(elapsed_times),
+        "max_seconds":           max(elapsed_times),
+        "operations":            operations,
+        "operations_per_second": operations / median_time,
+        "seconds_per_operation": median_time / operations,
+        "output_bytes":          output_bytes,
+        "peak_memory_bytes":     peak_memory,
+    }
+
+def format_results(benchmark_results, baseline_results = None):
+    lines = ["{:<34} {:>10} {:>12} {:>12} {:>10} {:>12} {:>9}".format(
+        "workload", "median", "per op", "ops/s", "peak mem", "output", "vs base",
+    )]
+    for (workload_name, result) in benchmark_results["workloads"].items():
+        baseline_result = (baseline_results or {}).get("workloads", {}).get(workload_name)
+        lines.append("{:<34} {:>10} {:>12} {:>12} {:>10} {:>12} {:>9}".format(
+            workload_name,
+            format_duration(result["median_seconds"]),
+            format_duration(result["seconds_per_operation"]),
+            "{:.0f}".format(result["operations_per_second"]),
+            "{:.1f} MB".format(result["peak_memory_bytes"] / 1e6),
+            "{} B".format(result["output_bytes"]),
+            "{:.2f}x".format(baseline_result["median_seconds"] / result["median_seconds"]) if baseline_result else "-",
+        ))
+    return "\n".join(lines)
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads", type = str, default = ""   )
+    parser.add_argument("--repeat",    type = int, default = 5    )
+    parser.add_argument("--output",    type = str,                )
+    parser.add_argument("--compare",   type = str,                )
+
+    args = parser.parse_args(argv)
+
+    # Warm up lazily built tables so the workloads measure steady state
+    fiducial_engine.xt16bfm_canonical_table()
+    load_template_svg_files()
+
+    selected_workloads = [
+        workload_name for workload_name in workloads.keys()
+        if not args.workloads or any(workload_name.startswith(prefix) for prefix in args.workloads.split(","))
+    ]
+
+    benchmark_results = {
+        "python":    platform.python_version(),
+        "platform":  platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workloads": {},
+    }
+
+    for workload_name in selected_workloads:
+        benchmark_results["workloads"][workload_name] = benchmark_workload(workloads[workload_name], args.repeat)
+        print("{} done".format(workload_name), file = sys.stderr)
+
+    baseline_results = None
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline_results = json.load(baseline_file)
+
+    print(format_results(benchmark_results, baseline_results))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(benchmark_results, output_file, indent = 4)
+            output_file.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from svg_utils import load_engine, render_svg_document, svg_document_cache
+
+################################################################################
+# Engines
+#
+# Every engine script is loaded once when the server starts, requests only pay
+# for the document generation itself.
+
+easing_ruler_engine = load_engine("easing-ruler-engine.py")
+fiducial_engine     = load_engine("fiducial-engine.py")
+hbr_engine          = load_engine("hbr-engine.py")
+frames_per_beat     = load_engine("frames-per-beat.py")
+
+create_svg_constructors = {
+    ruler_name: svg_document_cache.cached(ruler_constructor)
+    for (ruler_name, ruler_constructor) in easing_ruler_engine.create_svg_constructors.items()
+}
+fiducial_styles = {
+    fiducial_style: svg_document_cache.cached(fiducial_constructor)
+    for (fiducial_style, fiducial_constructor) in fiducial_engine.fiducial_styles.items()
+}
+create_hbr_guide = svg_document_cache.cached(hbr_engine.create_hbr_guide)
+
+################################################################################
+# Request handlers
+#
+# Handlers take the JSON request parameters, missing parameters fall back to
+# the same defaults as the engines' command line interfaces.
+
+def easing_ruler_create_svg(params):
+    svg_document = render_svg_document(
+        create_svg_constructors[params.get("ruler_name", "simple-straight")],
+        easing_function = easing_ruler_engine.lookup_easing_function(params.get("easing_function_name", "ease-inout-pow2")),
+        ruler_frames = int(params.get("ruler_frames", 8)),
+        ruler_degrees = float(params.get("ruler_degrees", 360)),
+        tolerance = float(params.get("tolerance", easing_ruler_engine.default_tolerance)),
+    )
+    return svg_document, "image/svg+xml"
+
+def fiducial_create_svg(params):
+    svg_document = render_svg_document(
+        fiducial_styles[params.get("style", "xt16bfm")],
+        int(params.get("value", 0)),
+    )
+    return svg_document, "image/svg+xml"
+
+def hbr_create_svg(params):
+    svg_document = render_svg_document(
+        create_hbr_guide,
+        [float(param) for param in params.get("params", list(hbr_engine.head_body_ratios.values())[0])],
+        params.get("style", "figure"),
+    )
+    return svg_document, "image/svg+xml"
+
+def frames_per_beat_calculate_bpm(params):
+    bpm_results = frames_per_beat.calculate_bpm(frames_per_beat.parse_frame_rate(str(params.get("fps", 24))), params.get("bpm_filter", "round"))
+    return frames_per_beat.output_formatters[params.get("output_format", "human")](bpm_results)
+
+def frames_per_beat_lookup_bpm(params):
+    lookup_results = frames_per_beat.lookup_bpms(
+        [float(target_bpm) for target_bpm in params.get("bpm", [120])],
+        frames_per_beat.parse_frame_rates(params.get("frame_rates", "12-120,23.976,29.97,59.94")),
+        float(params.get("tolerance", 0.5)),
+        int(params.get("beats_per_bar", 4)),
+    )
+    return frames_per_beat.lookup_output_formatters[params.get("output_format", "human")](lookup_results)
+
+request_handlers = {
+    "/easing-ruler/create-svg":       easing_ruler_create_svg,
+    "/fiducial/create-svg":           fiducial_create_svg,
+    "/hbr/create-svg":                hbr_create_svg,
+    "/frames-per-beat/calculate-bpm": frames_per_beat_calculate_bpm,
+    "/frames-per-beat/lookup-bpm":    frames_per_beat_lookup_bpm,
+}
+
+################################################################################
+# Server
+
+class GeneratorRequestHandler(BaseHTTPRequestHandler):
+    verbose = False
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def send_document(self, status, document, mime_type):
+        document_bytes = document.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "{}; charset=utf-8".format(mime_type))
+        self.send_header("Content-Length", str(len(document_bytes)))
+        self.end_headers()
+        self.wfile.write(document_bytes)
+
+    def do_GET(self):
+        if self.path == "/":
+            self.send_document(200, "\n".join(request_handlers.keys()) + "\n", "text/plain")
+        elif self.path == "/cache-stats":
+            self.send_document(200, json.dumps(svg_document_cache.stats()) + "\n", "application/json")
+        else:
+            self.send_document(404, "Unknown request: {}\n".format(self.path), "text/plain")
+
+    def do_POST(self):
+        request_handler = request_handlers.get(self.path)
+        if request_handler is None:
+            self.send_document(404, "Unknown request: {}\n".format(self.path), "text/plain")
+            return
+
+        try:
+            request_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            params = json.loads(request_body) if request_body else {}
+            if not isinstance(params, dict):
+                raise TypeError("Request parameters must be a JSON object")
+            document, mime_type = request_handler(params)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_document(400, "Invalid request: {!r}\n".format(error), "text/plain")
+            return
+        except Exception as error:
+            # Anything else is a generator failure, the client still gets an
+            # answer instead of a dropped connection
+            self.send_document(500, "Generator error: {!r}\n".format(error), "text/plain")
+            return
+
+        self.send_document(200, document, mime_type)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host",       type = str, default = "127.0.0.1")
+    parser.add_argument("--port",       type = int, default = 8642       )
+    parser.add_argument("--socket",     type = str,                      )
+    parser.add_argument("--cache-size", type = int, default = 1024       )
+    parser.add_argument("--verbose",    action = "store_true"            )
+
+    args = parser.parse_args(argv)
+    GeneratorRequestHandler.verbose = args.verbose
+    svg_document_cache.max_documents = args.cache_size
+
+    if args.socket:
+        generator_server = UnixHTTPServer(args.socket, GeneratorRequestHandler)
+        print("Serving on unix:{}".format(args.socket), file = sys.stderr)
+    else:
+        generator_server = HTTPServer((args.host, args.port), GeneratorRequestHandler)
+        print("Serving on http://{}:{}/".format(args.host, args.port), file = sys.stderr)
+
+    try:
+        generator_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator_server.server_close()
+        if args.socket:
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# Library API and single command line entry point for the generator engines.
+#
+# Importing this module has no side effects, every engine is only loaded when
+# one of its functions or its subcommand is first used:
+#
+#   import guides
+#   svg_document = guides.create_easing_ruler_svg("simple-radial", ruler_degrees = 180)
+#
+#   ./guides.py easing-ruler --command create-svg --ruler-name simple-radial
+#   ./guides.py fiducial --command query-canonical-values
+
+import sys
+
+from svg_utils import load_engine, render_svg_document, profile_main
+
+################################################################################
+# Engines
+
+engine_files = {
+    "easing-ruler":    "easing-ruler-engine.py",
+    "fiducial":        "fiducial-engine.py",
+    "hbr":             "hbr-engine.py",
+    "template":        "template-engine.py",
+    "frames-per-beat": "frames-per-beat.py",
+    "calibration":     "calibration-engine.py",
+    "fieldchart":      "fieldchart-engine.py",
+    "document":        "document-engine.py",
+    "palette":         "palette-engine.py",
+}
+
+def engine(engine_name):
+    return load_engine(engine_files[engine_name])
+
+################################################################################
+# Library API
+
+def create_easing_ruler_svg(ruler_name = "simple-straight", easing_function_name = "ease-inout-pow2", ruler_frames = 8, ruler_degrees = 360, tolerance = None):
+    easing_ruler_engine = engine("easing-ruler")
+    return render_svg_document(
+        easing_ruler_engine.create_svg_constructors[ruler_name],
+        easing_function = easing_ruler_engine.lookup_easing_function(easing_function_name),
+        ruler_frames = ruler_frames,
+        ruler_degrees = ruler_degrees,
+        tolerance = easing_ruler_engine.default_tolerance if tolerance is None else tolerance,
+    )
+
+def create_fiducial_svg(value, style = "xt16bfm"):
+    return render_svg_document(engine("fiducial").fiducial_styles[style], value)
+
+def create_hbr_svg(body_ratios, style = "figure"):
+    hbr_engine = engine("hbr")
+    if isinstance(body_ratios, str):
+        body_ratios = hbr_engine.head_body_ratios[body_ratios]
+    return render_svg_document(hbr_engine.create_hbr_guide, body_ratios, style)
+
+def interpolate_hbr_body_ratios(body_ratio_stops, steps):
+    hbr_engine = engine("hbr")
+    return list(hbr_engine.interpolate_body_ratios([hbr_engine.parse_body_ratios(body_ratios) if isinstance(body_ratios, str) else body_ratios for body_ratios in body_ratio_stops], steps))
+
+def create_calibration_svg(sheet_name = "grid-chessboard", **sheet_params):
+    return render_svg_document(engine("calibration").calibration_sheets[sheet_name], **sheet_params)
+
+def create_chart_svg(chart_family = "fieldchart", chart_style = "fields", aspect_ratio = "16:9", **chart_params):
+    chart_constructor = engine("fieldchart").chart_families[chart_family][chart_style]
+    return render_svg_document(chart_constructor, aspect_ratio = aspect_ratio, grid_style = chart_style, **chart_params)
+
+def create_document_svg(document_type = "timesheet", compact = True, **document_params):
+    return render_svg_document(engine("document").document_types[document_type], writer_options = {"compact": compact}, **document_params)
+
+def create_palette(palette_name = "keyframe-colors-oklch", output_format = "gpl"):
+    palette_engine = engine("palette")
+    family_names = [palette_name] if palette_name in palette_engine.palette_families else palette_engine.palette_documents[palette_name]
+    palette_document, mime_type = palette_engine.output_formatters[output_format](palette_engine.create_palette_document(family_names))
+    return palette_document
+
+def calculate_bpm(fps, bpm_filter = "round"):
+    return engine("frames-per-beat").calculate_bpm(fps, bpm_filter)
+
+def lookup_bpm(target_bpms, frame_rates = "12-120,23.976,29.97,59.94", tolerance = 0.5, beats_per_bar = 4):
+    frames_per_beat = engine("frames-per-beat")
+    return frames_per_beat.lookup_bpms(target_bpms, frames_per_beat.parse_frame_rates(frame_rates), tolerance, beats_per_bar)
+
+def expand_templates(force = False):
+    engine("template").expand_templates(force)
+
+def easing_function(easing_function_name):
+    return engine("easing-ruler").lookup_easing_function(easing_function_name)
+
+def inverse_easing_function(easing_function_name):
+    return engine("easing-ruler").lookup_inverse_easing_function(easing_function_name)
+
+def invert_easing_function(easing_function_name, positions):
+    return engine("easing-ruler").lookup_array_inverse_easing_function(easing_function_name)(positions)
+
+################################################################################
+# Main
+
+def main(argv = None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if not argv or argv[0] not in engine_files:
+        print("usage: guides.py {{{}}} [engine arguments...]".format(",".join(engine_files.keys())), file = sys.stderr)
+        return 2
+
+    engine(argv[0]).main(argv[1:])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(profile_main(main))
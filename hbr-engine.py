@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 
 import argparse
-import os
-from textwrap import dedent
+import sys
+from functools import partial
+from itertools import product
 
-from svg_utils import svg_style, format_float, copy_to_clipboard
+from svg_utils import SvgWriter, render_svg_document, svg_stylesheet, stylesheet_href, format_float, copy_to_clipboard
+from svg_utils import generator_source_digest, generator_inputs_digest, write_batch
+from svg_utils import profile_main
 
 ################################################################################
 # Constants
@@ -40,6 +43,19 @@ head_body_ratios = {
     "female-1:7.0-01": [1.000, 1.000, 0.850, 1.100, 0.600, 0.000, 0.140,  4 /  3,  1 /  1, 11 /  3],
 }
 
+body_ratio_names = [
+    "head_width_ratio",
+    "shoulder_width_ratio",
+    "waist_width_ratio",
+    "hip_width_ratio",
+    "feet_width_ratio",
+    "feet_separation_ratio",
+    "neck_length_ratio",
+    "upper_body_length_ratio",
+    "lower_body_length_ratio",
+    "legs_length_ratio",
+]
+
 guide_styles = [
     "figure",
     "simple",
@@ -49,7 +65,7 @@ guide_styles = [
 ################################################################################
 #  SVG document generator
 
-def create_hbr_guide(body_ratios, guide_style):
+def create_hbr_guide(svg_writer, body_ratios, guide_style):
     head_width_ratio,  shoulder_width_ratio,    waist_width_ratio,       \
     hip_width_ratio,   feet_width_ratio,        feet_separation_ratio,   \
     neck_length_ratio, upper_body_length_ratio, lower_body_length_ratio, \
@@ -84,105 +100,81 @@ def create_hbr_guide(body_ratios, guide_style):
             #    +-----|---ooooo---|-----+ 384   -  -
 
             def draw_lines(lines):
-                svg_data = ""
                 for ([(x1, y1), (x2, y2)], mirror) in lines:
-                    svg_data += '<line class="secondary" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" />'.format(
-                        x1 = format_float(x1), y1 = format_float(y1),
-                        x2 = format_float(x2), y2 = format_float(y2),
-                    )
+                    svg_writer.element("line", class_ = "secondary", x1 = x1, y1 = y1, x2 = x2, y2 = y2)
                     if mirror:
-                        svg_data += '<line class="secondary" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" />'.format(
-                            x1 = format_float(-x1), y1 = format_float(y1),
-                            x2 = format_float(-x2), y2 = format_float(y2),
-                        )
-                return svg_data
+                        svg_writer.element("line", class_ = "secondary", x1 = -x1, y1 = y1, x2 = -x2, y2 = y2)
 
             svg_content_width = 128
-            svg_contents = ""
 
             svg_width = svg_content_width * 2
             svg_height = (1 + neck_length_ratio + upper_body_length_ratio + lower_body_length_ratio + legs_length_ratio) * svg_content_width
 
-            # Head
-            head_width, head_height = head_width_ratio * svg_content_width, svg_content_width
-            eyes_width, eyes_height = 0.5, 0.25
-
-            match guide_style:
-                case "figure":
-                    svg_contents += '<ellipse class="secondary" cx="{cx}" cy="{cy}" rx="{rx}" ry="{ry}" />'.format(
-                        cx = format_float(head_width  * 0.0),
-                        cy = format_float(head_height * 0.5),
-                        rx = format_float(head_width  * 0.5),
-                        ry = format_float(head_height * 0.5),
-                    )
-
-                    svg_contents += draw_lines([
-                        ([(head_width * -0.5, head_height * 0.5), (head_width * 0.5, head_height * 0.5)], False),
-                        ([(head_width *  0.0, head_height * 0.0), (head_width * 0.0, head_height * 1.0)], False),
-                    ])
-
-                    svg_contents += draw_lines([
-                        ([(head_width * (eyes_width * 0.5), head_height * (0.5 - eyes_height * 0.5)),
-                        (head_width * (eyes_width * 0.5), head_height * (0.5 + eyes_height * 0.5))], True),
-                    ])
-                case "simple":
-                    svg_contents += '<circle class="secondary" cx="{cx}" cy="{cy}" r="{r}" />'.format(
-                        cx = format_float(svg_content_width * 0.0),
-                        cy = format_float(svg_content_width * 0.5),
-                        r  = format_float(svg_content_width * 0.5),
-                    )
-
-            # Body
-            x_shoulder = (shoulder_width_ratio  * 0.5) * svg_content_width
-            x_waist    = (waist_width_ratio     * 0.5) * svg_content_width
-            x_hip      = (hip_width_ratio       * 0.5) * svg_content_width
-            x1_feet    = (feet_separation_ratio * 0.5) * svg_content_width
-            x2_feet    = (feet_width_ratio      * 0.5) * svg_content_width + x1_feet
-            x_groin    = 0
-
-            y_shoulder = (1 + neck_length_ratio                                                                        ) * head_height
-            y_waist    = (1 + neck_length_ratio + upper_body_length_ratio                                              ) * head_height
-            y_hip      = (1 + neck_length_ratio + upper_body_length_ratio + lower_body_length_ratio                    ) * head_height
-            y_feet     = (1 + neck_length_ratio + upper_body_length_ratio + lower_body_length_ratio + legs_length_ratio) * head_height
-
-            match guide_style:
-                case "figure":
-                    svg_contents += draw_lines([
-                        ([(-x_shoulder, y_shoulder), (x_shoulder, y_shoulder)], False),
-                        ([(-x_waist,    y_waist   ), (x_waist,    y_waist   )], False),
-                        ([(-x_hip,      y_hip     ), (x_hip,      y_hip     )], False),
-                        ([( x_shoulder, y_shoulder), (x_waist,    y_waist   )], True ),
-                        ([( x_waist,    y_waist   ), (x_hip,      y_hip     )], True ),
-                        ([( x_groin,    y_hip     ), (x1_feet,    y_feet,   )], True ),
-                        ([( x_hip,      y_hip     ), (x2_feet,    y_feet,   )], True ),
-                        ([( x1_feet,    y_feet    ), (x2_feet,    y_feet    )], True ),
-                    ])
-                case "simple":
-                    svg_contents += draw_lines([
-                        ([(-svg_content_width * 0.5, y_shoulder), (svg_content_width * 0.5, y_shoulder)], False),
-                        ([(-svg_content_width * 0.5, y_waist   ), (svg_content_width * 0.5, y_waist   )], False),
-                        ([(-svg_content_width * 0.5, y_hip     ), (svg_content_width * 0.5, y_hip     )], False),
-                        ([(-svg_content_width * 0.5, y_feet    ), (svg_content_width * 0.5, y_feet    )], False),
-                    ])
-
-            return dedent("""\
-                <svg width="{svg_width}" height="{svg_height}" viewBox="{svg_vbox_x} 0 {svg_width} {svg_height}" xmlns="http://www.w3.org/2000/svg">
-                    {svg_style}
-                    <g id="hbr">
-                        {svg_contents}
-                    </g>
-                </svg>
-            """).format(
-                svg_width    = format_float(svg_width),
-                svg_height   = format_float(svg_height),
-                svg_vbox_x   = format_float(-svg_width / 2),
-                svg_style    = svg_style,
-                svg_contents = svg_contents,
-            )
+            with svg_writer.document(svg_width, svg_height, view_box_x = -svg_width / 2), \
+                 svg_writer.group("hbr"), svg_writer.row():
+                # Head
+                head_width, head_height = head_width_ratio * svg_content_width, svg_content_width
+                eyes_width, eyes_height = 0.5, 0.25
 
-        case "printable":
-            svg_contents = ""
+                match guide_style:
+                    case "figure":
+                        svg_writer.element("ellipse", class_ = "secondary",
+                            cx = head_width  * 0.0,
+                            cy = head_height * 0.5,
+                            rx = head_width  * 0.5,
+                            ry = head_height * 0.5,
+                        )
+
+                        draw_lines([
+                            ([(head_width * -0.5, head_height * 0.5), (head_width * 0.5, head_height * 0.5)], False),
+                            ([(head_width *  0.0, head_height * 0.0), (head_width * 0.0, head_height * 1.0)], False),
+                        ])
 
+                        draw_lines([
+                            ([(head_width * (eyes_width * 0.5), head_height * (0.5 - eyes_height * 0.5)),
+                            (head_width * (eyes_width * 0.5), head_height * (0.5 + eyes_height * 0.5))], True),
+                        ])
+                    case "simple":
+                        svg_writer.element("circle", class_ = "secondary",
+                            cx = svg_content_width * 0.0,
+                            cy = svg_content_width * 0.5,
+                            r  = svg_content_width * 0.5,
+                        )
+
+                # Body
+                x_shoulder = (shoulder_width_ratio  * 0.5) * svg_content_width
+                x_waist    = (waist_width_ratio     * 0.5) * svg_content_width
+                x_hip      = (hip_width_ratio       * 0.5) * svg_content_width
+                x1_feet    = (feet_separation_ratio * 0.5) * svg_content_width
+                x2_feet    = (feet_width_ratio      * 0.5) * svg_content_width + x1_feet
+                x_groin    = 0
+
+                y_shoulder = (1 + neck_length_ratio                                                                        ) * head_height
+                y_waist    = (1 + neck_length_ratio + upper_body_length_ratio                                              ) * head_height
+                y_hip      = (1 + neck_length_ratio + upper_body_length_ratio + lower_body_length_ratio                    ) * head_height
+                y_feet     = (1 + neck_length_ratio + upper_body_length_ratio + lower_body_length_ratio + legs_length_ratio) * head_height
+
+                match guide_style:
+                    case "figure":
+                        draw_lines([
+                            ([(-x_shoulder, y_shoulder), (x_shoulder, y_shoulder)], False),
+                            ([(-x_waist,    y_waist   ), (x_waist,    y_waist   )], False),
+                            ([(-x_hip,      y_hip     ), (x_hip,      y_hip     )], False),
+                            ([( x_shoulder, y_shoulder), (x_waist,    y_waist   )], True ),
+                            ([( x_waist,    y_waist   ), (x_hip,      y_hip     )], True ),
+                            ([( x_groin,    y_hip     ), (x1_feet,    y_feet,   )], True ),
+                            ([( x_hip,      y_hip     ), (x2_feet,    y_feet,   )], True ),
+                            ([( x1_feet,    y_feet    ), (x2_feet,    y_feet    )], True ),
+                        ])
+                    case "simple":
+                        draw_lines([
+                            ([(-svg_content_width * 0.5, y_shoulder), (svg_content_width * 0.5, y_shoulder)], False),
+                            ([(-svg_content_width * 0.5, y_waist   ), (svg_content_width * 0.5, y_waist   )], False),
+                            ([(-svg_content_width * 0.5, y_hip     ), (svg_content_width * 0.5, y_hip     )], False),
+                            ([(-svg_content_width * 0.5, y_feet    ), (svg_content_width * 0.5, y_feet    )], False),
+                        ])
+
+        case "printable":
             total_height   = 1 + upper_body_length_ratio + lower_body_length_ratio + legs_length_ratio
             line_positions = [
                 (1                                                     ) / total_height,
@@ -190,60 +182,237 @@ def create_hbr_guide(body_ratios, guide_style):
                 (1 +  upper_body_length_ratio + lower_body_length_ratio) / total_height,
             ]
 
-            for t in line_positions:
-                svg_contents += '<line class="primary" x1="0" y1="576" x2="576" y2="{y}" />'.format(
-                    y = format_float(t * 576),
-                )
-
-            for t in map(lambda line: line / 12, range(1, 12)):
-                svg_contents += '<line class="secondary" x1="{x}" y1="{y}" x2="{x}" y2="576" />'.format(
-                    x = format_float(t * 576),
-                    y = format_float(576 - (t * 576)),
-                )
-
-            return dedent("""\
-                <svg width="576" height="576" viewBox="0 0 576 576" xmlns="http://www.w3.org/2000/svg">
-                    {svg_style}
-                    <g id="hbr">
-                        <polygon class="primary" points="0,576 576,576 576,0" />
-                        {svg_contents}
-                    </g>
-                </svg>
-            """).format(
-                svg_style    = svg_style,
-                svg_contents = svg_contents,
-            )
+            with svg_writer.document(576, 576), svg_writer.group("hbr"):
+                svg_writer.element("polygon", class_ = "primary", points = "0,576 576,576 576,0")
+
+                with svg_writer.row():
+                    for t in line_positions:
+                        svg_writer.element("line", class_ = "primary", x1 = 0, y1 = 576, x2 = 576, y2 = t * 576)
+
+                    for t in map(lambda line: line / 12, range(1, 12)):
+                        svg_writer.element("line", class_ = "secondary", x1 = t * 576, y1 = 576 - (t * 576), x2 = t * 576, y2 = 576)
+
+################################################################################
+# Sweeps
+#
+# Sweeps produce body ratio vectors between the presets: an interpolation
+# walks the piecewise linear path through two or more presets, a grid steps
+# through chosen ratio dimensions of a base vector and takes every
+# combination of them.
+
+def parse_body_ratios(body_ratios_spec):
+    # Preset name or ten comma separated ratios
+    if body_ratios_spec in head_body_ratios:
+        return head_body_ratios[body_ratios_spec]
+    return [float(body_ratio) for body_ratio in body_ratios_spec.split(",")]
+
+def interpolate_body_ratios(body_ratio_stops, steps):
+    # Samples are spread evenly along the stops, every segment between two
+    # neighbouring stops gets an equal share, and include both ends
+    segments = len(body_ratio_stops) - 1
+    for step_index in range(0, steps):
+        position = step_index / (steps - 1) * segments if steps > 1 else 0.0
+        segment_index = min(int(position), segments - 1)
+        t = position - segment_index
+        yield [
+            a + (b - a) * t
+            for (a, b) in zip(body_ratio_stops[segment_index], body_ratio_stops[segment_index + 1])
+        ]
+
+def parse_grid_dimensions(grid_spec):
+    # "legs_length_ratio=1:3:5,neck_length_ratio=0.05:0.15:3" -> name=start:end:count
+    grid_dimensions = []
+    for dimension_spec in grid_spec.split(","):
+        body_ratio_name, range_spec = dimension_spec.split("=")
+        range_start, range_end, range_count = range_spec.split(":")
+        grid_dimensions.append((
+            body_ratio_names.index(body_ratio_name),
+            list(interpolate_body_ratios([[float(range_start)], [float(range_end)]], int(range_count))),
+        ))
+    return grid_dimensions
+
+def grid_body_ratios(base_body_ratios, grid_dimensions):
+    for dimension_values in product(*[values for (body_ratio_index, values) in grid_dimensions]):
+        body_ratios = list(base_body_ratios)
+        for ((body_ratio_index, values), [value]) in zip(grid_dimensions, dimension_values):
+            body_ratios[body_ratio_index] = value
+        yield body_ratios
+
+def sweep_jobs(sweep_name, sweep_body_ratios, styles):
+    # (guide_style, hbr_name, body_ratios), every style of every vector
+    sweep_body_ratios = list(sweep_body_ratios)
+    for guide_style in styles:
+        for (sweep_index, body_ratios) in enumerate(sweep_body_ratios):
+            yield (guide_style, "{}-{:03}".format(sweep_name, sweep_index), body_ratios)
+
+def sweep_index_document(sweep_name, sweep_body_ratios):
+    # CSV listing the vector behind every numbered guide of a sweep
+    # The head count leaves the neck out, like the preset names do
+    sweep_document = "name,head_count,{}\n".format(",".join(body_ratio_names))
+    for (sweep_index, body_ratios) in enumerate(sweep_body_ratios):
+        sweep_document += "{}-{:03},{},{}\n".format(
+            sweep_name,
+            sweep_index,
+            format_float(1 + sum(body_ratios[7:10]), 6),
+            ",".join(format_float(body_ratio, 6) for body_ratio in body_ratios),
+        )
+    return sweep_document
+
+################################################################################
+# Batch
+
+def preset_jobs():
+    # (guide_style, hbr_name, body_ratios)
+    for guide_style in guide_styles:
+        for (hbr_name, body_ratios) in head_body_ratios.items():
+            yield (guide_style, hbr_name, body_ratios)
+
+def hbr_guide_path(output_directory, guide_style, hbr_name):
+    return "{}character/hbr/{}/hbr-{}.svg".format(output_directory, guide_style, hbr_name)
+
+def render_hbr_guide(hbr_job, output_directory = "", writer_options = None, stylesheet_path = None, preview_size = None):
+    # Returns the guide document and, with a preview size, its PNG preview
+    guide_style, hbr_name, body_ratios = hbr_job
+
+    svg_path = hbr_guide_path(output_directory, guide_style, hbr_name)
+
+    writer_options = dict(writer_options or {})
+    if stylesheet_path:
+        writer_options["stylesheet_href"] = stylesheet_href(stylesheet_path, svg_path)
+
+    hbr_outputs = [(svg_path, render_svg_document(create_hbr_guide, body_ratios, guide_style, writer_options = writer_options))]
+
+    if preview_size:
+        from svg_raster import render_png_document
+        hbr_outputs.append((svg_path.removesuffix(".svg") + ".png", render_png_document(create_hbr_guide, body_ratios, guide_style, size = preview_size)))
+
+    return hbr_outputs
+
+def write_hbr_guides(hbr_jobs, jobs, output_directory = "", force = False, writer_options = None, stylesheet_path = None, output_target = "tree", preview_size = None, extra_outputs = ()):
+    source_digest = generator_source_digest(__file__)
+
+    def output_paths_for(hbr_job):
+        guide_style, hbr_name, body_ratios = hbr_job
+        svg_path = hbr_guide_path(output_directory, guide_style, hbr_name)
+        return [svg_path, svg_path.removesuffix(".svg") + ".png"] if preview_size else [svg_path]
+
+    def inputs_digest_for(hbr_job):
+        guide_style, hbr_name, body_ratios = hbr_job
+        return generator_inputs_digest(source_digest, guide_style, body_ratios, writer_options, stylesheet_path, preview_size)
+
+    write_batch(
+        hbr_jobs, jobs, output_paths_for, inputs_digest_for,
+        partial(
+            render_hbr_guide,
+            output_directory = output_directory,
+            writer_options = writer_options,
+            stylesheet_path = stylesheet_path,
+            preview_size = preview_size,
+        ),
+        force = force,
+        output_target = output_target,
+        extra_outputs = ([(stylesheet_path, svg_stylesheet())] if stylesheet_path else []) + list(extra_outputs),
+    )
 
 ################################################################################
 # Main
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--command", type = str,                                                           )
-parser.add_argument("--target",  type = str,   default = "stdout"                                      )
-parser.add_argument("--style",   type = str,   default = "figure"                                      )
-parser.add_argument("--params",  type = float, default = list(head_body_ratios.values())[0], nargs = 10)
-
-args = parser.parse_args()
-
-match args.command:
-    case "create-svg":
-        svg_document = create_hbr_guide(args.params, args.style)
-        match args.target:
-            case "stdout":
-                print(svg_document)
-            case "clipboard":
-                copy_to_clipboard(svg_document, "image/svg+xml")
-
-    case "query-guide-styles":
-        for guide_style in guide_styles:
-            print(guide_style)
-
-    case None:
-        for guide_style in guide_styles:
-            for (hbr_name, body_ratios) in head_body_ratios.items():
-                svg_path = "character/hbr/{}/hbr-{}.svg".format(guide_style, hbr_name)
-                svg_document = create_hbr_guide(body_ratios, guide_style)
-
-                os.makedirs(os.path.dirname(svg_path), exist_ok = True)
-                with open(svg_path, "w") as svg_file:
-                    svg_file.write(svg_document)
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",       type = str,                                                        )
+    parser.add_argument("--target",        type = str,   default = "stdout"                                   )
+    parser.add_argument("--style",         type = str,   default = "figure"                                   )
+    parser.add_argument("--styles",        type = str,   default = ",".join(guide_styles)                     )
+    parser.add_argument("--params",        type = float, default = list(head_body_ratios.values())[0], nargs = 10)
+    parser.add_argument("--sweep",         type = str,                                                        )
+    parser.add_argument("--steps",         type = int,   default = "16"                                       )
+    parser.add_argument("--grid",          type = str,                                                        )
+    parser.add_argument("--base",          type = str,   default = "female-1:4.0-01"                          )
+    parser.add_argument("--sweep-name",    type = str,   default = "sweep"                                    )
+    parser.add_argument("--output",        type = str,   default = "procedural"                               )
+    parser.add_argument("--jobs",          type = int,   default = "1"                                        )
+    parser.add_argument("--force",         action = "store_true"                                              )
+    parser.add_argument("--compact",       action = "store_true"                                              )
+    parser.add_argument("--precision",     type = int,   default = "3"                                        )
+    parser.add_argument("--stylesheet",    type = str,                                                        )
+    parser.add_argument("--output-target", type = str,   default = "tree"                                     )
+    parser.add_argument("--previews",      action = "store_true"                                              )
+    parser.add_argument("--preview-size",  type = int,   default = "256"                                      )
+
+    args = parser.parse_args(argv)
+
+    writer_options = {
+        "precision": args.precision,
+        "compact":   args.compact,
+    }
+
+    match args.command:
+        case "create-svg":
+            writer_options["stylesheet_href"] = args.stylesheet
+            match args.target:
+                case "stdout":
+                    create_hbr_guide(SvgWriter(sys.stdout, **writer_options), args.params, args.style)
+                    print()
+                case "clipboard":
+                    svg_document = render_svg_document(create_hbr_guide, args.params, args.style, writer_options = writer_options)
+                    copy_to_clipboard(svg_document, "image/svg+xml")
+
+        case "create-png":
+            from svg_raster import render_png_document
+            png_document = render_png_document(create_hbr_guide, args.params, args.style, size = args.preview_size)
+            match args.target:
+                case "stdout":
+                    sys.stdout.buffer.write(png_document)
+                case "clipboard":
+                    copy_to_clipboard(png_document, "image/png")
+
+        case "create-sweep":
+            # --sweep interpolates through the listed presets (or vectors,
+            # separated by semicolons), --grid steps ratios of the --base
+            if not args.sweep and not args.grid:
+                raise ValueError("Sweeps need either --sweep or --grid")
+
+            if args.grid:
+                sweep_body_ratios = list(grid_body_ratios(parse_body_ratios(args.base), parse_grid_dimensions(args.grid)))
+            else:
+                body_ratio_stops = [parse_body_ratios(body_ratios_spec) for body_ratios_spec in args.sweep.split(";" if ";" in args.sweep else ",")]
+                if len(body_ratio_stops) < 2:
+                    raise ValueError("Sweeps need at least two body ratio stops")
+                sweep_body_ratios = list(interpolate_body_ratios(body_ratio_stops, args.steps))
+
+            write_hbr_guides(
+                sweep_jobs(args.sweep_name, sweep_body_ratios, args.styles.split(",")),
+                args.jobs,
+                output_directory = "{}/".format(args.output),
+                force = args.force,
+                writer_options = writer_options,
+                stylesheet_path = args.stylesheet,
+                output_target = args.output_target,
+                preview_size = args.preview_size if args.previews else None,
+                extra_outputs = [(
+                    "{}/character/hbr/hbr-{}.csv".format(args.output, args.sweep_name),
+                    sweep_index_document(args.sweep_name, sweep_body_ratios),
+                )],
+            )
+
+        case "query-guide-styles":
+            for guide_style in guide_styles:
+                print(guide_style)
+
+        case "query-body-ratios":
+            for body_ratio_name in body_ratio_names:
+                print(body_ratio_name)
+
+        case None:
+            write_hbr_guides(
+                preset_jobs(),
+                args.jobs,
+                force = args.force,
+                writer_options = writer_options,
+                stylesheet_path = args.stylesheet,
+                output_target = args.output_target,
+                preview_size = args.preview_size if args.previews else None,
+            )
+
+if __name__ == "__main__":
+    profile_main(main)
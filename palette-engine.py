@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import re
+
+from svg_utils import format_float, copy_to_clipboard
+from svg_utils import load_generator_manifest, save_generator_manifest
+from svg_utils import generator_source_digest, generator_inputs_digest, open_output_target
+from svg_utils import profile_main
+
+################################################################################
+# Palettes
+#
+# A palette family is a grid of colors, one column per hue and one row per
+# variant (paper, paint, trace, ...). Every row has its own lightness,
+# chroma (saturation for HSL) and hue shift, and optionally ends with a gray
+# swatch of a hand-picked sRGB level. Lightness is in percent for both color
+# spaces, like in the CSS color functions.
+#
+# The keyframe colors were picked from browser rendered swatches, which clip
+# out of gamut colors, their families keep the clipping gamut mapping so that
+# they regenerate the published palettes.
+
+keyframe_hue_names = ["Red", "Orange", "Yellow", "Green", "Cyan", "Blue", "Purple"]
+
+palette_families = {
+    "keyframe-colors-hsl": {
+        "title":         "Keyframe Colors (HSL)",
+        "color_space":   "hsl",
+        "gamut_mapping": "clip",
+        "hues":          list(zip(keyframe_hue_names, [0, 30, 60, 120, 180, 240, 300])),
+        "rows": [
+            # (name, lightness, saturation, hue shift, gray)
+            ("Paper", 90, 55,  -5, 224),
+            ("Paint", 75, 70, -10, 175),
+            ("Trace", 40, 80, -15,  74),
+        ],
+    },
+    "keyframe-colors-oklch": {
+        "title":         "Keyframe Colors (OKLCH)",
+        "color_space":   "oklch",
+        "gamut_mapping": "clip",
+        "hues":          list(zip(keyframe_hue_names, [20, 60, 100, 140, 195, 265, 330])),
+        "rows": [
+            # (name, lightness, chroma, hue shift, gray)
+            ("Paper", 90.40, 0.032,  0, 224),
+            ("Paint", 75.81, 0.108, -3, 175),
+            ("Trace", 50.39, 0.192, -6,  74),
+        ],
+    },
+}
+
+# Palette documents group the families written into the same CSS, JSON and
+# HTML files. The HTML page shows the first family unless another one is
+# selected with the URL fragment (keyframe-colors.html#keyframe-colors-hsl).
+palette_documents = {
+    "keyframe-colors": ["keyframe-colors-oklch", "keyframe-colors-hsl"],
+}
+
+# Pure RGB primaries closing every GIMP palette, for masks and mattes
+gpl_reference_colors = [
+    ("RGB", "Red",     (255,   0,   0)),
+    ("RGB", "White",   (255, 255, 255)),
+    ("RGB", "Yellow",  (255, 255,   0)),
+    ("RGB", "Green",   (  0, 255,   0)),
+    ("RGB", "Cyan",    (  0, 255, 255)),
+    ("RGB", "Blue",    (  0,   0, 255)),
+    ("RGB", "Magenta", (255,   0, 255)),
+    ("RGB", "Black",   (  0,   0,   0)),
+]
+
+default_sweep_rows = "Paper:90.4:0.032,Paint:75.81:0.108:-3,Trace:50.39:0.192:-6"
+
+def parse_palette_rows(rows_spec):
+    # "Paper:90.4:0.032,Paint:75.81:0.108:-3,..." -> name:lightness:chroma[:hue shift[:gray]]
+    palette_rows = []
+    for row_spec in rows_spec.split(","):
+        row_name, lightness, chroma, *row_options = row_spec.split(":")
+        hue_shift = float(row_options[0]) if len(row_options) > 0 else 0.0
+        gray = int(row_options[1]) if len(row_options) > 1 else None
+        palette_rows.append((row_name, float(lightness), float(chroma), hue_shift, gray))
+    return palette_rows
+
+def create_sweep_family(color_space, hue_steps, palette_rows, gamut_mapping = "chroma", hue_start = 0.0, hue_end = 360.0):
+    hue_step = (hue_end - hue_start) / hue_steps
+    return {
+        "title":         "Palette Sweep ({}, {} hues)".format(color_space.upper(), hue_steps),
+        "color_space":   color_space,
+        "gamut_mapping": gamut_mapping,
+        "hues":          [("H{}".format(format_float(hue_start + hue_index * hue_step, 2)), hue_start + hue_index * hue_step) for hue_index in range(0, hue_steps)],
+        "rows":          palette_rows,
+    }
+
+################################################################################
+# Color conversion (NumPy)
+#
+# Every conversion takes arrays of any (matching or broadcastable) shape and
+# returns sRGB values in the last axis, so a whole palette family converts in
+# a single call. NumPy is only imported when these are first used.
+
+# OKLab -> LMS and LMS -> linear sRGB, from Björn Ottosson's reference code
+oklab_to_lms_matrix = [
+    [1.0,  0.3963377774,  0.2158037573],
+    [1.0, -0.1055613458, -0.0638541728],
+    [1.0, -0.0894841775, -1.2914855480],
+]
+
+lms_to_linear_srgb_matrix = [
+    [ 4.0767416621, -3.3077115913,  0.2309699292],
+    [-1.2684380046,  2.6097574011, -0.3413193965],
+    [-0.0041960863, -0.7034186147,  1.7076147010],
+]
+
+# Out of gamut tolerance and the bisection steps of the chroma reduction,
+# 24 steps narrow the chroma down well below one 8-bit sRGB step
+gamut_epsilon = 1e-6
+gamut_mapping_steps = 24
+
+def oklch_to_linear_srgb(lightness, chroma, hue):
+    import numpy as np
+
+    hue = np.radians(hue)
+    oklab = np.stack(np.broadcast_arrays(lightness, chroma * np.cos(hue), chroma * np.sin(hue)), axis = -1)
+    lms = (oklab @ np.array(oklab_to_lms_matrix).T) ** 3
+    return lms @ np.array(lms_to_linear_srgb_matrix).T
+
+def linear_srgb_to_srgb(linear_srgb):
+    import numpy as np
+
+    linear_srgb = np.clip(linear_srgb, 0.0, 1.0)
+    return np.where(linear_srgb <= 0.0031308, linear_srgb * 12.92, 1.055 * linear_srgb ** (1.0 / 2.4) - 0.055)
+
+def is_in_gamut(linear_srgb):
+    import numpy as np
+
+    return np.all((linear_srgb >= -gamut_epsilon) & (linear_srgb <= 1.0 + gamut_epsilon), axis = -1)
+
+def gamut_map_clip(lightness, chroma, hue):
+    linear_srgb = oklch_to_linear_srgb(lightness, chroma, hue)
+    return linear_srgb_to_srgb(linear_srgb), is_in_gamut(linear_srgb)
+
+def gamut_map_chroma(lightness, chroma, hue):
+    # Keeps lightness and hue and reduces the chroma of out of gamut colors
+    # until they fit, bisecting every color of the array at once
+    import numpy as np
+
+    lightness, chroma, hue = np.broadcast_arrays(np.clip(lightness, 0.0, 1.0), chroma, hue)
+    in_gamut = is_in_gamut(oklch_to_linear_srgb(lightness, chroma, hue))
+
+    chroma_low = np.zeros(chroma.shape)
+    chroma_high = np.array(chroma, dtype = np.float64)
+    for _ in range(0, gamut_mapping_steps):
+        chroma_middle = (chroma_low + chroma_high) / 2.0
+        middle_in_gamut = is_in_gamut(oklch_to_linear_srgb(lightness, chroma_middle, hue))
+        chroma_low = np.where(middle_in_gamut, chroma_middle, chroma_low)
+        chroma_high = np.where(middle_in_gamut, chroma_high, chroma_middle)
+
+    mapped_chroma = np.where(in_gamut, chroma, chroma_low)
+    return linear_srgb_to_srgb(oklch_to_linear_srgb(lightness, mapped_chroma, hue)), in_gamut
+
+gamut_mappings = {
+    "clip":   gamut_map_clip,
+    "chroma": gamut_map_chroma,
+}
+
+def hsl_to_srgb(hue, saturation, lightness):
+    import numpy as np
+
+    hue, saturation, lightness = np.broadcast_arrays(np.mod(hue, 360.0), saturation, lightness)
+    a = saturation * np.minimum(lightness, 1.0 - lightness)
+    return np.stack([
+        lightness - a * np.clip(np.minimum((n + hue / 30.0) % 12.0 - 3.0, 9.0 - (n + hue / 30.0) % 12.0), -1.0, 1.0)
+        for n in [0.0, 8.0, 4.0]
+    ], axis = -1)
+
+def srgb_to_bytes(srgb):
+    # Rounding to 1e-6 first keeps exact halves (161.5) from rounding down
+    # because of floating point noise
+    import numpy as np
+
+    return np.floor(np.round(np.clip(srgb, 0.0, 1.0) * 255.0, 6) + 0.5).astype(np.uint8)
+
+def convert_palette_family(palette_family):
+    # -> (rows x hues x 3 sRGB bytes, rows x hues in gamut flags)
+    import numpy as np
+
+    hues = np.array([hue for (hue_name, hue) in palette_family["hues"]], dtype = np.float64)
+    lightness, chroma, hue_shift = (
+        np.array([palette_row[field_index] for palette_row in palette_family["rows"]], dtype = np.float64)[:, np.newaxis]
+        for field_index in [1, 2, 3]
+    )
+
+    match palette_family["color_space"]:
+        case "oklch":
+            srgb, in_gamut = gamut_mappings[palette_family["gamut_mapping"]](lightness / 100.0, chroma, hues + hue_shift)
+        case "hsl":
+            srgb = hsl_to_srgb(hues + hue_shift, chroma / 100.0, lightness / 100.0)
+            in_gamut = np.ones(srgb.shape[:-1], dtype = bool)
+        case color_space:
+            raise ValueError("Unknown color space '{}'".format(color_space))
+
+    return srgb_to_bytes(srgb), in_gamut
+
+def palette_family_colors(palette_family):
+    # -> [(row_name, [(hue_name, (r, g, b), in_gamut), ...]), ...]
+    palette_bytes, palette_in_gamut = convert_palette_family(palette_family)
+
+    family_colors = []
+    for (row_index, (row_name, lightness, chroma, hue_shift, gray)) in enumerate(palette_family["rows"]):
+        row_colors = [
+            (hue_name, tuple(int(channel) for channel in palette_bytes[row_index, hue_index]), bool(palette_in_gamut[row_index, hue_index]))
+            for (hue_index, (hue_name, hue)) in enumerate(palette_family["hues"])
+        ]
+        if gray is not None:
+            row_colors.append(("Gray", (gray, gray, gray), True))
+        family_colors.append((row_name, row_colors))
+    return family_colors
+
+def format_hex_color(rgb):
+    return "#{:02X}{:02X}{:02X}".format(*rgb)
+
+def css_identifier(name):
+    # Custom property names only take letters, digits, "-" and "_", fractional
+    # sweep hues (H0.5) become h0-5
+    return re.sub(r"[^a-z0-9_-]+", "-", name.lower())
+
+################################################################################
+# Output formatters
+#
+# Every formatter takes the families of a palette document as
+# [(family_name, palette_family, family_colors), ...]. GIMP palettes hold a
+# single family, the other formats hold all of them.
+
+def output_format_gpl(palette_document):
+    if len(palette_document) != 1:
+        raise ValueError("GIMP palettes hold a single palette family, got {}".format(len(palette_document)))
+
+    [(family_name, palette_family, family_colors)] = palette_document
+    gpl_rows = family_colors + [("RGB", [(color_name, rgb, True) for (row_name, color_name, rgb) in gpl_reference_colors])]
+
+    gpl_document = "GIMP Palette\nName: {}\nColumns: {}\n\n".format(
+        palette_family["title"],
+        max(len(row_colors) for (row_name, row_colors) in gpl_rows),
+    )
+    for (row_name, row_colors) in gpl_rows:
+        for (color_name, rgb, in_gamut) in row_colors:
+            gpl_document += "{:>3} {:>3} {:>3}  {} - {}\n".format(*rgb, row_name, color_name)
+        gpl_document += "\n"
+    return gpl_document, "text/plain"
+
+def output_format_css(palette_document):
+    css_document = ":root {\n"
+    for (family_name, palette_family, family_colors) in palette_document:
+        css_document += "    /* {} */\n".format(palette_family["title"])
+        for (row_name, row_colors) in family_colors:
+            for (color_name, rgb, in_gamut) in row_colors:
+                css_document += "    --{}-{}-{}: {};{}\n".format(
+                    family_name,
+                    css_identifier(row_name),
+                    css_identifier(color_name),
+                    format_hex_color(rgb),
+                    "" if in_gamut else " /* out of gamut */",
+                )
+    css_document += "}\n"
+    return css_document, "text/css"
+
+def output_format_json(palette_document):
+    json_families = {
+        family_name: {
+            "title":         palette_family["title"],
+            "color_space":   palette_family["color_space"],
+            "gamut_mapping": palette_family["gamut_mapping"],
+            "rows": [
+                {
+                    "name":   row_name,
+                    "colors": [
+                        {
+                            "name":     color_name,
+                            "hex":      format_hex_color(rgb),
+                            "rgb":      list(rgb),
+                            "in_gamut": in_gamut,
+                        }
+                        for (color_name, rgb, in_gamut) in row_colors
+                    ],
+                }
+                for (row_name, row_colors) in family_colors
+            ],
+        }
+        for (family_name, palette_family, family_colors) in palette_document
+    }
+    return json.dumps(json_families, indent = 4) + "\n", "application/json"
+
+html_template = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{
+            margin: 0;
+            display: grid;
+            width: 100vw;
+            height: 100vh;
+        }}
+    </style>
+    <script>
+        const palettes = {{{palettes}
+        }};
+
+        window.addEventListener("DOMContentLoaded", () => {{
+            const current_palette = palettes[window.location.hash.slice(1)] || palettes["{default_family}"];
+
+            document.body.style.gridTemplateColumns = `repeat(${{current_palette.columns}}, 1fr)`;
+            document.body.style.gridTemplateRows = `repeat(${{current_palette.rows.length}}, 1fr)`;
+
+            for (const row of current_palette.rows) {{
+                for (const [color_name, color] of row.colors) {{
+                    let color_swatch = document.createElement("div");
+                    color_swatch.style.backgroundColor = color;
+                    color_swatch.title = `${{row.name}} - ${{color_name}} (${{color}})`;
+                    document.body.appendChild(color_swatch);
+                }}
+            }}
+        }})
+    </script>
+</head>
+<body>
+</body>
+</html>
+"""
+
+def output_format_html(palette_document):
+    # One line per palette row, the swatch colors are precomputed so that
+    # the page shows the gamut mapped colors rather than the browser's
+    html_palettes = ""
+    for (family_name, palette_family, family_colors) in palette_document:
+        html_palettes += "\n            {}: {{\n                columns: {},\n                rows: [\n".format(
+            json.dumps(family_name),
+            max(len(row_colors) for (row_name, row_colors) in family_colors),
+        )
+        for (row_name, row_colors) in family_colors:
+            html_palettes += "                    {{ name: {}, colors: {} }},\n".format(
+                json.dumps(row_name),
+                json.dumps([[color_name, format_hex_color(rgb)] for (color_name, rgb, in_gamut) in row_colors]),
+            )
+        html_palettes += "                ],\n            },"
+
+    html_document = html_template.format(
+        palettes = html_palettes,
+        default_family = palette_document[0][0],
+    )
+    return html_document, "text/html"
+
+output_formatters = {
+    "gpl":  output_format_gpl,
+    "css":  output_format_css,
+    "json": output_format_json,
+    "html": output_format_html,
+}
+
+################################################################################
+# Palette batches
+
+def create_palette_document(family_names, families = palette_families):
+    # Every format of a palette document is rendered from the same converted
+    # colors, each family is only converted once per run
+    return [
+        (family_name, families[family_name], palette_family_colors(families[family_name]))
+        for family_name in family_names
+    ]
+
+def palette_document_jobs(document_name, palette_document):
+    # (output_path, output_format, palette_document)
+    for family_entry in palette_document:
+        yield ("{}.gpl".format(family_entry[0]), "gpl", [family_entry])
+    for output_format in ["css", "json", "html"]:
+        yield ("{}.{}".format(document_name, output_format), output_format, palette_document)
+
+def write_palettes(document_names, output_directory, force = False, output_target = "tree"):
+    manifest = load_generator_manifest()
+    source_digest = generator_source_digest(__file__)
+
+    with open_output_target(output_target) as output:
+        for document_name in document_names:
+            family_names = palette_documents[document_name]
+            inputs_digest = generator_inputs_digest(source_digest, document_name, [palette_families[family_name] for family_name in family_names])
+            output_paths = [
+                "{}/{}.{}".format(output_directory, output_name, output_extension)
+                for (output_name, output_extension) in [(family_name, "gpl") for family_name in family_names] + [(document_name, "css"), (document_name, "json"), (document_name, "html")]
+            ]
+            if not force and all(output.is_current(manifest, output_path, inputs_digest) for output_path in output_paths):
+                continue
+
+            for (output_path, output_format, palette_document) in palette_document_jobs(document_name, create_palette_document(family_names)):
+                output_path = "{}/{}".format(output_directory, output_path)
+                output_document, mime_type = output_formatters[output_format](palette_document)
+                output.write(output_path, output_document)
+                output.record(manifest, output_path, inputs_digest)
+
+    save_generator_manifest(manifest)
+
+def write_palette_sweep(sweep_family, sweep_name, output_directory, output_target = "tree"):
+    palette_document = create_palette_document([sweep_name], {sweep_name: sweep_family})
+    with open_output_target(output_target) as output:
+        for (output_path, output_format, palette_document) in palette_document_jobs(sweep_name, palette_document):
+            output_document, mime_type = output_formatters[output_format](palette_document)
+            output.write("{}/{}".format(output_directory, output_path), output_document)
+    return palette_document
+
+def palette_gamut_summary(family_colors):
+    # Runs of neighbouring out of gamut hues are reported as ranges
+    for (row_name, row_colors) in family_colors:
+        out_of_gamut_ranges = []
+        for (color_index, (color_name, rgb, in_gamut)) in enumerate(row_colors):
+            if in_gamut:
+                continue
+            if out_of_gamut_ranges and out_of_gamut_ranges[-1][2] == color_index - 1:
+                out_of_gamut_ranges[-1][1:] = [color_name, color_index]
+            else:
+                out_of_gamut_ranges.append([color_name, color_name, color_index])
+
+        yield "{:<12} {:>5}/{:<5} in gamut{}".format(
+            row_name,
+            sum(1 for (color_name, rgb, in_gamut) in row_colors if in_gamut),
+            len(row_colors),
+            "" if not out_of_gamut_ranges else ", out of gamut: {}".format(", ".join(
+                first_name if first_name == last_name else "{}-{}".format(first_name, last_name)
+                for (first_name, last_name, last_index) in out_of_gamut_ranges
+            )),
+        )
+
+################################################################################
+# Main
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command",       type = str,                                            )
+    parser.add_argument("--target",        type = str,   default = "stdout"                       )
+    parser.add_argument("--palette",       type = str,   default = "keyframe-colors-oklch"        )
+    parser.add_argument("--palettes",      type = str,   default = ",".join(palette_documents)    )
+    parser.add_argument("--output-format", type = str,   default = "gpl"                          )
+    parser.add_argument("--color-space",   type = str,   default = "oklch"                        )
+    parser.add_argument("--gamut-mapping", type = str,   default = "chroma"                       )
+    parser.add_argument("--hue-steps",     type = int,   default = "360"                          )
+    parser.add_argument("--hue-start",     type = float, default = "0"                            )
+    parser.add_argument("--hue-end",       type = float, default = "360"                          )
+    parser.add_argument("--rows",          type = str,   default = default_sweep_rows             )
+    parser.add_argument("--sweep-name",    type = str,   default = "palette-sweep"                )
+    parser.add_argument("--output",        type = str,   default = "procedural/colors"            )
+    parser.add_argument("--output-target", type = str,   default = "tree"                         )
+    parser.add_argument("--force",         action = "store_true"                                  )
+
+    args = parser.parse_args(argv)
+
+    match args.command:
+        case "create-palette":
+            # A palette family name selects that family alone, GIMP palettes
+            # only hold one
+            if args.palette in palette_families:
+                family_names = [args.palette]
+            else:
+                family_names = palette_documents[args.palette]
+            palette_output, mime_type = output_formatters[args.output_format](create_palette_document(family_names))
+
+            match args.target:
+                case "stdout":
+                    print(palette_output, end = "")
+                case "clipboard":
+                    copy_to_clipboard(palette_output, mime_type)
+
+        case "create-sweep":
+            sweep_family = create_sweep_family(
+                args.color_space,
+                args.hue_steps,
+                parse_palette_rows(args.rows),
+                args.gamut_mapping,
+                args.hue_start,
+                args.hue_end,
+            )
+            [(sweep_name, sweep_family, sweep_colors)] = write_palette_sweep(sweep_family, args.sweep_name, args.output, args.output_target)
+            for summary_line in palette_gamut_summary(sweep_colors):
+                print(summary_line)
+
+        case "query-palettes":
+            for (document_name, family_names) in palette_documents.items():
+                print("{}: {}".format(document_name, ", ".join(family_names)))
+
+        case "query-output-formats":
+            for (output_format, output_formatter) in output_formatters.items():
+                print(output_format)
+
+        case "query-gamut-mappings":
+            for (gamut_mapping, gamut_mapper) in gamut_mappings.items():
+                print(gamut_mapping)
+
+        case None:
+            write_palettes(args.palettes.split(","), args.output, args.force, args.output_target)
+
+if __name__ == "__main__":
+    profile_main(main)
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+
+import re
+import struct
+import zlib
+from contextlib import contextmanager
+from math import ceil, sqrt, atan2, radians, sin, cos, pi
+
+import numpy as np
+
+from svg_utils import svg_style, format_float, generator_profile
+
+################################################################################
+# Raster writer
+#
+# Draws into a grayscale NumPy image instead of writing SVG markup. It takes
+# the place of an SvgWriter, so every SVG constructor renders PNG previews
+# without changes. Only the subset the generators emit is supported: lines,
+# polylines, polygons, rects, circles, ellipses and paths made of M/L/H/V/A/Z
+# commands, with fill, stroke, stroke-width and stroke-dasharray taken from
+# the document's style classes, translate/rotate/scale transforms on groups
+# and elements, and fills with userSpaceOnUse patterns. Text is skipped.
+#
+# Strokes are anti-aliased from the distance of every pixel center to the
+# stroke, fills are supersampled. Strokes thinner than a pixel are drawn one
+# pixel wide at a proportionally lighter shade, and dash patterns shorter than
+# a couple of pixels are drawn solid at their average density. Patterns are
+# rendered into a tile image once and sampled for every pixel of the shapes
+# they fill, tiles smaller than a couple of pixels are likewise filled at
+# their average density.
+
+fill_supersampling = 4
+pattern_tile_min_size = 32
+pattern_tile_min_pixels = 2
+stroke_piece_length = 4
+stroke_piece_chunk = 4096
+
+def parse_style_classes(style):
+    style_classes = {}
+    for (class_name, class_body) in re.findall(r"\.([\w-]+)\s*{([^}]*)}", style):
+        properties = dict(
+            (property_name.strip(), property_value.strip())
+            for (property_name, property_value) in re.findall(r"([\w-]+)\s*:\s*([^;]+);", class_body)
+        )
+        style_classes[class_name] = {
+            "fill":         parse_style_color(properties.get("fill", "#000000")),
+            "stroke":       parse_style_color(properties.get("stroke", "none")),
+            "stroke_width": float(properties.get("stroke-width", "1").removesuffix("px")),
+            "dash_array":   [
+                float(dash_length)
+                for dash_length in re.split(r"[\s,]+", properties.get("stroke-dasharray", "none"))
+                if dash_length not in ("", "none")
+            ],
+        }
+    return style_classes
+
+def parse_style_color(color):
+    # Colors are reduced to their luminance, previews are grayscale
+    if not color.startswith("#"):
+        return None
+    r, g, b = (int(color[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+def parse_transform(transform):
+    # -> 3x3 affine matrix of a transform list, applied right to left
+    matrix = np.identity(3)
+    for (function_name, function_args) in re.findall(r"(\w+)\s*\(([^)]*)\)", transform):
+        values = parse_points(function_args)
+        match function_name, len(values):
+            case "translate", 1 | 2:
+                function_matrix = np.array([[1.0, 0.0, values[0]], [0.0, 1.0, values[1] if len(values) > 1 else 0.0], [0.0, 0.0, 1.0]])
+            case "scale", 1 | 2:
+                function_matrix = np.diag([values[0], values[-1], 1.0])
+            case "rotate", 1 | 3:
+                angle = radians(values[0])
+                cx, cy = values[1:] if len(values) > 1 else (0.0, 0.0)
+                function_matrix = np.array([
+                    [cos(angle), -sin(angle), cx - cos(angle) * cx + sin(angle) * cy],
+                    [sin(angle),  cos(angle), cy - sin(angle) * cx - cos(angle) * cy],
+                    [0.0,         0.0,        1.0                                    ],
+                ])
+            case _:
+                raise ValueError("Unsupported transform: {}".format(transform))
+        matrix = matrix @ function_matrix
+    return matrix
+
+def parse_points(points):
+    return [float(value) for value in re.split(r"[\s,]+", points.strip())]
+
+def parse_path_data(path_data):
+    # Splits path data into subpaths of absolute points, arcs are flattened
+    tokens = re.findall(r"[MLHVAZmlhvaz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?", path_data)
+
+    subpaths = []
+    x, y = 0.0, 0.0
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                if subpaths and subpaths[-1]:
+                    subpaths[-1].append(subpaths[-1][0])
+                    x, y = subpaths[-1][0]
+                continue
+
+        match command:
+            case "M":
+                x, y = float(tokens[i]), float(tokens[i + 1])
+                subpaths.append([(x, y)])
+                command = "L"
+                i += 2
+            case "L":
+                x, y = float(tokens[i]), float(tokens[i + 1])
+                subpaths[-1].append((x, y))
+                i += 2
+            case "H":
+                x = float(tokens[i])
+                subpaths[-1].append((x, y))
+                i += 1
+            case "V":
+                y = float(tokens[i])
+                subpaths[-1].append((x, y))
+                i += 1
+            case "A":
+                rx, ry, phi, large_arc, sweep, x2, y2 = (float(token) for token in tokens[i:i + 7])
+                subpaths[-1].extend(arc_points(x, y, rx, ry, phi, int(large_arc), int(sweep), x2, y2))
+                x, y = x2, y2
+                i += 7
+            case _:
+                raise ValueError("Unsupported path command: {}".format(command))
+
+    return subpaths
+
+def arc_points(x1, y1, rx, ry, phi, large_arc, sweep, x2, y2, arc_steps = 32):
+    # Endpoint to center parameterization, SVG 1.1 implementation notes F.6.5
+    if rx == 0 or ry == 0 or (x1, y1) == (x2, y2):
+        return [(x2, y2)]
+
+    phi = radians(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos(phi) * dx + sin(phi) * dy
+    y1p = -sin(phi) * dx + cos(phi) * dy
+
+    rx, ry = abs(rx), abs(ry)
+    radii_scale = x1p ** 2 / rx ** 2 + y1p ** 2 / ry ** 2
+    if radii_scale > 1:
+        rx, ry = rx * sqrt(radii_scale), ry * sqrt(radii_scale)
+
+    numerator = rx ** 2 * ry ** 2 - rx ** 2 * y1p ** 2 - ry ** 2 * x1p ** 2
+    center_scale = sqrt(max(0.0, numerator / (rx ** 2 * y1p ** 2 + ry ** 2 * x1p ** 2)))
+    if large_arc == sweep:
+        center_scale = -center_scale
+    cxp = center_scale * rx * y1p / ry
+    cyp = -center_scale * ry * x1p / rx
+
+    cx = cos(phi) * cxp - sin(phi) * cyp + (x1 + x2) / 2
+    cy = sin(phi) * cxp + cos(phi) * cyp + (y1 + y2) / 2
+
+    theta_1 = atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    theta_d = atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx) - theta_1
+    if sweep and theta_d < 0:
+        theta_d += 2 * pi
+    elif not sweep and theta_d > 0:
+        theta_d -= 2 * pi
+
+    theta = theta_1 + theta_d * np.arange(1, arc_steps + 1) / arc_steps
+    return list(zip(
+        (cx + rx * np.cos(theta) * cos(phi) - ry * np.sin(theta) * sin(phi)).tolist(),
+        (cy + rx * np.cos(theta) * sin(phi) + ry * np.sin(theta) * cos(phi)).tolist(),
+    ))
+
+class RasterWriter:
+    def __init__(self, size = 256, precision = 3):
+        self.size = size
+        self.precision = precision
+        self.image = None
+        self.transforms = [np.identity(3)]
+        self.patterns = {}
+
+    def options(self):
+        return {
+            "size":      self.size,
+            "precision": self.precision,
+        }
+
+    def format_value(self, value):
+        if isinstance(value, str):
+            return value
+        return format_float(value, self.precision)
+
+    @contextmanager
+    def document(self, width, height, view_box_x = 0, view_box_y = 0, style = svg_style, units = ""):
+        width, height = float(width), float(height)
+        self.scale = self.size / max(width, height)
+        self.view_box_x, self.view_box_y = float(view_box_x), float(view_box_y)
+        self.style_classes = parse_style_classes(style)
+        self.image = np.ones((max(1, ceil(height * self.scale)), max(1, ceil(width * self.scale))))
+        yield self
+
+    @contextmanager
+    def group(self, group_id, transform = None, **attributes):
+        self.transforms.append(self.transforms[-1] @ parse_transform(transform) if transform else self.transforms[-1])
+        yield self
+        self.transforms.pop()
+
+    @contextmanager
+    def pattern(self, pattern_id, width, height, transform = None):
+        # The tile is drawn into an image of its own, at least
+        # pattern_tile_min_size pixels across, while the document's image,
+        # scale and transforms are set aside
+        width, height = float(width), float(height)
+        tile_scale = max(self.scale * fill_supersampling, pattern_tile_min_size / min(width, height))
+
+        document_state = (self.image, self.scale, self.view_box_x, self.view_box_y, self.transforms)
+        self.image = np.ones((max(1, round(height * tile_scale)), max(1, round(width * tile_scale))))
+        self.scale, self.view_box_x, self.view_box_y = tile_scale, 0.0, 0.0
+        self.transforms = [np.identity(3)]
+        yield self
+        self.patterns[pattern_id] = {
+            "tile":      self.image,
+            "width":     width,
+            "height":    height,
+            "transform": parse_transform(transform) if transform else np.identity(3),
+        }
+        self.image, self.scale, self.view_box_x, self.view_box_y, self.transforms = document_state
+
+    @contextmanager
+    def row(self):
+        yield self
+
+    def text(self, text, **attributes):
+        pass
+
+    def reuse(self, shape_id, draw_shape, x = 0, y = 0):
+        with self.group(None, transform = "translate({} {})".format(x, y)):
+            draw_shape(self)
+
+    def element(self, element_name, class_ = None, **attributes):
+        fill_pattern = re.fullmatch(r"url\(#([\w-]+)\)", str(attributes.get("fill", "")))
+        if "transform" in attributes:
+            with self.group(None, transform = attributes["transform"]):
+                self.element(element_name, class_, **{
+                    attribute_name: attribute_value
+                    for (attribute_name, attribute_value) in attributes.items()
+                    if attribute_name != "transform"
+                })
+            return
+
+        attributes = {
+            attribute_name: attribute_value if attribute_name == "d" else parse_points(str(attribute_value))
+            for (attribute_name, attribute_value) in attributes.items()
+            if attribute_name in ("x", "y", "width", "height", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "points", "d")
+        }
+
+        match element_name:
+            case "line":
+                subpaths = [[
+                    (attributes["x1"][0], attributes["y1"][0]),
+                    (attributes["x2"][0], attributes["y2"][0]),
+                ]]
+                closed = False
+            case "polyline" | "polygon":
+                points = attributes["points"]
+                subpaths = [list(zip(points[0::2], points[1::2]))]
+                closed = element_name == "polygon"
+                if closed:
+                    subpaths[0].append(subpaths[0][0])
+            case "rect":
+                x, y = attributes.get("x", [0.0])[0], attributes.get("y", [0.0])[0]
+                width, height = attributes["width"][0], attributes["height"][0]
+                subpaths = [[(x, y), (x + width, y), (x + width, y + height), (x, y + height), (x, y)]]
+                closed = True
+            case "circle" | "ellipse":
+                cx, cy = attributes["cx"][0], attributes["cy"][0]
+                rx = attributes["r"][0] if element_name == "circle" else attributes["rx"][0]
+                ry = attributes["r"][0] if element_name == "circle" else attributes["ry"][0]
+                ellipse_steps = max(16, ceil(2 * pi * max(rx, ry) * self.scale / 2))
+                theta = np.linspace(0, 2 * pi, ellipse_steps + 1)
+                subpaths = [list(zip((cx + rx * np.cos(theta)).tolist(), (cy + ry * np.sin(theta)).tolist()))]
+                closed = True
+            case "path":
+                subpaths = parse_path_data(attributes["d"])
+                closed = False
+            case _:
+                raise ValueError("Unsupported element: {}".format(element_name))
+
+        element_style = self.style_classes.get(class_, {
+            "fill": 0.0, "stroke": None, "stroke_width": 1.0, "dash_array": [],
+        })
+        subpaths = [self.to_pixels(subpath) for subpath in subpaths if len(subpath) > 1]
+
+        if fill_pattern:
+            self.composite(self.fill_coverage(subpaths), self.pattern_fill(self.patterns[fill_pattern.group(1)]))
+        elif element_style["fill"] is not None and (closed or element_name == "path"):
+            self.composite(self.fill_coverage(subpaths), element_style["fill"])
+        if element_style["stroke"] is not None:
+            self.composite(self.stroke_coverage(subpaths, element_style), element_style["stroke"])
+
+    def to_pixels(self, points):
+        matrix = self.transforms[-1]
+        points = np.array(points, dtype = float)
+        points = points @ matrix[:2, :2].T + matrix[:2, 2]
+        points[:, 0] = (points[:, 0] - self.view_box_x) * self.scale
+        points[:, 1] = (points[:, 1] - self.view_box_y) * self.scale
+        return points
+
+    def pattern_fill(self, pattern):
+        # Maps every pixel center back into the pattern's tile, patterns live
+        # in the user space of the shape they fill
+        matrix = self.transforms[-1] @ pattern["transform"]
+        tile_pixels = min(pattern["width"], pattern["height"]) * self.scale * sqrt(abs(np.linalg.det(matrix[:2, :2])))
+        if tile_pixels < pattern_tile_min_pixels:
+            return pattern["tile"].mean()
+
+        image_height, image_width = self.image.shape
+        pixel_y, pixel_x = np.mgrid[0:image_height, 0:image_width] + 0.5
+        user_points = np.stack([pixel_x / self.scale + self.view_box_x, pixel_y / self.scale + self.view_box_y, np.ones(pixel_x.shape)])
+        pattern_points = np.tensordot(np.linalg.inv(matrix), user_points, axes = 1)
+
+        tile = pattern["tile"]
+        tile_height, tile_width = tile.shape
+        tile_x = (np.mod(pattern_points[0], pattern["width"]) / pattern["width"] * tile_width).astype(int)
+        tile_y = (np.mod(pattern_points[1], pattern["height"]) / pattern["height"] * tile_height).astype(int)
+        return tile[np.minimum(tile_y, tile_height - 1), np.minimum(tile_x, tile_width - 1)]
+
+    def pixel_window(self, x_min, y_min, x_max, y_max):
+        image_height, image_width = self.image.shape
+        return (
+            slice(max(0, int(y_min)), min(image_height, ceil(y_max) + 1)),
+            slice(max(0, int(x_min)), min(image_width, ceil(x_max) + 1)),
+        )
+
+    def stroke_coverage(self, subpaths, element_style):
+        stroke_width = element_style["stroke_width"] * self.scale
+        stroke_alpha = min(1.0, stroke_width)
+        half_width = max(1.0, stroke_width) / 2
+
+        dash_array = [dash_length * self.scale for dash_length in element_style["dash_array"]]
+        if len(dash_array) % 2:
+            dash_array = dash_array * 2
+        dash_period = sum(dash_array)
+        if dash_array and dash_period < 2:
+            stroke_alpha *= sum(dash_array[0::2]) / dash_period
+            dash_array = []
+
+        # Segments are cut into short pieces so that every piece fits the same
+        # small pixel window, then all pieces are evaluated at once.
+        piece_starts, piece_ends, piece_offsets = [], [], []
+        for subpath in subpaths:
+            segment_starts, segment_vectors = subpath[:-1], subpath[1:] - subpath[:-1]
+            segment_lengths = np.hypot(segment_vectors[:, 0], segment_vectors[:, 1])
+            segment_offsets = np.cumsum(segment_lengths) - segment_lengths
+
+            piece_counts = np.maximum(1, np.ceil(segment_lengths / stroke_piece_length)).astype(int)
+            segment_index = np.repeat(np.arange(len(segment_lengths)), piece_counts)
+            piece_index = np.arange(piece_counts.sum()) - np.repeat(np.cumsum(piece_counts) - piece_counts, piece_counts)
+            t0 = (piece_index / piece_counts[segment_index])[:, None]
+            t1 = ((piece_index + 1) / piece_counts[segment_index])[:, None]
+
+            piece_starts.append(segment_starts[segment_index] + segment_vectors[segment_index] * t0)
+            piece_ends.append(segment_starts[segment_index] + segment_vectors[segment_index] * t1)
+            piece_offsets.append(segment_offsets[segment_index] + segment_lengths[segment_index] * t0[:, 0])
+
+        coverage = np.zeros(self.image.shape)
+        if not piece_starts:
+            return coverage
+
+        piece_starts = np.concatenate(piece_starts)
+        piece_ends = np.concatenate(piece_ends)
+        piece_offsets = np.concatenate(piece_offsets)
+
+        image_height, image_width = self.image.shape
+        window_size = ceil(stroke_piece_length + 2 * half_width + 3)
+        window_steps = np.arange(window_size)
+
+        for chunk in range(0, len(piece_starts), stroke_piece_chunk):
+            a = piece_starts[chunk:chunk + stroke_piece_chunk]
+            b = piece_ends[chunk:chunk + stroke_piece_chunk]
+            window_origin = np.floor(np.minimum(a, b) - half_width - 1).astype(int)
+
+            ix = window_origin[:, 0, None, None] + window_steps[None, None, :]
+            iy = window_origin[:, 1, None, None] + window_steps[None, :, None]
+            px, py = ix + 0.5, iy + 0.5
+
+            ax, ay = a[:, 0, None, None], a[:, 1, None, None]
+            dx, dy = (b - a)[:, 0, None, None], (b - a)[:, 1, None, None]
+            piece_length_squared = dx * dx + dy * dy
+            t = np.clip(
+                ((px - ax) * dx + (py - ay) * dy) / np.where(piece_length_squared > 0, piece_length_squared, 1),
+                0, 1,
+            )
+            piece_coverage = np.clip(half_width + 0.5 - np.hypot(px - (ax + t * dx), py - (ay + t * dy)), 0, 1)
+
+            if dash_array:
+                dash_position = np.mod(
+                    piece_offsets[chunk:chunk + stroke_piece_chunk, None, None] + t * np.sqrt(piece_length_squared),
+                    dash_period,
+                )
+                dash_on = np.zeros(dash_position.shape, dtype = bool)
+                dash_start = 0.0
+                for (dash_index, dash_length) in enumerate(dash_array):
+                    if dash_index % 2 == 0:
+                        dash_on |= (dash_position >= dash_start) & (dash_position < dash_start + dash_length)
+                    dash_start += dash_length
+                piece_coverage *= dash_on
+
+            ix, iy = np.broadcast_arrays(ix, iy)
+            covered = (piece_coverage > 0) & (ix >= 0) & (ix < image_width) & (iy >= 0) & (iy < image_height)
+            np.maximum.at(coverage, (iy[covered], ix[covered]), piece_coverage[covered])
+
+        return coverage * stroke_alpha
+
+    def fill_coverage(self, subpaths):
+        # Even-odd crossing test on a supersampled grid, averaged back down
+        coverage = np.zeros(self.image.shape)
+        if not subpaths:
+            return coverage
+
+        all_points = np.concatenate(subpaths)
+        window = self.pixel_window(*all_points.min(axis = 0), *all_points.max(axis = 0))
+        window_height = window[0].stop - window[0].start
+        window_width = window[1].stop - window[1].start
+        if window_height <= 0 or window_width <= 0:
+            return coverage
+
+        sample_offsets = (np.arange(fill_supersampling) + 0.5) / fill_supersampling
+        sample_y = (window[0].start + np.arange(window_height)[:, None] + sample_offsets[None, :]).reshape(-1, 1)
+        sample_x = (window[1].start + np.arange(window_width)[:, None] + sample_offsets[None, :]).reshape(1, -1)
+
+        inside = np.zeros((sample_y.shape[0], sample_x.shape[1]), dtype = bool)
+        for subpath in subpaths:
+            closed_subpath = np.vstack([subpath, subpath[:1]])
+            for ((ax, ay), (bx, by)) in zip(closed_subpath[:-1], closed_subpath[1:]):
+                if ay == by:
+                    continue
+                crosses = (ay > sample_y) != (by > sample_y)
+                crossing_x = ax + (sample_y - ay) * (bx - ax) / (by - ay)
+                inside ^= crosses & (sample_x < crossing_x)
+
+        coverage[window] = inside.reshape(
+            window_height, fill_supersampling, window_width, fill_supersampling,
+        ).mean(axis = (1, 3))
+        return coverage
+
+    def composite(self, coverage, gray):
+        self.image += (gray - self.image) * coverage
+
+################################################################################
+# PNG encoding
+
+def encode_png(image):
+    # 8-bit grayscale, every scanline stored unfiltered
+    pixels = np.round(np.clip(image, 0, 1) * 255).astype(np.uint8)
+    image_height, image_width = pixels.shape
+    scanlines = np.hstack([np.zeros((image_height, 1), dtype = np.uint8), pixels]).tobytes()
+
+    def png_chunk(chunk_type, chunk_data):
+        return (
+            struct.pack(">I", len(chunk_data))
+            + chunk_type
+            + chunk_data
+            + struct.pack(">I", zlib.crc32(chunk_type + chunk_data))
+        )
+
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        png_chunk(b"IHDR", struct.pack(">IIBBBBB", image_width, image_height, 8, 0, 0, 0, 0)),
+        png_chunk(b"IDAT", zlib.compress(scanlines, 6)),
+        png_chunk(b"IEND", b""),
+    ])
+
+def render_png_document(svg_constructor, *args, size = 256, **kwargs):
+    raster_writer = RasterWriter(size)
+    with generator_profile.stage("rasterize"):
+        svg_constructor(raster_writer, *args, **kwargs)
+    with generator_profile.stage("encode png"):
+        png_document = encode_png(raster_writer.image)
+    generator_profile.count("previews rendered")
+    return png_document
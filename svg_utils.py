@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+import os
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
 svg_style = """
     <style>
     .primary {
@@ -21,10 +26,715 @@ svg_style = """
 def format_float(number, precision = 3):
     return "{0:.{1}f}".format(number, precision).rstrip("0").rstrip(".")
 
+def parse_aspect_ratio(aspect_ratio):
+    # "16:9", "2.39:1" or a plain number
+    ratio_width, _, ratio_height = aspect_ratio.partition(":")
+    return float(ratio_width) / float(ratio_height or 1)
+
+################################################################################
+# Streaming SVG writer
+#
+# Writes elements straight to a file object (a file on disk, sys.stdout or an
+# io.StringIO) as they are produced. Elements written inside row() share a
+# single line, everything else gets a line of its own.
+#
+# In compact mode, plain same-class line, polyline and path strokes are merged
+# into a single <path> per class and group, and shapes drawn through reuse()
+# are emitted once in <defs> and instanced with <use>. With a stylesheet_href
+# documents link an external stylesheet instead of embedding their style.
+
+class SvgWriter:
+    def __init__(self, svg_file, precision = 3, indent = "    ", compact = False, stylesheet_href = None):
+        self.svg_file = svg_file
+        self.precision = precision
+        self.indent = indent
+        self.compact = compact
+        self.stylesheet_href = stylesheet_href
+        self.depth = 0
+        self.inline = False
+        self.row_started = False
+        self.merged_strokes = [{}]
+        self.reused_shapes = set()
+
+    def options(self):
+        return {
+            "precision":       self.precision,
+            "compact":         self.compact,
+            "stylesheet_href": self.stylesheet_href,
+        }
+
+    def format_value(self, value):
+        if isinstance(value, str):
+            return value
+        return format_float(value, self.precision)
+
+    def write_attributes(self, attributes):
+        # Trailing underscores allow reserved words (class_), other
+        # underscores stand for dashes (stroke_width).
+        for (attribute_name, attribute_value) in attributes.items():
+            self.svg_file.write(' {}="{}"'.format(
+                attribute_name.rstrip("_").replace("_", "-"),
+                self.format_value(attribute_value),
+            ))
+
+    @contextmanager
+    def document(self, width, height, view_box_x = 0, view_box_y = 0, style = svg_style, units = ""):
+        if self.stylesheet_href:
+            self.svg_file.write('<?xml-stylesheet type="text/css" href="{}"?>\n'.format(self.stylesheet_href))
+        self.svg_file.write('<svg width="{width}{units}" height="{height}{units}" viewBox="{x} {y} {width} {height}" xmlns="http://www.w3.org/2000/svg">\n'.format(
+            width  = self.format_value(width),
+            height = self.format_value(height),
+            x      = self.format_value(view_box_x),
+            y      = self.format_value(view_box_y),
+            units  = units,
+        ))
+        self.depth += 1
+        if not self.stylesheet_href:
+            self.svg_file.write(self.indent * self.depth + style + "\n")
+        yield self
+        self.flush_merged_strokes()
+        self.depth -= 1
+        self.svg_file.write("</svg>\n")
+
+    @contextmanager
+    def group(self, group_id, **attributes):
+        self.svg_file.write(self.indent * self.depth + "<g")
+        if group_id is not None:
+            self.svg_file.write(' id="{}"'.format(group_id))
+        self.write_attributes(attributes)
+        self.svg_file.write(">\n")
+        self.depth += 1
+        self.merged_strokes.append({})
+        yield self
+        self.flush_merged_strokes()
+        self.merged_strokes.pop()
+        self.depth -= 1
+        self.svg_file.write(self.indent * self.depth + "</g>\n")
+
+    @contextmanager
+    def row(self):
+        # Compact rows only start a line once something is written to them
+        self.inline = True
+        self.row_started = False
+        if not self.compact:
+            self.start_row()
+        yield self
+        if self.row_started:
+            self.svg_file.write("\n")
+        self.inline = False
+
+    def start_row(self):
+        if not self.row_started:
+            self.svg_file.write(self.indent * self.depth)
+            self.row_started = True
+
+    def element(self, element_name, **attributes):
+        if self.compact and self.merge_stroke(element_name, attributes):
+            return
+
+        if self.inline:
+            self.start_row()
+        else:
+            self.svg_file.write(self.indent * self.depth)
+
+        self.svg_file.write("<" + element_name)
+        self.write_attributes(attributes)
+        self.svg_file.write(" />")
+
+        if not self.inline:
+            self.svg_file.write("\n")
+
+    def text(self, text, **attributes):
+        from xml.sax.saxutils import escape
+
+        if self.inline:
+            self.start_row()
+        else:
+            self.svg_file.write(self.indent * self.depth)
+
+        self.svg_file.write("<text")
+        self.write_attributes(attributes)
+        self.svg_file.write(">" + escape(text) + "</text>")
+
+        if not self.inline:
+            self.svg_file.write("\n")
+
+    def reuse(self, shape_id, draw_shape, x = 0, y = 0):
+        # Shapes are drawn at (x, y), translated in expanded mode and placed
+        # by the <use> element in compact mode.
+        if not self.compact:
+            if x or y:
+                with self.group(None, transform = "translate({} {})".format(self.format_value(x), self.format_value(y))):
+                    draw_shape(self)
+            else:
+                draw_shape(self)
+            return
+
+        if shape_id not in self.reused_shapes:
+            self.reused_shapes.add(shape_id)
+            self.svg_file.write(self.indent * self.depth + "<defs>\n")
+            self.depth += 1
+            with self.group(shape_id):
+                draw_shape(self)
+            self.depth -= 1
+            self.svg_file.write(self.indent * self.depth + "</defs>\n")
+
+        if x or y:
+            self.element("use", href = "#" + shape_id, x = x, y = y)
+        else:
+            self.element("use", href = "#" + shape_id)
+
+    @contextmanager
+    def pattern(self, pattern_id, width, height, transform = None):
+        # Tiles drawn inside are repeated by whatever shape is filled with
+        # "url(#pattern_id)", in user space units.
+        self.svg_file.write(self.indent * self.depth + "<defs>\n")
+        self.depth += 1
+        self.svg_file.write(self.indent * self.depth + '<pattern id="{}" patternUnits="userSpaceOnUse" width="{}" height="{}"'.format(
+            pattern_id,
+            self.format_value(width),
+            self.format_value(height),
+        ))
+        if transform:
+            self.svg_file.write(' patternTransform="{}"'.format(transform))
+        self.svg_file.write(">\n")
+        self.depth += 1
+        self.merged_strokes.append({})
+        yield self
+        self.flush_merged_strokes()
+        self.merged_strokes.pop()
+        self.depth -= 1
+        self.svg_file.write(self.indent * self.depth + "</pattern>\n")
+        self.depth -= 1
+        self.svg_file.write(self.indent * self.depth + "</defs>\n")
+
+    def merge_stroke(self, element_name, attributes):
+        match element_name, sorted(attributes.keys()):
+            case "line", ["class_", "x1", "x2", "y1", "y2"]:
+                x1, y1 = self.format_value(attributes["x1"]), self.format_value(attributes["y1"])
+                x2, y2 = self.format_value(attributes["x2"]), self.format_value(attributes["y2"])
+                if y1 == y2:
+                    path_data = "M{} {}H{}".format(x1, y1, x2)
+                elif x1 == x2:
+                    path_data = "M{} {}V{}".format(x1, y1, y2)
+                else:
+                    path_data = "M{} {}L{} {}".format(x1, y1, x2, y2)
+            case "polyline", ["class_", "points"]:
+                path_data = "M" + "L".join(point.replace(",", " ") for point in attributes["points"].split())
+            case "path", ["class_", "d"]:
+                path_data = attributes["d"]
+            case _:
+                return False
+
+        self.merged_strokes[-1].setdefault(attributes["class_"], []).append(path_data)
+        return True
+
+    def flush_merged_strokes(self):
+        merged_strokes = self.merged_strokes[-1]
+        for (style_class, path_data) in merged_strokes.items():
+            self.svg_file.write(self.indent * self.depth)
+            self.svg_file.write('<path class="{}" d="{}" />\n'.format(style_class, "".join(path_data)))
+        merged_strokes.clear()
+
+def svg_stylesheet(style = svg_style):
+    # The CSS rules of an embedded <style> block
+    from textwrap import dedent
+    return dedent(style.strip().removeprefix("<style>").removesuffix("</style>")).strip() + "\n"
+
+def stylesheet_href(stylesheet_path, svg_path):
+    return os.path.relpath(stylesheet_path, os.path.dirname(svg_path) or ".")
+
+def render_svg_document(svg_constructor, *args, writer_options = None, **kwargs):
+    import io
+    svg_buffer = io.StringIO()
+    svg_writer = SvgWriter(svg_buffer, **(writer_options or {}))
+
+    with generator_profile.stage("render"):
+        if generator_profile.enabled:
+            generator_profile.instrument_writer(svg_writer)
+        svg_constructor(svg_writer, *args, **kwargs)
+
+    svg_document = svg_buffer.getvalue()
+    generator_profile.count("documents rendered")
+    generator_profile.count("document characters", len(svg_document))
+    return svg_document
+
+################################################################################
+# Rendered document cache
+#
+# SVG constructors are pure functions of their parameters, wrapping them with
+# cached() serves repeated requests from a bounded least-recently-used cache
+# of rendered documents instead of redoing the geometry and formatting.
+
+def freeze_cache_key(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_cache_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze_cache_key(item)) for (key, item) in value.items()))
+    return value
+
+class SvgDocumentCache:
+    def __init__(self, max_documents = 1024):
+        from collections import OrderedDict
+        self.max_documents = max_documents
+        self.documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, svg_constructor, writer_options, *args, **kwargs):
+        cache_key = (svg_constructor, freeze_cache_key(writer_options), freeze_cache_key(args), freeze_cache_key(kwargs))
+
+        svg_document = self.documents.get(cache_key)
+        if svg_document is not None:
+            self.hits += 1
+            self.documents.move_to_end(cache_key)
+            return svg_document
+
+        self.misses += 1
+
+        import io
+        svg_buffer = io.StringIO()
+        svg_constructor(SvgWriter(svg_buffer, **writer_options), *args, **kwargs)
+        svg_document = svg_buffer.getvalue()
+
+        self.documents[cache_key] = svg_document
+        if len(self.documents) > self.max_documents:
+            self.documents.popitem(last = False)
+
+        return svg_document
+
+    def cached(self, svg_constructor):
+        # The wrapper keeps the constructor's signature, cached documents are
+        # written to the given writer in one piece.
+        def inner(svg_writer, *args, **kwargs):
+            svg_writer.svg_file.write(self.render(svg_constructor, svg_writer.options(), *args, **kwargs))
+        return inner
+
+    def stats(self):
+        return {
+            "documents":     len(self.documents),
+            "max_documents": self.max_documents,
+            "hits":          self.hits,
+            "misses":        self.misses,
+        }
+
+    def clear(self):
+        self.documents.clear()
+        self.hits = 0
+        self.misses = 0
+
+svg_document_cache = SvgDocumentCache()
+
 def copy_to_clipboard(clipboard_data, mime_type):
     import subprocess
     subprocess.run(
         ["wl-copy", "--type", mime_type],
-        encoding = "utf-8",
+        encoding = None if isinstance(clipboard_data, bytes) else "utf-8",
         input = clipboard_data,
     )
+
+################################################################################
+# Engine loading
+#
+# The engine scripts have dashes in their file names, so they are loaded by
+# path instead of through a regular import statement.
+
+engine_directory = os.path.dirname(os.path.abspath(__file__))
+
+def load_engine(engine_file_name):
+    # Engines are registered in sys.modules, so every caller shares a single
+    # instance and their functions can be pickled into worker processes.
+    import importlib.util
+    import sys
+
+    engine_module_name = os.path.splitext(engine_file_name)[0].replace("-", "_")
+    if engine_module_name in sys.modules:
+        return sys.modules[engine_module_name]
+
+    engine_spec = importlib.util.spec_from_file_location(
+        engine_module_name,
+        os.path.join(engine_directory, engine_file_name),
+    )
+    engine_module = importlib.util.module_from_spec(engine_spec)
+    sys.modules[engine_module_name] = engine_module
+    try:
+        engine_spec.loader.exec_module(engine_module)
+    except BaseException:
+        del sys.modules[engine_module_name]
+        raise
+    return engine_module
+
+################################################################################
+# Incremental regeneration
+#
+# The manifest maps every generated file path to a digest of the inputs it was
+# generated from (engine sources, parameters, template data). Engines skip the
+# outputs whose digest is unchanged, and only rewrite files whose bytes differ.
+
+generator_manifest_path = ".generator-manifest.json"
+
+def load_generator_manifest(manifest_path = generator_manifest_path):
+    import json
+    with generator_profile.stage("manifest"):
+        try:
+            with open(manifest_path, "r") as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+def save_generator_manifest(manifest, manifest_path = generator_manifest_path):
+    import json
+    with generator_profile.stage("manifest"):
+        with open(manifest_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent = 4, sort_keys = True)
+            manifest_file.write("\n")
+
+def generator_source_digest(*source_paths):
+    import hashlib
+    hasher = hashlib.sha256()
+    for source_path in [__file__, *source_paths]:
+        with open(source_path, "rb") as source_file:
+            hasher.update(source_file.read())
+    return hasher.hexdigest()
+
+def generator_inputs_digest(*generator_inputs):
+    import hashlib
+    return hashlib.sha256(repr(generator_inputs).encode("utf-8")).hexdigest()
+
+def is_output_current(manifest, output_path, inputs_digest):
+    return manifest.get(output_path) == inputs_digest and os.path.exists(output_path)
+
+def encode_output_data(output_data):
+    # Documents are text, previews and other binary outputs are bytes already
+    if isinstance(output_data, bytes):
+        return output_data
+    return output_data.encode("utf-8")
+
+def write_output_file(output_path, output_data):
+    output_bytes = encode_output_data(output_data)
+
+    with generator_profile.stage("write"):
+        try:
+            with open(output_path, "rb") as output_file:
+                if output_file.read() == output_bytes:
+                    generator_profile.count("files unchanged")
+                    return False
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(output_path), exist_ok = True)
+        with open(output_path, "wb") as output_file:
+            output_file.write(output_bytes)
+
+    generator_profile.count("files written")
+    generator_profile.count("bytes written", len(output_bytes))
+    return True
+
+################################################################################
+# Output targets
+#
+# Batch runs write their outputs through an output target instead of straight
+# to the tree: "tree" writes every output as a file of its own, "svgz" writes
+# gzip-compressed .svgz files next to where the .svg files would go, and a path
+# ending in .zip, .tar, .tar.gz, .tgz or .tar.xz streams the whole run into a
+# single archive. Archives are always written in full, they don't take part
+# in incremental regeneration.
+
+class OutputTree:
+    def output_path(self, output_path):
+        return output_path
+
+    def is_current(self, manifest, output_path, inputs_digest):
+        return is_output_current(manifest, self.output_path(output_path), inputs_digest)
+
+    def record(self, manifest, output_path, inputs_digest):
+        manifest[self.output_path(output_path)] = inputs_digest
+
+    def write(self, output_path, output_data):
+        return write_output_file(self.output_path(output_path), output_data)
+
+    def close(self):
+        pass
+
+class OutputSvgz(OutputTree):
+    def output_path(self, output_path):
+        if output_path.endswith(".svg"):
+            return output_path + "z"
+        return output_path
+
+    def write(self, output_path, output_data):
+        if not output_path.endswith(".svg"):
+            return write_output_file(output_path, output_data)
+
+        import gzip
+        with generator_profile.stage("compress"):
+            # A fixed timestamp keeps unchanged documents byte-identical
+            output_bytes = gzip.compress(encode_output_data(output_data), mtime = 0)
+
+        return write_output_file(self.output_path(output_path), output_bytes)
+
+class OutputArchive(OutputTree):
+    tar_compressions = {
+        ".tar":    "",
+        ".tar.gz": "gz",
+        ".tgz":    "gz",
+        ".tar.xz": "xz",
+    }
+
+    def __init__(self, archive_path):
+        archive_directory = os.path.dirname(archive_path)
+        if archive_directory:
+            os.makedirs(archive_directory, exist_ok = True)
+
+        self.archive_path = archive_path
+        self.zip_file = None
+        self.tar_file = None
+        self.gzip_file = None
+
+        if archive_path.endswith(".zip"):
+            import zipfile
+            self.zip_file = zipfile.ZipFile(archive_path, "w", compression = zipfile.ZIP_DEFLATED)
+        else:
+            import tarfile
+            for (archive_suffix, tar_compression) in self.tar_compressions.items():
+                if archive_path.endswith(archive_suffix):
+                    if tar_compression == "gz":
+                        # Opened through GzipFile to keep the gzip header
+                        # timestamp out of the archive, like the svgz target
+                        import gzip
+                        self.gzip_file = gzip.GzipFile(archive_path, "wb", mtime = 0)
+                        self.tar_file = tarfile.open(fileobj = self.gzip_file, mode = "w")
+                    else:
+                        self.tar_file = tarfile.open(archive_path, "w:" + tar_compression)
+                    break
+            else:
+                raise ValueError("Unknown archive format: {}".format(archive_path))
+
+    def is_current(self, manifest, output_path, inputs_digest):
+        return False
+
+    def record(self, manifest, output_path, inputs_digest):
+        pass
+
+    def write(self, output_path, output_data):
+        output_bytes = encode_output_data(output_data)
+        with generator_profile.stage("write"):
+            # Entries get a fixed timestamp, identical inputs give identical
+            # archives
+            if self.zip_file:
+                import zipfile
+                zip_info = zipfile.ZipInfo(output_path, date_time = (1980, 1, 1, 0, 0, 0))
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                self.zip_file.writestr(zip_info, output_bytes)
+            else:
+                import io
+                import tarfile
+                tar_info = tarfile.TarInfo(output_path)
+                tar_info.size = len(output_bytes)
+                tar_info.mtime = 0
+                self.tar_file.addfile(tar_info, io.BytesIO(output_bytes))
+
+        generator_profile.count("files written")
+        generator_profile.count("bytes written", len(output_bytes))
+        return True
+
+    def close(self):
+        if self.zip_file:
+            self.zip_file.close()
+        else:
+            self.tar_file.close()
+            if self.gzip_file:
+                self.gzip_file.close()
+
+@contextmanager
+def open_output_target(output_target = "tree"):
+    match output_target:
+        case "tree":
+            output = OutputTree()
+        case "svgz":
+            output = OutputSvgz()
+        case _:
+            output = OutputArchive(output_target)
+    try:
+        yield output
+    finally:
+        output.close()
+
+def write_batch(batch_jobs, jobs, output_paths_for, inputs_digest_for, render_job, force = False, output_target = "tree", extra_outputs = ()):
+    # Renders every job whose outputs are not current and writes them through
+    # the output target. output_paths_for(job) lists the paths a job writes,
+    # inputs_digest_for(job) digests its inputs and render_job(job) returns
+    # its (output_path, output_data) pairs. Extra outputs are written as they
+    # are, ahead of the jobs.
+    manifest = load_generator_manifest()
+
+    with open_output_target(output_target) as output:
+        for (output_path, output_data) in extra_outputs:
+            output.write(output_path, output_data)
+
+        pending_jobs = []
+        with generator_profile.stage("manifest"):
+            for batch_job in batch_jobs:
+                inputs_digest = inputs_digest_for(batch_job)
+                if force or not all(output.is_current(manifest, output_path, inputs_digest) for output_path in output_paths_for(batch_job)):
+                    pending_jobs.append((batch_job, inputs_digest))
+
+        # Zero jobs means one worker per core
+        jobs = jobs or os.cpu_count()
+
+        # Workers only render, the documents are written back in this process
+        # so that every output target (including archives) sees a single writer.
+        # render_job is pickled into the workers, so it has to be a module level
+        # function or a partial of one.
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers = jobs)
+            rendered_jobs = executor.map(render_job, [batch_job for (batch_job, _) in pending_jobs], chunksize = 16)
+        else:
+            executor = None
+            rendered_jobs = map(render_job, [batch_job for (batch_job, _) in pending_jobs])
+
+        try:
+            for ((batch_job, inputs_digest), job_outputs) in zip(pending_jobs, rendered_jobs):
+                for (output_path, output_data) in job_outputs:
+                    output.write(output_path, output_data)
+                    output.record(manifest, output_path, inputs_digest)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    save_generator_manifest(manifest)
+
+################################################################################
+# Profiling
+#
+# Every engine takes --profile, which reports the wall time and number of
+# calls of every generation stage, counts of documents, elements and files,
+# bytes written and the peak memory use of the run on stderr.
+# --profile-cprofile and --profile-tracemalloc additionally dump cProfile
+# statistics and a tracemalloc snapshot (which also makes the report include
+# the peak traced allocation size) to the given paths.
+#
+# Stages nest, a stage's time includes the stages run inside of it. Stages
+# that run in worker processes (easing rulers with --jobs) are not seen, the
+# time spent waiting for the workers shows up in the stage around them.
+# Profiling itself adds some overhead to the finest stages (format, element
+# and easing), compare their times with each other rather than with the total.
+
+class GeneratorProfile:
+    def __init__(self):
+        self.enabled = False
+        self.stage_times = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, stage_name):
+        if not self.enabled:
+            yield
+            return
+
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage_name, perf_counter() - start_time)
+
+    def add_stage_time(self, stage_name, elapsed_time):
+        stage_calls, stage_time = self.stage_times.get(stage_name, (0, 0.0))
+        self.stage_times[stage_name] = (stage_calls + 1, stage_time + elapsed_time)
+
+    def count(self, counter_name, amount = 1):
+        if self.enabled:
+            self.counters[counter_name] = self.counters.get(counter_name, 0) + amount
+
+    def timed(self, stage_name, function):
+        # Wraps a function that is called too often for a stage() block
+        def inner(*args, **kwargs):
+            start_time = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_stage_time(stage_name, perf_counter() - start_time)
+        return inner
+
+    def instrument_writer(self, svg_writer):
+        # Instance attributes shadow the methods, calls from inside the
+        # writer go through the wrappers too.
+        svg_writer.format_value = self.timed("format", svg_writer.format_value)
+        svg_writer.element = self.timed("element", svg_writer.element)
+        svg_writer.text = self.timed("element", svg_writer.text)
+
+    def report(self, total_time, traced_peak_memory = None, report_file = sys.stderr):
+        import resource
+
+        lines = ["{:<24} {:>10} {:>12} {:>12} {:>7}".format("stage", "calls", "total", "per call", "share")]
+        for (stage_name, (stage_calls, stage_time)) in sorted(self.stage_times.items(), key = lambda item: -item[1][1]):
+            lines.append("{:<24} {:>10} {:>12} {:>12} {:>6.1f}%".format(
+                stage_name,
+                stage_calls,
+                format_duration(stage_time),
+                format_duration(stage_time / stage_calls),
+                stage_time / total_time * 100,
+            ))
+        lines.append("{:<24} {:>10} {:>12}".format("total", "", format_duration(total_time)))
+
+        lines.append("")
+        for (counter_name, counter_value) in self.counters.items():
+            lines.append("{:<24} {:>10}".format(counter_name, counter_value))
+
+        # ru_maxrss is in kilobytes on Linux
+        lines.append("{:<24} {:>10}".format("peak memory (RSS)", "{:.1f} MB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3)))
+        if traced_peak_memory is not None:
+            lines.append("{:<24} {:>10}".format("peak traced memory", "{:.1f} MB".format(traced_peak_memory / 1e6)))
+
+        print("\n".join(lines), file = report_file)
+
+def format_duration(seconds):
+    if seconds < 1e-3:
+        return "{:.1f} us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:.2f} ms".format(seconds * 1e3)
+    return "{:.3f} s".format(seconds)
+
+generator_profile = GeneratorProfile()
+
+def profile_main(main, argv = None):
+    # Takes the profiling options off the command line and runs main() with
+    # the rest, so that every engine shares the same options.
+    import argparse
+    parser = argparse.ArgumentParser(add_help = False, allow_abbrev = False)
+    parser.add_argument("--profile",             action = "store_true")
+    parser.add_argument("--profile-cprofile",    type = str           )
+    parser.add_argument("--profile-tracemalloc", type = str           )
+
+    profile_args, argv = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    if not (profile_args.profile or profile_args.profile_cprofile or profile_args.profile_tracemalloc):
+        return main(argv)
+
+    generator_profile.enabled = True
+
+    if profile_args.profile_tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    if profile_args.profile_cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    start_time = perf_counter()
+    try:
+        return main(argv)
+    finally:
+        total_time = perf_counter() - start_time
+
+        if profile_args.profile_cprofile:
+            profiler.disable()
+            profiler.dump_stats(profile_args.profile_cprofile)
+
+        traced_peak_memory = None
+        if profile_args.profile_tracemalloc:
+            _, traced_peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.take_snapshot().dump(profile_args.profile_tracemalloc)
+            tracemalloc.stop()
+
+        generator_profile.report(total_time, traced_peak_memory)
@@ -375,37 +375,94 @@ template_engine = {
     }
 }
 
-import os
+import argparse
+import re
 
-for (template_base_directory, template) in template_engine.items():
-    for template_file_name in template["template_file_names"]:
-        os.makedirs(
-            "{}/{}".format(
-                template_base_directory,
-                template_file_name,
-            ),
-            exist_ok = True,
-        )
+from svg_utils import load_generator_manifest, save_generator_manifest
+from svg_utils import generator_source_digest, generator_inputs_digest, open_output_target
+from svg_utils import generator_profile, profile_main
 
-        template_svg_path = "{}/.templates/template-{}.svg".format(
-            template_base_directory,
-            template_file_name,
-        )
+def compile_template(template_svg_data, template_field_names):
+    # Splits the template once into literal chunks interleaved with field
+    # slots, longer field names win when one is a prefix of another.
+    field_pattern = re.compile("|".join(
+        re.escape(template_field_name)
+        for template_field_name in sorted(template_field_names, key = len, reverse = True)
+    ))
 
-        with open(template_svg_path, "r") as template_svg_file:
-            template_svg_data = template_svg_file.read()
+    template_chunks = []
+    template_slots = []
 
-        for (instance_name, instance_data) in template["template_dataset"]:
-            instance_svg_data = template_svg_data
-            for (a, b) in zip(template["template_field_names"], instance_data):
-                instance_svg_data = instance_svg_data.replace(a, b.replace("&", "&amp;"))
+    chunk_start = 0
+    for field_match in field_pattern.finditer(template_svg_data):
+        template_chunks.append(template_svg_data[chunk_start:field_match.start()])
+        template_slots.append(template_field_names.index(field_match.group()))
+        chunk_start = field_match.end()
+    template_chunks.append(template_svg_data[chunk_start:])
 
-            instance_svg_path = "{}/{}/{}-{}.svg".format(
-                template_base_directory,
-                template_file_name,
-                template["template_prefix"],
-                instance_name
-            )
+    return template_chunks, template_slots
 
-            with open(instance_svg_path, "w") as instance_svg_file:
-                instance_svg_file.write(instance_svg_data)
+def expand_template(compiled_template, instance_data):
+    template_chunks, template_slots = compiled_template
+
+    field_values = [b.replace("&", "&amp;") for b in instance_data]
+
+    instance_parts = [None] * (len(template_chunks) + len(template_slots))
+    instance_parts[0::2] = template_chunks
+    instance_parts[1::2] = [field_values[template_slot] for template_slot in template_slots]
+
+    return "".join(instance_parts)
+
+def expand_templates(force = False, output_target = "tree"):
+    manifest = load_generator_manifest()
+    source_digest = generator_source_digest(__file__)
+
+    with open_output_target(output_target) as output:
+        for (template_base_directory, template) in template_engine.items():
+            for template_file_name in template["template_file_names"]:
+                template_svg_path = "{}/.templates/template-{}.svg".format(
+                    template_base_directory,
+                    template_file_name,
+                )
+
+                with open(template_svg_path, "r") as template_svg_file:
+                    template_svg_data = template_svg_file.read()
+
+                with generator_profile.stage("template compile"):
+                    compiled_template = compile_template(template_svg_data, template["template_field_names"])
+
+                for (instance_name, instance_data) in template["template_dataset"]:
+                    instance_svg_path = "{}/{}/{}-{}.svg".format(
+                        template_base_directory,
+                        template_file_name,
+                        template["template_prefix"],
+                        instance_name
+                    )
+
+                    inputs_digest = generator_inputs_digest(
+                        source_digest,
+                        template_svg_data,
+                        template["template_field_names"],
+                        instance_data,
+                    )
+                    if not force and output.is_current(manifest, instance_svg_path, inputs_digest):
+                        continue
+
+                    with generator_profile.stage("template expand"):
+                        instance_svg_data = expand_template(compiled_template, instance_data)
+                    output.write(instance_svg_path, instance_svg_data)
+                    output.record(manifest, instance_svg_path, inputs_digest)
+
+    save_generator_manifest(manifest)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force",         action = "store_true"         )
+    parser.add_argument("--output-target", type = str, default = "tree"  )
+
+    args = parser.parse_args(argv)
+
+    expand_templates(args.force, args.output_target)
+
+if __name__ == "__main__":
+    profile_main(main)